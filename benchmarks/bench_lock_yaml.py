@@ -0,0 +1,60 @@
+"""Compare parse and dump times of a large doty_lock.yml with the pure-Python and libyaml
+implementations used by helpers/yaml_io.py.
+
+Usage: python benchmarks/bench_lock_yaml.py [NUM_ENTRIES]
+"""
+import os
+import sys
+import timeit
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'doty'))
+
+from helpers.yaml_io import LIBYAML, SafeLoader, SafeDumper, load_yaml, dump_yaml, iter_yaml_sequence
+
+
+def gen_entries(num: int) -> list[dict]:
+    entries = []
+
+    for i in range(num):
+        name = f'.dotfile_{i}'
+        entries.append({
+            'name': name,
+            'src': f'/home/user/{name}',
+            'dst': f'/home/user/dotfiles/group_{i % 50}/{name}',
+            'linked': i % 3 != 0,
+            'link_name': name
+        })
+
+    return entries
+
+
+def bench(label: str, func, number: int = 3) -> float:
+    best = min(timeit.repeat(func, number=1, repeat=number))
+    print(f'{label:<32} {best * 1000:>10.1f} ms')
+    return best
+
+
+def main(num: int = 10000) -> None:
+    entries = gen_entries(num)
+    document = yaml.safe_dump(entries, sort_keys=False)
+
+    print(f'{num} entries, {len(document) / 1024:.0f} KiB, libyaml available: {LIBYAML}\n')
+
+    py_load = bench('parse - pure Python', lambda: yaml.load(document, Loader=yaml.SafeLoader))
+    py_dump = bench('dump - pure Python', lambda: yaml.dump(entries, Dumper=yaml.SafeDumper, sort_keys=False))
+
+    if not LIBYAML:
+        return
+
+    c_load = bench('parse - libyaml', lambda: load_yaml(document, SafeLoader))
+    bench('parse - libyaml streamed', lambda: sum(1 for _ in iter_yaml_sequence(document, SafeLoader)))
+    c_dump = bench('dump - libyaml', lambda: dump_yaml(entries, dumper=SafeDumper))
+    bench('dump - dump_yaml (checked)', lambda: dump_yaml(entries))
+
+    assert dump_yaml(entries) == document
+    print(f'\nparse speedup: {py_load / c_load:.1f}x, dump speedup: {py_dump / c_dump:.1f}x')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
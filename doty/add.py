@@ -2,7 +2,9 @@ import os
 from update import update
 from classes.logger import DotyLogger
 from classes.entry import DotyEntry
+from classes.index import LockIndex
 from helpers.utils import add_to_lock_file
+from helpers.shards import get_entry_lock_path, load_lock_indexes
 
 logger = DotyLogger()
 
@@ -174,13 +176,16 @@ def add(entry_name: str = '', src: str = '', dst: str = '', link_name: str = '',
         logger.warning('##byellow##Aborting...')
         exit(4)
     
-    lock_path = os.path.join(os.environ['DOTFILES_PATH'], '.doty_config', 'doty_lock.yml')
-    added = add_to_lock_file(entry_dict, lock_path)
+    # Names are unique across every lock shard, not just the one the entry is written to
+    indexes = load_lock_indexes()
 
-    if not added:
+    if any(index.by_name(name) is not None for index in indexes.values()):
         logger.warning('##byellow##Entry already exists in doty_lock.yml, aborting...')
         exit(5)
 
+    lock_path = get_entry_lock_path(entry_dict)
+    add_to_lock_file(entry_dict, lock_path, indexes.get(lock_path, LockIndex()))
+
     # Updates git repo or not depending on no_git flag
     # Even if the user does not want to update the repo, update is still ran in case the user wants to link the file back
     if not no_git and os.environ['GIT_AUTO_COMMIT']:
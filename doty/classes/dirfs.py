@@ -0,0 +1,134 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterable, Iterator
+
+# dir_fd is not available everywhere (e.g. Windows), without it paths are passed to the kernel whole
+SUPPORTED = all(
+    func in os.supports_dir_fd
+    for func in (os.open, os.stat, os.readlink, os.symlink, os.unlink, os.rename)
+)
+
+DIR_FLAGS = os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0) | getattr(os, 'O_CLOEXEC', 0)
+
+
+class DirFS:
+    """Filesystem calls made relative to open directory fds, instead of with absolute paths.
+
+        The roots ($HOME and the dotfiles directory) are opened once and kept open. Other
+        directories are opened relative to the nearest open ancestor, so the kernel only walks
+        the part of the path below it, and up to max_dirs of them are kept open as well. Each
+        call then only names the last component, relative to its directory's fd, which also
+        pins the directory - it cannot be swapped out between a check and the change after it.
+
+        Directories doty may remove or create during a run should not be cached: set max_dirs
+        to 0 and only the roots are kept open. Use as a context manager, or call close().
+
+        The methods have the same names and arguments as their os functions, so the os module
+        itself can be used wherever a DirFS is expected.
+    """
+
+    def __init__(self, roots: Iterable[str] = (), max_dirs: int = 64) -> None:
+        self.max_dirs = max_dirs
+        self._fds = {}
+        self._pinned = set()
+        self._lock = threading.Lock()
+
+        for root in map(os.path.normpath, roots):
+            if root in self._fds:
+                continue
+
+            try:
+                self._fds[root] = os.open(root, DIR_FLAGS)
+                self._pinned.add(root)
+            except OSError:
+                pass
+
+    def __enter__(self) -> 'DirFS':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            for fd in self._fds.values():
+                os.close(fd)
+
+            self._fds.clear()
+            self._pinned.clear()
+
+    def _ancestor(self, directory: str) -> tuple[int, str]:
+        """Get the fd of the nearest open ancestor of directory, and directory relative to it"""
+        parent = directory
+
+        while True:
+            fd = self._fds.get(parent)
+
+            if fd is not None:
+                return fd, os.path.relpath(directory, parent)
+
+            if parent == os.path.dirname(parent):
+                return None, directory
+
+            parent = os.path.dirname(parent)
+
+    @contextmanager
+    def _at(self, path: str) -> Iterator[tuple[int, str]]:
+        """Get the fd of path's directory and path's name in it, opening the directory if needed"""
+        directory, name = os.path.split(os.path.normpath(path))
+
+        with self._lock:
+            fd = self._fds.get(directory)
+            ancestor, rel = self._ancestor(directory) if fd is None else (None, None)
+
+        opened = None
+
+        if fd is None:
+            fd = opened = os.open(rel, DIR_FLAGS, dir_fd=ancestor)
+
+            with self._lock:
+                if directory not in self._fds and len(self._fds) - len(self._pinned) < self.max_dirs:
+                    self._fds[directory] = fd
+                    opened = None
+
+        try:
+            yield fd, name
+        finally:
+            if opened is not None:
+                os.close(opened)
+
+    def lstat(self, path: str) -> os.stat_result:
+        if not SUPPORTED:
+            return os.lstat(path)
+
+        with self._at(path) as (fd, name):
+            return os.stat(name, dir_fd=fd, follow_symlinks=False)
+
+    def readlink(self, path: str) -> str:
+        if not SUPPORTED:
+            return os.readlink(path)
+
+        with self._at(path) as (fd, name):
+            return os.readlink(name, dir_fd=fd)
+
+    def symlink(self, target: str, path: str) -> None:
+        if not SUPPORTED:
+            return os.symlink(target, path)
+
+        with self._at(path) as (fd, name):
+            os.symlink(target, name, dir_fd=fd)
+
+    def unlink(self, path: str) -> None:
+        if not SUPPORTED:
+            return os.unlink(path)
+
+        with self._at(path) as (fd, name):
+            os.unlink(name, dir_fd=fd)
+
+    def rename(self, src: str, dst: str) -> None:
+        if not SUPPORTED:
+            return os.rename(src, dst)
+
+        with self._at(src) as (src_fd, src_name), self._at(dst) as (dst_fd, dst_name):
+            os.rename(src_name, dst_name, src_dir_fd=src_fd, dst_dir_fd=dst_fd)
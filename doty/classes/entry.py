@@ -1,27 +1,71 @@
 import os
 import textwrap
+from functools import total_ordering
+from typing import Iterable
 from classes.logger import DotyLogger
 
 logger = DotyLogger()
 
+FIELDS = ('name', 'src', 'dst', 'linked', 'link_name')
+DEFAULTS = ('', '', '', True, '')
+
+@total_ordering
 class DotyEntry:
-    """A class to represent an entry in a doty_lock file."""
+    """A class to represent an entry in a doty_lock file.
+
+        Entries use __slots__ instead of an instance dict. The fingerprint and hash are built once
+        and cached until one of the entry's values is changed. Entries hash and order by their
+        fingerprint, so they can be used in sets, as dict keys, and sorted. Once an entry has been
+        hashed its values are frozen - changing them would lose it in any set or dict it is in -
+        use replace to get a changed copy instead.
+    """
+
+    __slots__ = (*FIELDS, '_fingerprint', '_hash')
+
+    def __init__(self, vals: dict, home: str = None, dotfiles: str = None) -> None:
+        setattr_ = object.__setattr__
+
+        for field, default in zip(FIELDS, DEFAULTS):
+            setattr_(self, field, vals.get(field, default))
+
+        setattr_(self, '_fingerprint', None)
+        setattr_(self, '_hash', None)
 
-    def __init__(self, vals: dict) -> None:
-        self.name = ''
-        self.src = ''
-        self.dst = ''
-        self.linked = True
-        self.link_name = ''
+        self.extrapolate(home or os.environ['HOME'], dotfiles)
 
-        self.__dict__.update(vals)
-        self.extrapolate()
+    def __setattr__(self, key, value) -> None:
+        if key in FIELDS and self._hash is not None:
+            raise AttributeError(f'Cannot change {key} of an entry that was hashed, use replace instead')
+
+        object.__setattr__(self, key, value)
+
+        if key in FIELDS:
+            object.__setattr__(self, '_fingerprint', None)
 
     def __eq__(self, other) -> bool:
-        return self.dict == other.dict
-    
+        fingerprint = getattr(other, 'fingerprint', None)
+
+        if fingerprint is None:
+            return NotImplemented
+
+        return self.fingerprint == fingerprint
+
+    def __lt__(self, other) -> bool:
+        fingerprint = getattr(other, 'fingerprint', None)
+
+        if fingerprint is None:
+            return NotImplemented
+
+        return self.fingerprint < fingerprint
+
+    def __hash__(self) -> int:
+        if self._hash is None:
+            object.__setattr__(self, '_hash', hash(self.fingerprint))
+
+        return self._hash
+
     def __contains__(self, other) -> bool:
-        return self.dict == other.dict
+        return self == other
 
     def __str__(self) -> str:
         string = f"""\
@@ -36,47 +80,105 @@ class DotyEntry:
     
     @property
     def dict(self) -> dict:
-        """Return the values of the entry."""
-        return {
-            'name': self.name,
-            'src': self.src,
-            'dst': self.dst,
-            'linked': self.linked,
-            'link_name': self.link_name
-        }
+        """Return the values of the entry, as a new dict built from the cached fingerprint"""
+        return dict(zip(FIELDS, self.fingerprint))
     
+    @property
+    def fingerprint(self) -> tuple:
+        """Return a hashable tuple of the entry's values. Two entries are equal when their fingerprints are."""
+        if self._fingerprint is None:
+            object.__setattr__(self, '_fingerprint', (self.name, self.src, self.dst, self.linked, self.link_name))
+
+        return self._fingerprint
+
+    def replace(self, **changes) -> 'DotyEntry':
+        """Return a copy of the entry with some of its values changed"""
+        return self.from_values(tuple(changes.get(field, value) for field, value in zip(FIELDS, self.fingerprint)))
+
     @property
     def linked_path(self) -> str:
         """Return the path of the linked file."""
         return os.path.join(os.path.dirname(self.src), self.link_name)
     
-    def extrapolate(self) -> None:
-        """Fill in the missing values of the entry."""
+    @classmethod
+    def from_many(cls, entries: Iterable[dict], home: str = None, dotfiles: str = None) -> list['DotyEntry']:
+        """Build entries from many lock file dicts in one pass.
+
+            $HOME is read once for the whole batch and nothing is logged per entry, which
+            matters for lock files with thousands of entries.
+        """
+        home = home or os.environ['HOME']
+        dotfiles = dotfiles or os.path.join(home, 'dotfiles')
+        from_values = cls.from_values
+        result = []
+
+        for vals in entries:
+            result.append(from_values(_fill(
+                vals.get('name', ''),
+                vals.get('src', ''),
+                vals.get('dst', ''),
+                vals.get('linked', True),
+                vals.get('link_name', ''),
+                home,
+                dotfiles
+            )))
+
+        logger.debug('Built %d entries', len(result))
+        return result
+
+    @classmethod
+    def from_values(cls, values: tuple) -> 'DotyEntry':
+        """Build an entry from values that are already filled in, in the order of FIELDS"""
+        entry = cls.__new__(cls)
+        setattr_ = object.__setattr__
+
+        for field, value in zip(FIELDS, values):
+            setattr_(entry, field, value)
+
+        setattr_(entry, '_fingerprint', None)
+        setattr_(entry, '_hash', None)
+
+        return entry
+
+    def extrapolate(self, home: str, dotfiles: str = None) -> None:
+        """Fill in the missing values of the entry, relative to the given home directory.
+        The dotfiles directory defaults to home/dotfiles.
+        """
 
         if not self.name and not self.src:
             logger.debug('##bred##Entry is missing name and src. Aborting...')
             return
-        elif not self.name:
-            self.name = os.path.basename(self.src)
-        
-        logger.debug(f'Extrapolating entry: {self.name}')
 
-        if not self.src:
-            logger.debug(f'Adding src for {self.name}')
-            self.src = os.path.join(os.environ['HOME'], self.name)
-        
-        if not self.dst:
-            logger.debug(f'Adding dst for {self.name}')
-            self.dst = os.path.join(os.environ['HOME'], 'dotfiles', self.name)
-        elif self.dst and not os.path.isabs(self.dst):
-            logger.debug(f'Adding dst for {self.name}')
-            self.dst = os.path.join(os.environ['HOME'], 'dotfiles', self.dst)
-        
-        if not self.link_name:
-            logger.debug(f'Adding link_name for {self.name}')
-            self.link_name = self.name
-        
-        logger.debug(f'Extrapolated entry: {self.name} - {self.dict}')
+        fields = _fill(self.name, self.src, self.dst, self.linked, self.link_name, home, dotfiles or os.path.join(home, 'dotfiles'))
+
+        for field, value in zip(FIELDS, fields):
+            if value != getattr(self, field):
+                setattr(self, field, value)
+
+        # Arguments are only formatted if a handler actually prints the record
+        logger.debug('Extrapolated entry: %s - %s', self.name, self.dict)
+
+
+def _fill(name: str, src: str, dst: str, linked: bool, link_name: str, home: str, dotfiles: str) -> tuple:
+    """Fill in missing values the way extrapolate does. Returns the values in the order of FIELDS."""
+    if not name and not src:
+        return name, src, dst, linked, link_name
+
+    if not name:
+        name = os.path.basename(src)
+
+    if not src:
+        src = os.path.join(home, name)
+
+    if not dst:
+        dst = os.path.join(dotfiles, name)
+    elif not os.path.isabs(dst):
+        dst = os.path.join(dotfiles, dst)
+
+    if not link_name:
+        link_name = name
+
+    return name, src, dst, linked, link_name
 
 if __name__ == '__main__':
     dict1 = { 'name': 'bashrc', 'src': '/home/user/bashrc', 'dst': '/home/user/dotfiles/bashrc', 'linked': True, 'link_name': 'bashrc' }
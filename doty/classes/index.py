@@ -0,0 +1,60 @@
+from typing import Iterable, Optional
+from classes.table import LockTable
+
+COLUMNS = ('names', 'dsts', 'srcs', 'link_names')
+
+
+class LockIndex:
+    """Lookups of lock table rows by name, dst, src and link_name in O(1).
+
+        Each lookup returns the first row, in lock file order, with that value, or None. The
+        index is built once from a LockTable and kept up to date as entries are added or
+        removed through it, so add, remove and discover never scan the lock entries.
+    """
+
+    def __init__(self, table: LockTable = None) -> None:
+        self.table = table if table is not None else LockTable()
+        self._build()
+
+    def __len__(self) -> int:
+        return len(self.table)
+
+    def _build(self) -> None:
+        self._index = {column: {} for column in COLUMNS}
+
+        for column in COLUMNS:
+            index = self._index[column]
+
+            for i, value in enumerate(getattr(self.table, column)):
+                index.setdefault(value, i)
+
+    def by_name(self, name: str) -> Optional[int]:
+        return self._index['names'].get(name)
+
+    def by_dst(self, dst: str) -> Optional[int]:
+        return self._index['dsts'].get(dst)
+
+    def by_src(self, src: str) -> Optional[int]:
+        return self._index['srcs'].get(src)
+
+    def by_link_name(self, link_name: str) -> Optional[int]:
+        return self._index['link_names'].get(link_name)
+
+    def add(self, vals: dict, home: str = None, dotfiles: str = None) -> int:
+        """Add an entry to the table and the index. Returns its row."""
+        i = self.table.append(vals, home=home, dotfiles=dotfiles)
+
+        for column in COLUMNS:
+            self._index[column].setdefault(getattr(self.table, column)[i], i)
+
+        return i
+
+    def remove(self, rows: Iterable[int]) -> None:
+        """Remove rows from the table. Rows after the first removed one move up, so the index is rebuilt."""
+        rows = list(rows)
+
+        if not rows:
+            return
+
+        self.table.delete(rows)
+        self._build()
@@ -0,0 +1,112 @@
+import os
+from typing import Iterable, Optional
+
+
+class HomeLinkIndex:
+    """An index of the user's home directory, built with a single scandir of $HOME and of any
+        subdirectories that link names point into. Directories are scanned the first time a link
+        in them is looked up, or up front for the given link names.
+
+        Maps each link name (relative to $HOME) to a tuple of (is_symlink, target). Link checks
+        that would otherwise stat $HOME/<link_name> once per entry, and once per phase of an update,
+        look the name up here instead. Anything doty links or unlinks afterwards is recorded
+        with set/discard so the index stays correct for the rest of the run. When the index is
+        attached to a StatCache, symlink targets are checked through the cache.
+    """
+
+    def __init__(self, home: str = None, link_names: Iterable[str] = ()) -> None:
+        self.home = home or os.environ['HOME']
+        self._links = {}
+        self._scanned = set()
+        self.stats = None
+
+        for subdir in {os.path.dirname(self._key(name)) for name in link_names}:
+            self._scan(subdir)
+
+    def __contains__(self, link_name: str) -> bool:
+        return self.get(link_name) is not None
+
+    def _key(self, link_name: str) -> str:
+        return os.path.normpath(link_name)
+
+    def _scan(self, subdir: str) -> None:
+        """Read one directory into the index"""
+        if subdir in self._scanned:
+            return
+
+        self._scanned.add(subdir)
+
+        try:
+            with os.scandir(os.path.join(self.home, subdir)) as it:
+                for entry in it:
+                    key = os.path.join(subdir, entry.name) if subdir else entry.name
+
+                    if entry.is_symlink():
+                        self._links[key] = (True, os.readlink(entry.path))
+                    else:
+                        self._links[key] = (False, None)
+        except OSError:
+            pass
+
+    def _relative(self, path: str) -> Optional[str]:
+        """Get the index key for an absolute path, or None if the path is not in $HOME"""
+        rel = os.path.relpath(path, self.home)
+
+        if rel == os.curdir or rel.startswith(os.pardir + os.sep) or rel == os.pardir:
+            return None
+
+        return rel
+
+    def get(self, link_name: str) -> Optional[tuple[bool, Optional[str]]]:
+        """Get (is_symlink, target) for a link name, or None if nothing exists there"""
+        key = self._key(link_name)
+        self._scan(os.path.dirname(key))
+        return self._links.get(key)
+
+    def path(self, link_name: str) -> str:
+        """Get the full path of a link name"""
+        return os.path.join(self.home, link_name)
+
+    def islink(self, link_name: str) -> bool:
+        """Same as os.path.islink on $HOME/<link_name>"""
+        found = self.get(link_name)
+        return found is not None and found[0]
+
+    def lexists(self, link_name: str) -> bool:
+        """Same as os.path.lexists on $HOME/<link_name>"""
+        return self.get(link_name) is not None
+
+    def exists(self, link_name: str) -> bool:
+        """Same as os.path.exists on $HOME/<link_name>. Only symlinks need to be stat'ed to see if their target exists."""
+        found = self.get(link_name)
+
+        if found is None:
+            return False
+        elif not found[0]:
+            return True
+        elif self.stats is not None:
+            return self.stats.exists(os.path.join(os.path.dirname(self.path(link_name)), found[1]))
+
+        return os.path.exists(self.path(link_name))
+
+    def target(self, link_name: str) -> Optional[str]:
+        """Get the target of a symlink, or None if it is not a symlink"""
+        found = self.get(link_name)
+        return found[1] if found else None
+
+    def set(self, path: str, is_symlink: bool, target: str = None) -> None:
+        """Record a file or symlink created at an absolute path"""
+        key = self._relative(path)
+
+        # The directory is scanned first, changes planned but not made yet would be lost to a later scan
+        if key is not None:
+            self._scan(os.path.dirname(key))
+            self._links[key] = (is_symlink, target if is_symlink else None)
+
+    def discard(self, path: str) -> None:
+        """Record that an absolute path no longer exists"""
+        key = self._relative(path)
+
+        if key is not None:
+            self._scan(os.path.dirname(key))
+            self._links.pop(key, None)
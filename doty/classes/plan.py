@@ -0,0 +1,211 @@
+import os
+import json
+from typing import Iterator, NamedTuple, Optional
+from classes.entry import DotyEntry
+
+PLAN_VERSION = 2
+
+MOVE_IN = 'move_in'
+MOVE_OUT = 'move_out'
+RENAME = 'rename'
+LINK = 'link'
+UNLINK = 'unlink'
+
+OPS = (MOVE_IN, MOVE_OUT, RENAME, LINK, UNLINK)
+
+
+class PlanOp(NamedTuple):
+    """One filesystem operation of a Plan.
+
+        path is what the operation acts on and target where it points to: the file and its new
+        location for moves and renames, the symlink and the file it links to for links and
+        unlinks. name, entry and prior are what the report records for it.
+    """
+    op: str
+    path: str
+    target: str
+    name: str
+    entry: DotyEntry
+    prior: DotyEntry = None
+
+    @property
+    def paths(self) -> tuple[str, ...]:
+        """The paths the operation changes. A link's target is only pointed to, so it is not one of them."""
+        if self.op in (LINK, UNLINK):
+            return (self.path,)
+
+        return (self.path, self.target)
+
+    def keys(self, roots: tuple[str, ...] = ()) -> set[str]:
+        """The paths the operation changes, and for moves, renames and links the directories they may
+        create or remove on the way. Directories are taken up to the nearest root ($HOME or the
+        dotfiles directory), which are never created or removed.
+        """
+        keys = set(self.paths)
+
+        if self.op == UNLINK:
+            return keys
+
+        for path in self.paths:
+            parent = os.path.dirname(path)
+
+            while parent not in roots and parent != os.path.dirname(parent):
+                keys.add(parent)
+                parent = os.path.dirname(parent)
+
+        return keys
+
+    def inverse(self) -> Optional['PlanOp']:
+        """Get the operation that undoes this one, or None for an unlink whose target is not known"""
+        if self.op == LINK:
+            return self._replace(op=UNLINK)
+        elif self.op == UNLINK:
+            return self._replace(op=LINK) if self.target else None
+        elif self.op == MOVE_IN:
+            return self._replace(op=MOVE_OUT, path=self.target, target=self.path)
+        elif self.op == MOVE_OUT:
+            return self._replace(op=MOVE_IN, path=self.target, target=self.path)
+        elif self.op == RENAME:
+            return self._replace(path=self.target, target=self.path)
+
+    def __str__(self) -> str:
+        if self.op == UNLINK:
+            return f'{self.op} {self.path}'
+
+        return f'{self.op} {self.path} -> {self.target}'
+
+    def to_dict(self) -> dict:
+        return {
+            'op': self.op,
+            'path': self.path,
+            'target': self.target,
+            'name': self.name,
+            'entry': self.entry.dict,
+            'prior': self.prior.dict if self.prior is not None else None,
+        }
+
+    @classmethod
+    def from_dict(cls, vals: dict) -> 'PlanOp':
+        if vals['op'] not in OPS:
+            raise ValueError(f'Unknown plan operation {vals["op"]}')
+
+        prior = vals.get('prior')
+
+        return cls(
+            vals['op'],
+            vals['path'],
+            vals.get('target', ''),
+            vals['name'],
+            DotyEntry(vals['entry']),
+            DotyEntry(prior) if prior is not None else None,
+        )
+
+    def report(self, report) -> None:
+        """Record the operation in a ShortReport"""
+        if self.op == UNLINK:
+            report.rm_link(self.name, self.entry)
+        elif self.op == LINK:
+            report.add_link(self.name, self.entry)
+        elif self.op == MOVE_OUT:
+            report.rm_file(self.name, self.entry)
+        elif self.op == MOVE_IN:
+            report.add_file(self.name, self.entry)
+        elif self.op == RENAME:
+            report.rm_file(self.name, self.prior)
+            report.add_file(self.name, self.entry)
+
+
+class Plan:
+    """An ordered list of the operations an update will make, and the lock files it writes afterwards.
+
+        Plans are built without touching the filesystem, so they can be printed for a dry run or
+        saved to JSON and applied later without scanning the home and dotfiles directories again.
+        The ledger of entries verified while planning is saved once the plan is applied, it is not
+        saved with the plan. Once applied, failed holds the number of operations that could not be made.
+        sources holds a digest of each lock file the plan was made from, so a saved plan is only
+        applied to the lock files it was planned against.
+    """
+
+    def __init__(
+        self, ops: list[PlanOp] = None, locks: list[tuple[str, list[dict]]] = None, sources: dict[str, Optional[str]] = None
+    ) -> None:
+        self.ops = ops if ops is not None else []
+        self.locks = locks if locks is not None else []
+        self.sources = sources if sources is not None else {}
+        self.ledger = None
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return len(self.ops)
+
+    def __iter__(self) -> Iterator[PlanOp]:
+        return iter(self.ops)
+
+    def __str__(self) -> str:
+        if not self.ops:
+            return 'Nothing to do'
+
+        return '\n'.join(str(op) for op in self.ops)
+
+    def add(self, op: str, path: str, target: str, name: str, entry: DotyEntry, prior: DotyEntry = None) -> PlanOp:
+        plan_op = PlanOp(op, path, target, name, entry, prior)
+        self.ops.append(plan_op)
+        return plan_op
+
+    def extend(self, other: 'Plan') -> None:
+        self.ops.extend(other.ops)
+        self.locks.extend(other.locks)
+
+    def batches(self, roots: tuple[str, ...] = ()) -> Iterator[list[PlanOp]]:
+        """Split the operations into runs, in order, where no two operations share a path or a directory
+        they may create or remove (see PlanOp.keys). The operations of a batch do not depend on each
+        other, so they can be made in any order, or at the same time.
+        """
+        batch, seen = [], set()
+
+        for op in self.ops:
+            keys = op.keys(roots)
+
+            if not seen.isdisjoint(keys):
+                yield batch
+                batch, seen = [], set()
+
+            batch.append(op)
+            seen.update(keys)
+
+        if batch:
+            yield batch
+
+    def report(self, report) -> None:
+        """Record every operation in a ShortReport, as if the plan had been applied"""
+        for op in self.ops:
+            op.report(report)
+
+    def to_dict(self) -> dict:
+        return {
+            'version': PLAN_VERSION,
+            'ops': [op.to_dict() for op in self.ops],
+            'locks': [{'path': path, 'entries': entries} for path, entries in self.locks],
+            'sources': self.sources,
+        }
+
+    @classmethod
+    def from_dict(cls, vals: dict) -> 'Plan':
+        if vals.get('version') != PLAN_VERSION:
+            raise ValueError(f'Unsupported plan version {vals.get("version")}')
+
+        return cls(
+            [PlanOp.from_dict(op) for op in vals['ops']],
+            [(lock['path'], lock['entries']) for lock in vals['locks']],
+            vals['sources'],
+        )
+
+    def save(self, path: str) -> None:
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write('\n')
+
+    @classmethod
+    def load(cls, path: str) -> 'Plan':
+        with open(os.path.expanduser(path)) as f:
+            return cls.from_dict(json.load(f))
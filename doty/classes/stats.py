@@ -0,0 +1,156 @@
+import os
+import stat
+from typing import Optional
+from classes.links import HomeLinkIndex
+
+MAX_LINK_DEPTH = 40
+
+
+class StatCache:
+    """A memoized view of the filesystem, scoped to a single reconciliation.
+
+        Every path is lstat'ed at most once. When doty itself moves, links or unlinks
+        something it records the change here instead of forgetting the path, so later
+        phases of the same update never stat a path the run already knows about.
+
+        If a HomeLinkIndex is given, changes under $HOME are recorded in it as well, and
+        the index resolves its symlink targets through this cache. Paths are stat'ed through
+        fs, a DirFS or the os module.
+    """
+
+    def __init__(self, links: HomeLinkIndex = None, fs=os) -> None:
+        self._lstat = {}
+        self._targets = {}
+        self.links = links
+        self.fs = fs
+
+        if links is not None:
+            links.stats = self
+
+    def lstat(self, path: str) -> Optional[os.stat_result]:
+        """Same as os.lstat, but returns None if nothing exists at path"""
+        try:
+            return self._lstat[path]
+        except KeyError:
+            pass
+
+        try:
+            result = self.fs.lstat(path)
+        except OSError:
+            result = None
+
+        self._lstat[path] = result
+        return result
+
+    def lexists(self, path: str) -> bool:
+        """Same as os.path.lexists"""
+        return self.lstat(path) is not None
+
+    def islink(self, path: str) -> bool:
+        """Same as os.path.islink"""
+        result = self.lstat(path)
+        return result is not None and stat.S_ISLNK(result.st_mode)
+
+    def readlink(self, path: str) -> Optional[str]:
+        """Same as os.readlink, but returns None if path is not a symlink"""
+        if not self.islink(path):
+            return None
+
+        if path not in self._targets:
+            try:
+                self._targets[path] = self.fs.readlink(path)
+            except OSError:
+                self._targets[path] = None
+
+        return self._targets[path]
+
+    def exists(self, path: str) -> bool:
+        """Same as os.path.exists. Symlinks are followed through the cache."""
+        for _ in range(MAX_LINK_DEPTH):
+            if not self.islink(path):
+                return self.lexists(path)
+
+            target = self.readlink(path)
+
+            if target is None:
+                return False
+
+            path = os.path.join(os.path.dirname(path), target)
+
+        return False
+
+    def isdir(self, path: str) -> bool:
+        """Same as os.path.isdir"""
+        while self.islink(path) and self.exists(path):
+            path = os.path.join(os.path.dirname(path), self.readlink(path))
+
+        result = self.lstat(path)
+        return result is not None and stat.S_ISDIR(result.st_mode)
+
+    def _forget_parents(self, path: str) -> None:
+        """Directories may be created or removed around a moved path, so their state is dropped"""
+        parent = os.path.dirname(path)
+
+        while parent and parent != path:
+            self._lstat.pop(parent, None)
+            path, parent = parent, os.path.dirname(parent)
+
+    def _forget_tree(self, path: str) -> None:
+        """Drop everything known below a directory"""
+        result = self._lstat.get(path)
+
+        if result is None or not stat.S_ISDIR(result.st_mode):
+            return
+
+        prefix = path.rstrip(os.sep) + os.sep
+
+        for key in [key for key in self._lstat if key.startswith(prefix)]:
+            del self._lstat[key]
+            self._targets.pop(key, None)
+
+    def invalidate(self, path: str) -> None:
+        """Forget a path so it is stat'ed again the next time it is needed"""
+        self._forget_tree(path)
+        self._lstat.pop(path, None)
+        self._targets.pop(path, None)
+
+    def moved(self, src: str, dst: str) -> None:
+        """Record that doty moved src to dst"""
+        known = src in self._lstat
+        result = self._lstat.get(src)
+        target = self._targets.get(src)
+
+        self._forget_tree(src)
+        self._forget_parents(src)
+        self._forget_parents(dst)
+        self._lstat[src] = None
+        self._targets.pop(src, None)
+
+        # If src was never stat'ed, dst is left to be stat'ed when it is needed
+        if known:
+            self._lstat[dst] = result
+        else:
+            self._lstat.pop(dst, None)
+
+        if target is not None:
+            self._targets[dst] = target
+
+        if self.links is not None:
+            self.links.discard(src)
+            self.links.set(dst, result is not None and stat.S_ISLNK(result.st_mode), target)
+
+    def linked(self, path: str, target: str) -> None:
+        """Record that doty created a symlink at path pointing to target"""
+        self._lstat[path] = os.stat_result((stat.S_IFLNK | 0o777, 0, 0, 1, 0, 0, len(target), 0, 0, 0))
+        self._targets[path] = target
+
+        if self.links is not None:
+            self.links.set(path, True, target)
+
+    def unlinked(self, path: str) -> None:
+        """Record that doty removed the file or symlink at path"""
+        self._lstat[path] = None
+        self._targets.pop(path, None)
+
+        if self.links is not None:
+            self.links.discard(path)
@@ -0,0 +1,171 @@
+import os
+import sys
+from typing import Iterable, Iterator, NamedTuple
+from classes.entry import DotyEntry, FIELDS, _fill
+
+
+class LockRow(NamedTuple):
+    """A read-only view of one row of a LockTable. Rows are built on demand and are not kept by the table."""
+    name: str
+    src: str
+    dst: str
+    linked: bool
+    link_name: str
+    table: 'LockTable'
+    index: int
+
+    @property
+    def fingerprint(self) -> tuple:
+        return (self.name, self.src, self.dst, self.linked, self.link_name)
+
+    @property
+    def dict(self) -> dict:
+        return dict(zip(FIELDS, self.fingerprint))
+
+    def to_entry(self) -> DotyEntry:
+        """Get the DotyEntry for this row"""
+        return self.table.entry(self.index)
+
+
+class LockTable:
+    """The entries of a lock file stored by column.
+
+        Names, srcs, dsts and link_names are kept in parallel lists of interned strings and
+        the linked values in a bitmap, so a lock file with tens of thousands of entries does
+        not need a DotyEntry and a dict per entry. Set operations over the rows, like diffs
+        and membership checks, run on the columns.
+
+        DotyEntry objects are only built for the rows that need one, with entry(). The table
+        keeps those entries and reads the row's values from them, so changes made to an
+        entry (e.g. setting linked to False) are written back with the rest of the table.
+    """
+
+    __slots__ = ('names', 'srcs', 'dsts', 'link_names', '_linked', '_entries')
+
+    def __init__(self) -> None:
+        self.names = []
+        self.srcs = []
+        self.dsts = []
+        self.link_names = []
+        self._linked = bytearray()
+        self._entries = {}
+
+    @classmethod
+    def from_dicts(cls, entries: Iterable[dict], home: str = None, dotfiles: str = None) -> 'LockTable':
+        """Build a table from lock file dicts, filling in missing values the same way DotyEntry does"""
+        home = home or os.environ['HOME']
+        dotfiles = dotfiles or os.path.join(home, 'dotfiles')
+        table = cls()
+
+        for vals in entries:
+            table._append(_fill(
+                vals.get('name', ''),
+                vals.get('src', ''),
+                vals.get('dst', ''),
+                vals.get('linked', True),
+                vals.get('link_name', ''),
+                home,
+                dotfiles
+            ))
+
+        return table
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __iter__(self) -> Iterator[LockRow]:
+        for i in range(len(self.names)):
+            yield self.row(i)
+
+    def _append(self, values: tuple) -> int:
+        name, src, dst, linked, link_name = values
+        i = len(self.names)
+
+        self.names.append(sys.intern(name))
+        self.srcs.append(sys.intern(src))
+        self.dsts.append(sys.intern(dst))
+        self.link_names.append(sys.intern(link_name))
+
+        if i % 8 == 0:
+            self._linked.append(0)
+
+        self._set_bit(i, linked)
+        return i
+
+    def _set_bit(self, i: int, linked: bool) -> None:
+        if linked:
+            self._linked[i >> 3] |= 1 << (i & 7)
+        else:
+            self._linked[i >> 3] &= ~(1 << (i & 7)) & 0xff
+
+    def append(self, vals: dict, home: str = None, dotfiles: str = None) -> int:
+        """Add an entry to the end of the table and return its row index"""
+        home = home or os.environ['HOME']
+
+        return self._append(_fill(
+            vals.get('name', ''),
+            vals.get('src', ''),
+            vals.get('dst', ''),
+            vals.get('linked', True),
+            vals.get('link_name', ''),
+            home,
+            dotfiles or os.path.join(home, 'dotfiles')
+        ))
+
+    def is_linked(self, i: int) -> bool:
+        if i in self._entries:
+            return self._entries[i].linked
+
+        return bool(self._linked[i >> 3] >> (i & 7) & 1)
+
+    def set_linked(self, i: int, linked: bool) -> None:
+        self._set_bit(i, linked)
+
+        if i in self._entries:
+            self._entries[i].linked = linked
+
+    def values(self, i: int) -> tuple:
+        """Get the values of a row, in the order of FIELDS"""
+        if i in self._entries:
+            return self._entries[i].fingerprint
+
+        return (self.names[i], self.srcs[i], self.dsts[i], self.is_linked(i), self.link_names[i])
+
+    def row(self, i: int) -> LockRow:
+        return LockRow(*self.values(i), self, i)
+
+    def as_dict(self, i: int) -> dict:
+        return dict(zip(FIELDS, self.values(i)))
+
+    def to_dicts(self) -> list[dict]:
+        """Get every row as a dict, ready to be written to a lock file"""
+        return [dict(zip(FIELDS, self.values(i))) for i in range(len(self.names))]
+
+    def entry(self, i: int) -> DotyEntry:
+        """Get the DotyEntry for a row. The entry is kept, and its values are used for the row from now on."""
+        if i not in self._entries:
+            self._entries[i] = DotyEntry.from_values(self.values(i))
+
+        return self._entries[i]
+
+    def entries(self, rows: Iterable[int]) -> list[DotyEntry]:
+        return [self.entry(i) for i in rows]
+
+    def fingerprints(self) -> set[tuple]:
+        return {self.values(i) for i in range(len(self.names))}
+
+    def difference(self, other: 'LockTable') -> list[int]:
+        """Get the rows of this table whose values are not in any row of the other table, in order"""
+        other_fps = other.fingerprints()
+        return [i for i in range(len(self.names)) if self.values(i) not in other_fps]
+
+    def delete(self, rows: Iterable[int]) -> None:
+        """Remove rows from the table. Row indexes, and any DotyEntry objects got from entry(), are reset."""
+        drop = set(rows)
+        keep = [i for i in range(len(self.names)) if i not in drop]
+        values = [self.values(i) for i in keep]
+
+        self.__init__()
+
+        for vals in values:
+            self._append(vals)
@@ -1,50 +1,35 @@
 import os
-import yaml
+from typing import Iterable, Union
 from classes.logger import DotyLogger
-from classes.entry import DotyEntry
-from helpers.git import last_commit_file, get_repo, checkout, make_commit
+from classes.table import LockTable
+from classes.index import LockIndex
+from helpers.git import get_repo, checkout, make_commit
 from helpers.utils import write_lock_file
-from helpers.lock import compare_lock_yaml
+from helpers.lock import compare_lock_yaml, load_prior_lock, load_prior_shards
+from helpers.shards import is_sharded, list_prior_shards, write_lock_shards
+from helpers.scan import scan_dotfiles
 
 logger = DotyLogger()
 
-def find_all_dotfiles() -> list:
-    """Find all dotfiles in the user's dotfile directory."""
-    dot_dir = os.path.join(os.environ['HOME'], 'dotfiles')
-    dotfiles = []
-
-    for root, dirs, files in os.walk(dot_dir):
-        # Skips .doty_config
-        if '.doty_config' in dirs:
-            dirs.remove('.doty_config')
-        if '.git' in dirs:
-            dirs.remove('.git')
-
-        for file in files:
-            if file == '.gitignore':
-                continue
-            dotfiles.append(os.path.join(root, file))
-    return dotfiles
-
-def get_new_entries(all_dotfiles: list[str], lock_entries: list[dict]) -> list[dict]:
+def get_new_entries(all_dotfiles: Iterable[str], lock_entries: Union[list[dict], LockIndex]) -> list[dict]:
     """Get all new entries to be added to the lock file"""
-    current_names = [entry['name'] for entry in lock_entries]
-    current_dsts = [entry['dst'] for entry in lock_entries]
+    if not isinstance(lock_entries, LockIndex):
+        lock_entries = LockIndex(LockTable.from_dicts(lock_entries))
 
     new_entries = []
 
     for dotfile in all_dotfiles:
-        if dotfile in current_dsts:
+        if lock_entries.by_dst(dotfile) is not None:
             logger.debug(f'{dotfile} already in lock file. Skipping')
             continue
 
         name = os.path.basename(dotfile)
 
-        if name in current_names:
+        if lock_entries.by_name(name) is not None:
             logger.warning(f'##bwhite##{name} ##byellow##already in lock file. Please add manually with a different name...')
             continue
 
-        entry = DotyEntry({ 'name': name, 'dst': dotfile }).dict
+        entry = lock_entries.table.as_dict(lock_entries.add({ 'name': name, 'dst': dotfile }))
         new_entries.append(entry)
         logger.info(f'##bwhite##Adding entry ##bgreen##{dotfile} ##bwhite##to lock file')
     return new_entries
@@ -62,16 +47,26 @@ def discover() -> None:
     checkout(repo, 'doty_discover', override=True)
 
     logger.info('##bblue##Discovering new dotfiles in repo##end##')
-    dotfiles = find_all_dotfiles()
-    lock_entries = yaml.safe_load(last_commit_file(".doty_config/doty_lock.yml"))
+    dotfiles = scan_dotfiles()
+    sharded = is_sharded()
 
-    new_entries = get_new_entries(dotfiles, lock_entries)
+    if sharded:
+        lock_entries = load_prior_shards(list_prior_shards(repo), repo)
+    else:
+        lock_entries = load_prior_lock()
+
+    lock_index = LockIndex(LockTable.from_dicts(lock_entries))
+
+    new_entries = get_new_entries(dotfiles, lock_index)
     new_lock_entries = lock_entries + new_entries
 
     logger.info(f'##bgreen##Found {len(new_entries)} new dotfiles##end##')
     logger.info(f'##bblue##Writing new temp lock file##end##')
-    lock_file_path = os.path.join(os.environ['DOTFILES_PATH'], '.doty_config', 'doty_lock.yml')
-    write_lock_file(new_lock_entries, lock_file_path)
+    if sharded:
+        write_lock_shards(new_lock_entries)
+    else:
+        lock_file_path = os.path.join(os.environ['DOTFILES_PATH'], '.doty_config', 'doty_lock.yml')
+        write_lock_file(new_lock_entries, lock_file_path)
     make_commit(repo, 'Creating new lock file on discover')
 
     logger.info(f'##bgreen##Done!##end##')
@@ -0,0 +1,40 @@
+from classes.logger import DotyLogger
+from helpers.fleet import get_fleet_template, apply_fleet, fleet_summary
+
+logger = DotyLogger()
+
+
+def read_homes(homes: list[str], homes_file: str = '') -> list[str]:
+    """Get the home directories given on the command line and in homes_file, one per line"""
+    homes = list(homes)
+
+    if homes_file:
+        with open(homes_file) as f:
+            homes.extend(line.strip() for line in f if line.strip() and not line.startswith('#'))
+
+    # Each home is reconciled once, in the order given
+    return list(dict.fromkeys(homes))
+
+
+def apply_fleet_cmd(homes: list[str], homes_file: str = '', jobs: int = None, dry_run: bool = False) -> bool:
+    """Link the dotfiles repo into many home directories. Returns False if any home had errors."""
+    homes = read_homes(homes, homes_file)
+
+    if not homes:
+        logger.error('##bred##No home directories given')
+        return False
+
+    if dry_run:
+        logger.info('\n##byellow##!!Dry run, no changes will be made!!')
+
+    logger.info(f'\n##bblue##Applying the dotfiles repo to {len(homes)} home directories\n')
+    results = apply_fleet(get_fleet_template(), homes, dry_run=dry_run, jobs=jobs)
+
+    for result in results:
+        if result.error:
+            logger.error(f'##bred##Error##end## ##bwhite##{result.home} - {result.error}')
+        elif result.changes or result.conflicts or result.failed:
+            logger.info(f'##bblue##{result.home}##end##\n{result.report}')
+
+    logger.info(fleet_summary(results))
+    return not any(result.error or result.failed for result in results)
@@ -0,0 +1,182 @@
+import os
+import stat
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+from classes.plan import Plan, PlanOp, MOVE_IN, MOVE_OUT, RENAME, LINK, UNLINK
+from classes.dirfs import DirFS
+from classes.logger import DotyLogger
+from classes.report import ShortReport2 as ShortReport
+from helpers.backend import get_lock_backend
+from helpers.utils import move_file, move_out, rename_file, DesinationExistsError
+
+logger = DotyLogger()
+
+DEFAULT_WORKERS = 8
+
+
+def get_workers() -> int:
+    """Get the number of threads a plan is applied with, set by DOTY_WORKERS in dotyrc. 1 applies it sequentially."""
+    workers = os.getenv('DOTY_WORKERS', '')
+
+    try:
+        return max(1, int(workers)) if workers else DEFAULT_WORKERS
+    except ValueError:
+        logger.warning(f'##byellow##Invalid DOTY_WORKERS value {workers}, using {DEFAULT_WORKERS}')
+        return DEFAULT_WORKERS
+
+
+def apply_op(op: PlanOp, fs=os) -> None:
+    """Make one planned operation on the filesystem, through fs, a DirFS or the os module"""
+    if op.op == UNLINK:
+        # A saved plan may be stale, only ever remove symlinks
+        if not stat.S_ISLNK(fs.lstat(op.path).st_mode):
+            raise DesinationExistsError(f'{op.path} is not a symlink.')
+
+        logger.debug(f'Unlinking {op.path}')
+        fs.unlink(op.path)
+    elif op.op == LINK:
+        logger.debug(f'Linking {op.target} to {op.path}')
+        fs.symlink(op.target, op.path)
+    elif op.op == MOVE_IN:
+        logger.debug(f'Moving {op.path} to {op.target}')
+        move_file(op.path, op.target, fs)
+    elif op.op == MOVE_OUT:
+        logger.debug(f'Removing {op.path} to {op.target}')
+        move_out(op.path, op.target, fs)
+    elif op.op == RENAME:
+        logger.debug(f'Renaming {op.path} to {op.target}')
+        rename_file(op.path, op.target, fs)
+
+
+def _try_apply(op: PlanOp, fs=os):
+    """Make an operation, returning the error instead of raising it"""
+    try:
+        apply_op(op, fs)
+    except (OSError, DesinationExistsError) as e:
+        return e
+
+    return None
+
+
+def make_dirs(batch: list[PlanOp]) -> None:
+    """Create the directories a batch moves files into or links in, before any of its operations are made"""
+    for op in batch:
+        if op.op not in (MOVE_IN, RENAME, LINK):
+            continue
+
+        # A link is made at its path, a moved file at its target
+        path = op.path if op.op == LINK else op.target
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        except OSError:
+            # The move itself fails and reports why
+            pass
+
+
+def remove_dirs(op: PlanOp) -> None:
+    """Remove directories made for an operation that failed, if they are still empty.
+    Directories made for links are left, they are in $HOME and may have been empty before.
+    """
+    if op.op not in (MOVE_IN, RENAME):
+        return
+
+    try:
+        os.removedirs(os.path.dirname(op.target))
+    except OSError:
+        pass
+
+
+def apply_batch(batch: list[PlanOp], report: ShortReport, pool: ThreadPoolExecutor = None, fs=os, wal=None) -> int:
+    """Make the operations of one batch, on the pool if one is given, recording each one that succeeds in the report.
+    The report is always updated in plan order, however the operations finish. Returns the number of operations that failed.
+    With an UpdateWAL, the batch is logged before it is made and which operations succeeded after.
+    """
+    if wal is not None:
+        wal.intent(batch)
+
+    make_dirs(batch)
+
+    if pool is not None and len(batch) > 1:
+        errors = list(pool.map(partial(_try_apply, fs=fs), batch))
+    else:
+        errors = [_try_apply(op, fs) for op in batch]
+
+    failed = 0
+
+    for op, e in zip(batch, errors):
+        if e is not None:
+            logger.error(f'##bred##Error##end## ##bwhite##File {op.entry.name} - {op.op} failed: {e}. Skipping...')
+            remove_dirs(op)
+            failed += 1
+            continue
+
+        op.report(report)
+
+    if wal is not None:
+        wal.finished(batch, errors)
+
+    return failed
+
+
+def apply_plan(
+    plan: Plan,
+    report: ShortReport = None,
+    dry_run: bool = False,
+    workers: int = None,
+    roots: tuple[str, ...] = None,
+    wal=None,
+) -> ShortReport:
+    """Apply a plan batch by batch, logging each batch in wal if one is given (see UpdateWAL).
+    With a wal, the plan stops at the first batch with a failure - the update is undone anyway,
+    and later batches may depend on what failed. On a dry run the plan is only recorded in the report.
+
+        The operations of a batch do not conflict with each other, so each batch is spread over
+        a pool of threads. Every move and symlink is a round trip on a network home directory,
+        making them at the same time hides most of that latency.
+    """
+    if report is None:
+        report = ShortReport()
+
+    if dry_run:
+        plan.report(report)
+        return report
+
+    if workers is None:
+        workers = get_workers()
+
+    if roots is None:
+        roots = tuple(filter(None, (os.getenv('HOME'), os.getenv('DOTFILES_PATH'))))
+
+    failed = 0
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 and len(plan) > 1 else None
+
+    # Only the roots are kept open, the plan may remove and create directories below them
+    fs = DirFS(roots, max_dirs=0)
+
+    try:
+        for batch in plan.batches(roots):
+            failed += apply_batch(batch, report, pool, fs, wal)
+
+            if failed and wal is not None:
+                logger.warning('##byellow##Stopping, the rest of the planned changes were not made')
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+        fs.close()
+
+    plan.failed = failed
+
+    if failed:
+        logger.warning(f'##byellow##{failed} of {len(plan)} planned changes could not be made')
+
+    return report
+
+
+def write_plan_locks(plan: Plan) -> None:
+    """Write the lock files of a plan. Lock files that were removed since it was made stay removed."""
+    for path, entries in plan.locks:
+        if os.path.exists(path):
+            get_lock_backend(path).write(entries)
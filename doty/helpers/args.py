@@ -17,6 +17,8 @@ def main_args() -> ArgumentParser:
     parser_update.add_argument('-C', '--no-commit', help='Do not commit changes to the git repo', action='store_true', dest='no_commit', default=False)
     parser_update.add_argument('-q', '--quiet', help='Suppress output', action='store_true', dest='quiet', default=False)
     parser_update.add_argument('-d', '--dry-run', help='Only output changes to be made, but do not make changes. Overrides quiet.', action='store_true', dest='dry_run', default=False)
+    parser_update.add_argument('-o', '--save-plan', help='Save the planned changes to a JSON file without making them. Implies dry run.', type=str, default='', dest='save_plan')
+    parser_update.add_argument('-p', '--plan', help='Apply a plan saved with --save-plan instead of comparing the lock file again', type=str, default='', dest='plan')
     
     # parser_status = subparser.add_parser('status', help='Show status of doty lock or config files', aliases=['st'])
     # parser_status.add_argument('-l', help='Show all files that are linked to your Home directory', action='store_const', const=1)
@@ -52,4 +54,17 @@ def main_args() -> ArgumentParser:
 
     paser_discover = subparser.add_parser('discover', help='Discover all doty entries in the dotfiles directory', aliases=['d'])
 
+    parser_recover = subparser.add_parser('recover', help='Undo the changes of an update that failed or was interrupted')
+    parser_recover.add_argument('--replay', help='Finish the update instead, making the changes it did not make and writing its lock files', action='store_true', dest='replay', default=False)
+
+    parser_fleet = subparser.add_parser('apply-fleet', help='Link the dotfiles repo into many home directories at once')
+    parser_fleet.add_argument('homes', help='Home directories to link the dotfiles into', type=str, nargs='*')
+    parser_fleet.add_argument('-f', '--homes-file', help='File with one home directory per line', type=str, default='', dest='homes_file')
+    parser_fleet.add_argument('-j', '--jobs', help='Number of processes to use, defaults to the number of CPUs', type=int, default=None, dest='jobs')
+    parser_fleet.add_argument('-d', '--dry-run', help='Only output changes to be made, but do not make changes', action='store_true', dest='dry_run', default=False)
+
+    parser_migrate = subparser.add_parser('migrate', help='Switch between a single doty_lock.yml and lock shards in .doty_config/lock.d')
+    parser_migrate.add_argument('layout', help='Lock file layout to switch to', choices=['sharded', 'single'])
+    parser_migrate.add_argument('-C', '--no-commit', help='Do not commit changes to the git repo', action='store_true', dest='no_commit', default=False)
+
     return parser
@@ -0,0 +1,187 @@
+import os
+import sqlite3
+from typing import Optional
+from classes.entry import FIELDS
+from classes.logger import DotyLogger
+from helpers.cache import get_cache_dir
+from helpers.journal import get_journal_path
+from helpers.utils import load_lock_file, write_lock_file, _lock_cache_root
+
+logger = DotyLogger()
+
+BACKENDS = ('yaml', 'sqlite')
+
+
+class YamlLockBackend:
+    """The default lock storage - the YAML lock file itself"""
+
+    name = 'yaml'
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def load(self) -> list[dict]:
+        return load_lock_file(self.path)
+
+    def write(self, entries: list[dict]) -> None:
+        write_lock_file(entries, self.path)
+
+    def find(self, field: str, value: str) -> Optional[dict]:
+        """Get the first entry whose field (name, dst or link_name) has the value"""
+        return next((entry for entry in self.load() if entry.get(field) == value), None)
+
+    def under(self, prefix: str) -> list[dict]:
+        """Get every entry whose dst starts with the prefix, e.g. all entries under nvim/"""
+        return [entry for entry in self.load() if entry.get('dst', '').startswith(prefix)]
+
+
+class SqliteLockBackend(YamlLockBackend):
+    """Lock storage in an SQLite database in the cache directory, indexed on name, dst and link_name.
+
+        The YAML lock file is still written on every change, with the same deterministic output as
+        the YAML backend, so make_commit keeps committing a reviewable lock file. The database is
+        only a faster copy of it - if the YAML (or its journal) was changed outside of doty, for
+        example by 'doty edit' or a git pull, the database is loaded from it again.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str) -> None:
+        super().__init__(path)
+        self.key = os.path.abspath(path)
+        root = _lock_cache_root(path) or os.path.dirname(self.key)
+        self.db_path = os.path.join(get_cache_dir(root), 'lock.db')
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript('''
+            CREATE TABLE IF NOT EXISTS entries (
+                lock TEXT NOT NULL,
+                pos INTEGER NOT NULL,
+                name TEXT,
+                src TEXT,
+                dst TEXT,
+                linked INTEGER,
+                link_name TEXT,
+                PRIMARY KEY (lock, pos)
+            );
+            CREATE INDEX IF NOT EXISTS entries_name ON entries (lock, name);
+            CREATE INDEX IF NOT EXISTS entries_dst ON entries (lock, dst);
+            CREATE INDEX IF NOT EXISTS entries_link_name ON entries (lock, link_name);
+            CREATE TABLE IF NOT EXISTS lock_source (
+                lock TEXT PRIMARY KEY,
+                state TEXT NOT NULL
+            );
+        ''')
+        return conn
+
+    def _source_state(self) -> str:
+        """The mtime and size of the YAML lock file and its journal, the files the database was loaded from.
+        They are only stat'ed, so checking an unchanged lock file never reads it.
+        """
+        state = []
+
+        for path in (self.path, get_journal_path(self.path)):
+            try:
+                st = os.stat(path)
+            except OSError:
+                state.append('-')
+                continue
+
+            state.append(f'{st.st_mtime_ns}:{st.st_size}')
+
+        return '|'.join(state)
+
+    def _store(self, conn: sqlite3.Connection, entries: list[dict], state: str) -> None:
+        conn.execute('DELETE FROM entries WHERE lock = ?', (self.key,))
+        conn.executemany(
+            'INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)',
+            [
+                (self.key, pos, *(_to_column(entry.get(field)) for field in FIELDS))
+                for pos, entry in enumerate(entries)
+            ]
+        )
+        conn.execute('INSERT OR REPLACE INTO lock_source VALUES (?, ?)', (self.key, state))
+
+    def _sync(self, conn: sqlite3.Connection) -> None:
+        """Load the YAML lock file into the database if it changed since the database was written"""
+        state = self._source_state()
+        row = conn.execute('SELECT state FROM lock_source WHERE lock = ?', (self.key,)).fetchone()
+
+        if row and row[0] == state:
+            return
+
+        with conn:
+            self._store(conn, super().load(), state)
+
+    def _select(self, where: str = '', params: tuple = (), limit: int = -1) -> list[dict]:
+        conn = self._connect()
+
+        try:
+            self._sync(conn)
+            rows = conn.execute(
+                f'SELECT name, src, dst, linked, link_name FROM entries WHERE lock = ? {where} ORDER BY pos LIMIT ?',
+                (self.key, *params, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        return [_from_row(row) for row in rows]
+
+    def load(self) -> list[dict]:
+        return self._select()
+
+    def write(self, entries: list[dict]) -> None:
+        """Write the database and export the YAML lock file in one transaction.
+        If the export fails, the database is rolled back.
+        """
+        entries = [_from_row([_to_column(entry.get(field)) for field in FIELDS]) for entry in entries]
+        conn = self._connect()
+
+        try:
+            with conn:
+                super().write(entries)
+                self._store(conn, entries, self._source_state())
+        finally:
+            conn.close()
+
+    def find(self, field: str, value: str) -> Optional[dict]:
+        if field not in ('name', 'dst', 'link_name', 'src'):
+            raise ValueError(f'Cannot look up entries by {field}')
+
+        found = self._select(f'AND {field} = ?', (value,), limit=1)
+        return found[0] if found else None
+
+    def under(self, prefix: str) -> list[dict]:
+        # A range on the dst index, instead of LIKE, so '%' and '_' in paths need no escaping
+        return self._select('AND dst >= ? AND dst < ?', (prefix, prefix + '\U0010ffff'))
+
+
+def _to_column(value):
+    return int(value) if isinstance(value, bool) else value
+
+
+def _from_row(row) -> dict:
+    """Build an entry dict from a row, leaving out values the lock file did not have"""
+    entry = {}
+
+    for field, value in zip(FIELDS, row):
+        if value is None:
+            continue
+
+        entry[field] = bool(value) if field == 'linked' else value
+
+    return entry
+
+
+def get_lock_backend(path: str, name: str = None) -> YamlLockBackend:
+    """Get the lock storage backend for a lock file, chosen by DOTY_LOCK_BACKEND in dotyrc. Defaults to yaml."""
+    name = (name or os.getenv('DOTY_LOCK_BACKEND') or 'yaml').lower()
+
+    if name not in BACKENDS:
+        logger.warning(f'##byellow##Unknown lock backend {name}, using yaml')
+
+    if name == 'sqlite':
+        return SqliteLockBackend(path)
+
+    return YamlLockBackend(path)
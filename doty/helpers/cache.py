@@ -0,0 +1,67 @@
+import os
+import json
+
+CACHE_DIR_NAME = 'cache'
+
+
+def get_cache_dir(dotfiles_path: str = None) -> str:
+    """Get the cache directory inside .doty_config, creating it if needed.
+    The directory ignores itself in git, so nothing in it is committed by make_commit.
+    """
+    if not dotfiles_path:
+        dotfiles_path = os.environ['DOTFILES_PATH']
+
+    cache_dir = os.path.join(dotfiles_path, '.doty_config', CACHE_DIR_NAME)
+
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(os.path.join(cache_dir, '.gitignore'), 'w') as f:
+            f.write('# Created by doty, everything in this directory is safe to delete.\n*\n')
+
+    return cache_dir
+
+
+def get_cache_path(name: str, dotfiles_path: str = None) -> str:
+    """Get the path of a named cache file, without creating anything"""
+    if not dotfiles_path:
+        dotfiles_path = os.environ['DOTFILES_PATH']
+
+    return os.path.join(dotfiles_path, '.doty_config', CACHE_DIR_NAME, f'{name}.json')
+
+
+def load_cache(name: str, dotfiles_path: str = None) -> dict:
+    """Load a named cache file. Missing or unreadable caches are treated as empty."""
+    try:
+        with open(get_cache_path(name, dotfiles_path), 'r') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_cache(name: str, cache: dict, dotfiles_path: str = None) -> None:
+    """Save a named cache file. The cache is written to a temp file first so readers never see a partial file.
+    Nothing is saved for a dotfiles directory that has not been initialized with a .doty_config directory.
+    """
+    path = get_cache_path(name, dotfiles_path)
+    tmp_path = path + '.tmp'
+
+    if not os.path.isdir(os.path.dirname(os.path.dirname(path))):
+        return
+
+    try:
+        get_cache_dir(dotfiles_path)
+        with open(tmp_path, 'w') as f:
+            json.dump(cache, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except (OSError, TypeError, ValueError):
+        pass
+
+
+def clear_cache(name: str, dotfiles_path: str = None) -> None:
+    """Remove a named cache file"""
+    try:
+        os.unlink(get_cache_path(name, dotfiles_path))
+    except OSError:
+        pass
@@ -0,0 +1,56 @@
+from collections import defaultdict
+from classes.entry import DotyEntry
+from classes.table import LockTable
+
+
+class LockDiff:
+    """The difference between the current and prior lock entries.
+
+        Entries are keyed by their identity (name) and by their content (fingerprint), so the
+        diff is built in a single pass over each list instead of comparing every entry pair.
+
+        diff_current and diff_prior keep the order of the original lists, and match what
+        get_lock_file_diff has always returned. The same changes are also grouped by name -
+            added - names only in the current lock
+            removed - names only in the prior lock
+            changed - (prior, current) pairs sharing a name whose values differ
+    """
+
+    def __init__(self, current_entries: list[DotyEntry], prior_entries: list[DotyEntry]) -> None:
+        current_fps = {entry.fingerprint for entry in current_entries}
+        prior_fps = {entry.fingerprint for entry in prior_entries}
+
+        self.diff_current = [entry for entry in current_entries if entry.fingerprint not in prior_fps]
+        self.diff_prior = [entry for entry in prior_entries if entry.fingerprint not in current_fps]
+
+        prior_by_name = defaultdict(list)
+        for entry in self.diff_prior:
+            prior_by_name[entry.name].append(entry)
+
+        self.added = []
+        self.changed = []
+
+        for entry in self.diff_current:
+            if prior_by_name[entry.name]:
+                self.changed.append((prior_by_name[entry.name].pop(0), entry))
+            else:
+                self.added.append(entry)
+
+        paired = {id(prior) for prior, _ in self.changed}
+        self.removed = [entry for entry in self.diff_prior if id(entry) not in paired]
+
+    def __bool__(self) -> bool:
+        return bool(self.diff_current or self.diff_prior)
+
+
+def diff_lock_entries(current_entries: list[DotyEntry], prior_entries: list[DotyEntry]) -> LockDiff:
+    """Diff the current and prior lock entries in O(n + m)"""
+    return LockDiff(current_entries, prior_entries)
+
+
+def diff_lock_tables(current: LockTable, prior: LockTable) -> LockDiff:
+    """Diff two lock tables. DotyEntry objects are only built for the rows that differ."""
+    return LockDiff(
+        current.entries(current.difference(prior)),
+        prior.entries(prior.difference(current))
+    )
@@ -1,36 +1,26 @@
 import os
 import yaml
 from classes.logger import DotyLogger
-from helpers.utils import load_lock_file
+from helpers.utils import iter_lock_file
+from helpers.scan import scan_dotfiles
+from classes.links import HomeLinkIndex
 
 logger = DotyLogger()
 
 def find_all_dotfiles() -> list:
     """Find all dotfiles in the user's dotfile directory."""
-    dot_dir = os.path.join(os.environ['HOME'], 'dotfiles')
-    dotfiles = []
+    return list(scan_dotfiles())
 
-    for root, dirs, files in os.walk(dot_dir):
-        # Skips .doty_config
-        if '.doty_config' in dirs:
-            dirs.remove('.doty_config')
-        if '.git' in dirs:
-            dirs.remove('.git')
-
-        for file in files:
-            if file == '.gitignore':
-                continue
-            dotfiles.append(os.path.join(root, file))
-    return dotfiles
-
-def _find_all_links(dotfiles: list) -> list:
+def _find_all_links(dotfiles: list, home_links: HomeLinkIndex = None) -> list:
     """Find all links in the user's home directory."""
+    if home_links is None:
+        home_links = HomeLinkIndex()
+
     links = []
     for dotfile in dotfiles:
         base = os.path.basename(dotfile)
-        home_path = os.path.join(os.environ['HOME'], base)
-        if os.path.islink(home_path):
-            links.append(home_path)
+        if home_links.islink(base):
+            links.append(home_links.path(base))
     return links
 
 def _get_doty_ignore() -> list:
@@ -59,15 +49,14 @@ def _discover() -> list:
 def discover() -> list:
     """Find any files in the dotfiles directory which are not linked yet"""
     doty_lock_path = os.path.join(os.environ['DOTFILES_PATH'], '.doty_config', 'doty_lock.yml')
-    dotfiles = find_all_dotfiles()
 
+    # Entries are streamed, only their dsts are kept
     try:
-        lock_entries = load_lock_file(doty_lock_path)
+        current_dsts = {entry['dst'] for entry in iter_lock_file(doty_lock_path)}
     except yaml.YAMLError as e:
         logger.critical('##bred##YAML file is invalid. Please check the file and try again.')
         exit(1)
 
-    current_dsts = [entry['dst'] for entry in lock_entries]
-    new_dotfiles = [df for df in dotfiles if df not in current_dsts]
+    new_dotfiles = [df for df in scan_dotfiles() if df not in current_dsts]
 
     
\ No newline at end of file
@@ -0,0 +1,129 @@
+import os
+import hashlib
+import pygit2
+from classes.entry import DotyEntry
+from classes.logger import DotyLogger
+from helpers.cache import load_cache, save_cache, clear_cache
+from helpers.git import get_repo, last_commit_oid
+from helpers.utils import load_lock_file
+from helpers.journal import has_journal
+from helpers.shards import is_sharded
+
+logger = DotyLogger()
+
+LOCK_FILE_NAME = '.doty_config/doty_lock.yml'
+
+
+def get_lock_path() -> str:
+    return os.path.join(os.environ['DOTFILES_PATH'], '.doty_config', 'doty_lock.yml')
+
+
+def get_state_paths(entries: list[DotyEntry]) -> list[str]:
+    """Get every path whose state an update depends on - the dst and the link of each entry"""
+    paths = []
+
+    for entry in entries:
+        paths.append(entry.dst)
+        paths.append(os.path.join(os.path.dirname(entry.src), entry.link_name))
+
+    return paths
+
+
+def get_state_digest(paths: list[str]) -> str:
+    """Hash the lstat of every path. Moving, editing, linking or unlinking any of them changes the digest."""
+    digest = hashlib.sha1()
+
+    for path in paths:
+        try:
+            st = os.lstat(path)
+        except OSError:
+            digest.update(b'-\n')
+            continue
+
+        digest.update(f'{st.st_mode}:{st.st_ino}:{st.st_size}:{st.st_mtime_ns}\n'.encode())
+
+    return digest.hexdigest()
+
+
+def is_settled(entry: DotyEntry) -> bool:
+    """Check that an entry's dst exists and its link matches the linked value, so an update would not retry it"""
+    link_path = os.path.join(os.path.dirname(entry.src), entry.link_name)
+    return os.path.exists(entry.dst) and entry.linked == os.path.islink(link_path)
+
+
+def save_update_state(doty_lock_path: str = None) -> None:
+    """Save the lock file's blob id and a digest of every dst and link once an update leaves nothing to do.
+    If any entry is still not where it should be, the state is cleared instead so the next update retries it.
+    """
+    if not doty_lock_path:
+        doty_lock_path = get_lock_path()
+
+    if not os.path.exists(doty_lock_path):
+        clear_update_state()
+        return
+
+    entries = DotyEntry.from_many(load_lock_file(doty_lock_path))
+
+    if not all(is_settled(entry) for entry in entries):
+        logger.debug('Entries still need updating, not saving update state')
+        clear_update_state()
+        return
+
+    paths = get_state_paths(entries)
+
+    save_cache('update_state', {
+        'lock_oid': str(pygit2.hashfile(doty_lock_path)),
+        'paths': paths,
+        'digest': get_state_digest(paths)
+    })
+
+
+def clear_update_state() -> None:
+    clear_cache('update_state')
+
+
+def is_unchanged(doty_lock_path: str = None) -> bool:
+    """Check if an update would find nothing to do, without parsing the lock file.
+
+    True when the lock file is the same as the one in the last commit and as the one saved after the last
+    update, no dst or link has changed since, and git has no modified files to commit.
+    """
+    if not doty_lock_path:
+        doty_lock_path = get_lock_path()
+
+    # The sharded layout only reconciles changed shards already
+    if is_sharded():
+        return False
+
+    state = load_cache('update_state')
+
+    if not state:
+        return False
+
+    # Journaled changes are not in the lock file yet
+    if has_journal(doty_lock_path):
+        logger.debug('Lock file has a journal')
+        return False
+
+    try:
+        lock_oid = str(pygit2.hashfile(doty_lock_path))
+    except (OSError, pygit2.GitError):
+        return False
+
+    repo = get_repo()
+
+    if lock_oid != state['lock_oid'] or lock_oid != last_commit_oid(LOCK_FILE_NAME, repo):
+        logger.debug('Lock file changed since the last update')
+        return False
+
+    if get_state_digest(state['paths']) != state['digest']:
+        logger.debug('Dotfiles or links changed since the last update')
+        return False
+
+    # Edits inside a directory dst, or to tracked files that are not entries, only show in git status.
+    # libgit2 compares the working tree to the index by stat, files are only read when their stat changed
+    if any(flags & pygit2.GIT_STATUS_WT_MODIFIED for flags in repo.status().values()):
+        logger.debug('Tracked files were modified since the last update')
+        return False
+
+    return True
@@ -0,0 +1,207 @@
+import os
+from typing import Iterable, NamedTuple
+from concurrent.futures import ProcessPoolExecutor
+from classes.entry import DotyEntry
+from classes.table import LockTable
+from classes.stats import StatCache
+from classes.dirfs import DirFS
+from classes.plan import Plan, LINK, UNLINK
+from classes.logger import DotyLogger
+from helpers.apply import apply_plan
+from helpers.lock import get_roots, load_prior_lock, load_prior_shards
+from helpers.shards import load_lock_entries, list_prior_shards
+
+logger = DotyLogger()
+
+# Set in each worker process by _init_worker, so the template is sent once per process and not once per home
+_template = None
+
+
+class FleetTemplate(NamedTuple):
+    """The entries of a lock file with each src relative to its home directory, so one template fits every home.
+
+        entries are the current entries and removed the prior ones that are not current anymore,
+        as values in the order of FIELDS. Every dst is in the shared dotfiles directory.
+    """
+    dotfiles: str
+    entries: list[tuple]
+    removed: list[tuple]
+
+    def instantiate(self, home: str) -> tuple[list[DotyEntry], list[DotyEntry]]:
+        """Get the current and removed entries of one home directory"""
+        def build(values: tuple) -> DotyEntry:
+            name, src, dst, linked, link_name = values
+            return DotyEntry.from_values((name, os.path.join(home, src), dst, linked, link_name))
+
+        return [build(values) for values in self.entries], [build(values) for values in self.removed]
+
+
+class HomeResult(NamedTuple):
+    """The outcome of reconciling one home directory, small enough to send back from a worker process"""
+    home: str
+    report: str = ''
+    added: int = 0
+    removed: int = 0
+    updated: int = 0
+    conflicts: int = 0
+    failed: int = 0
+    error: str = ''
+
+    @property
+    def changes(self) -> bool:
+        return bool(self.added or self.removed or self.updated)
+
+
+def _relative(table: LockTable, home: str) -> list[tuple]:
+    """Get the values of every row whose src is in home, with src made relative to it"""
+    rows = []
+
+    for row in table:
+        src = os.path.relpath(row.src, home)
+
+        if src == os.pardir or src.startswith(os.pardir + os.sep):
+            logger.warning(f'##byellow##Entry##end## ##bwhite##{row.name}##byellow## is not in {home}, skipping it in fleet mode')
+            continue
+
+        rows.append((row.name, src, row.dst, row.linked, row.link_name))
+
+    return rows
+
+
+def build_fleet_template(
+    current_yaml: list[dict], prior_yaml: list[dict], home: str, dotfiles: str
+) -> FleetTemplate:
+    """Build the template of a fleet from the lock entries, filled in relative to home, the home the lock file was written for.
+    Current entries whose file is missing from the dotfiles directory are left out, there is nothing to link them to.
+    """
+    entries = []
+
+    for values in _relative(LockTable.from_dicts(current_yaml, home=home, dotfiles=dotfiles), home):
+        if not os.path.exists(values[2]):
+            logger.warning(f'##byellow##Entry##end## ##bwhite##{values[0]}##byellow## - {values[2]} does not exist, skipping it')
+            continue
+
+        entries.append(values)
+
+    current = set(entries)
+    prior = _relative(LockTable.from_dicts(prior_yaml, home=home, dotfiles=dotfiles), home)
+
+    return FleetTemplate(dotfiles, entries, [values for values in prior if values not in current])
+
+
+def get_fleet_template(dotfiles: str = None) -> FleetTemplate:
+    """Load the lock files once, current and from the last commit, and build the template every home is reconciled with"""
+    home, dotfiles = get_roots(None, dotfiles)
+
+    # Right after merging shards back into one file, the last commit only has the shards
+    prior_yaml = load_prior_lock() or load_prior_shards(list_prior_shards())
+
+    return build_fleet_template(load_lock_entries(dotfiles), prior_yaml, home, dotfiles)
+
+
+def plan_home(template: FleetTemplate, home: str, stats: StatCache) -> tuple[Plan, int]:
+    """Plan the links of one home directory. Files are never moved, the dotfiles directory is shared by every home.
+
+        Links of removed entries are unlinked, and the links of current entries are made or
+        removed to match their linked value. Only symlinks that point to the entry's dst are
+        ever removed, and a link that would replace anything else is a conflict and is skipped.
+        Returns the plan and the number of conflicts.
+    """
+    plan = Plan()
+    current, removed = template.instantiate(home)
+    conflicts = 0
+
+    # A removed entry whose link is still wanted by a current one keeps it
+    wanted = {entry.linked_path: entry.dst for entry in current if entry.linked}
+
+    for entry in removed:
+        link_path = entry.linked_path
+
+        if entry.linked and wanted.get(link_path) != entry.dst and stats.readlink(link_path) == entry.dst:
+            plan.add(UNLINK, link_path, entry.dst, entry.link_name, entry)
+            stats.unlinked(link_path)
+
+    for entry in current:
+        link_path = entry.linked_path
+        target = stats.readlink(link_path)
+
+        if not entry.linked:
+            if target == entry.dst:
+                plan.add(UNLINK, link_path, entry.dst, entry.link_name, entry)
+                stats.unlinked(link_path)
+            continue
+
+        if target == entry.dst:
+            continue
+
+        if stats.lexists(link_path):
+            logger.error(f'##bred##Error##end## ##bwhite##File {entry.name} - {link_path} already exists. Skipping...')
+            conflicts += 1
+            continue
+
+        plan.add(LINK, link_path, entry.dst, entry.link_name, entry)
+        stats.linked(link_path, entry.dst)
+
+    return plan, conflicts
+
+
+def apply_home(template: FleetTemplate, home: str, dry_run: bool = False) -> HomeResult:
+    """Plan and apply the links of one home directory"""
+    if not os.path.isdir(home):
+        return HomeResult(home, error='not a directory')
+
+    roots = (home, template.dotfiles)
+
+    try:
+        with DirFS(roots) as fs:
+            plan, conflicts = plan_home(template, home, StatCache(fs=fs))
+
+        # The homes are already spread over processes
+        report = apply_plan(plan, dry_run=dry_run, workers=1, roots=roots)
+    except OSError as e:
+        return HomeResult(home, error=str(e))
+
+    report.gen_full_report({})
+    return HomeResult(home, str(report), *report.links_count, conflicts, plan.failed)
+
+
+def _init_worker(template: FleetTemplate) -> None:
+    global _template
+    _template = template
+
+
+def _apply_worker(home: str, dry_run: bool) -> HomeResult:
+    return apply_home(_template, home, dry_run)
+
+
+def apply_fleet(
+    template: FleetTemplate, homes: Iterable[str], dry_run: bool = False, jobs: int = None
+) -> list[HomeResult]:
+    """Reconcile every home directory with the template, over a pool of jobs processes. Results are in the order of homes."""
+    homes = [os.path.normpath(os.path.expanduser(home)) for home in homes]
+
+    if not jobs:
+        jobs = os.cpu_count() or 1
+
+    jobs = min(jobs, len(homes))
+
+    if jobs <= 1:
+        return [apply_home(template, home, dry_run) for home in homes]
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(template,)) as pool:
+        return list(pool.map(_apply_worker, homes, [dry_run] * len(homes)))
+
+
+def fleet_summary(results: list[HomeResult]) -> str:
+    """Sum the results of every home into one report"""
+    changed = sum(1 for result in results if result.changes)
+    errors = [result for result in results if result.error or result.failed]
+
+    return '\n'.join([
+        f'##bwhite##Homes:##end## {len(results)} - {changed} changed, {len(errors)} with errors',
+        f'##bgreen##Added##end## Links: {sum(result.added for result in results)}',
+        f'##bred##Removed##end## Links: {sum(result.removed for result in results)}',
+        f'##bblue##Updated##end## Links: {sum(result.updated for result in results)}',
+        f'##byellow##Conflicts##end## {sum(result.conflicts for result in results)}',
+        f'##bred##Failed##end## {sum(result.failed for result in results)}',
+    ]) + '\n'
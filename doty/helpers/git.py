@@ -71,6 +71,18 @@ def last_commit_file(file_name: str) -> str:
 
     return file
 
+def last_commit_oid(file_name: str, repo: Repository = None) -> str:
+    """Get the blob id of a file in the last commit without reading the file, or '' if it is not in the commit"""
+    if repo is None:
+        repo = get_repo()
+
+    last_commit = repo[prior_commit_hex(repo)]
+
+    try:
+        return str(last_commit.tree[file_name].id)
+    except KeyError:
+        return ''
+
 def last_commit_file2(repo: Repository, file_name: str) -> str:
     last_commit = find_last_commit(repo, file_name)
 
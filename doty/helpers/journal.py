@@ -0,0 +1,111 @@
+import os
+import json
+
+JOURNAL_EXT = '.journal'
+
+
+def get_journal_path(lock_path: str) -> str:
+    """Get the path of the journal kept next to a lock file, e.g. doty_lock.yml -> doty_lock.journal"""
+    return os.path.splitext(lock_path)[0] + JOURNAL_EXT
+
+
+def has_journal(lock_path: str) -> bool:
+    return os.path.exists(get_journal_path(lock_path))
+
+
+def append_records(path: str, records: list[dict]) -> None:
+    """Append records to a JSON lines file.
+    All records are written with one write call and synced, so a crash loses at most the last line.
+    """
+    data = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    try:
+        os.write(fd, data.encode('utf-8'))
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_records(path: str) -> list[dict]:
+    """Read the records of a JSON lines file. A line cut off by a crash is ignored."""
+    try:
+        with open(path, 'r') as f:
+            lines = f.readlines()
+    except OSError:
+        return []
+
+    records = []
+
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+
+        if isinstance(record, dict):
+            records.append(record)
+
+    return records
+
+
+def append_journal(lock_path: str, record: dict) -> None:
+    """Append one change to the lock file's journal.
+    Each record is a single JSON line, written with one write call and synced, so the cost of a change
+    does not depend on the size of the lock file.
+    """
+    append_records(get_journal_path(lock_path), [record])
+
+
+def read_journal(lock_path: str) -> list[dict]:
+    """Read the records of a lock file's journal. A line cut off by a crash is ignored."""
+    return read_records(get_journal_path(lock_path))
+
+
+def replay_journal(entries: list[dict], records: list[dict]) -> list[dict]:
+    """Apply journal records on top of the entries of a lock file snapshot.
+
+        add - {'op': 'add', 'entry': {...}} adds the entry if its name is not in the lock file
+        remove - {'op': 'remove', 'name': ...} removes the entry with that name
+        link - {'op': 'link', 'name': ..., 'linked': bool} sets the linked value of the entry with that name
+    """
+    if not records:
+        return entries
+
+    entries = list(entries)
+    names = {entry['name']: entry for entry in reversed(entries) if 'name' in entry}
+
+    for record in records:
+        op = record.get('op')
+
+        if op == 'add':
+            entry = record['entry']
+
+            if entry['name'] not in names:
+                entries.append(entry)
+                names[entry['name']] = entry
+        elif op == 'remove':
+            entry = names.pop(record['name'], None)
+
+            if entry is not None:
+                del entries[_position(entries, entry)]
+        elif op == 'link':
+            entry = names.get(record['name'])
+
+            if entry is not None:
+                entries[_position(entries, entry)] = names[record['name']] = { **entry, 'linked': record['linked'] }
+
+    return entries
+
+
+def _position(entries: list[dict], entry: dict) -> int:
+    """Find an entry by identity, since two entries can have the same values"""
+    return next(i for i, e in enumerate(entries) if e is entry)
+
+
+def clear_journal(lock_path: str) -> None:
+    """Remove a lock file's journal, once everything in it has been written to the lock file"""
+    try:
+        os.unlink(get_journal_path(lock_path))
+    except OSError:
+        pass
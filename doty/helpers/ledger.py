@@ -0,0 +1,112 @@
+import os
+from typing import Optional
+from classes.stats import StatCache
+from classes.plan import Plan
+from helpers.cache import load_cache, save_cache
+
+LEDGER_VERSION = 1
+
+
+def entry_key(entry) -> str:
+    """The ledger key of an entry, its fingerprint"""
+    return '\0'.join(map(str, entry.fingerprint))
+
+
+def path_state(path: str, stats: StatCache) -> Optional[list[int]]:
+    """The inode and mtime of a path, or None if nothing is there"""
+    st = stats.lstat(path)
+    return [st.st_ino, st.st_mtime_ns] if st is not None else None
+
+
+class Ledger:
+    """The last verified state of each entry, kept between runs in .doty_config/cache/ledger.json.
+
+        An entry is recorded once check_for_mismatch finds its dst in place and its link matching
+        its linked value, with the inode and mtime of its dst and of its link path. The ledger
+        also records the inode and mtime of the directories those paths are in. A path cannot be
+        created, removed, renamed or replaced without changing its directory's mtime, so as long
+        as a directory is unchanged nothing in it has to be stat'ed at all. When it has changed,
+        only the recorded paths in it are stat'ed and compared.
+
+        Entries are recorded by fingerprint, so an entry whose values change is verified again.
+        The ledger is only trusted while the filesystem matches it, so a stale ledger never hides
+        a broken entry, it only makes the next run check more.
+    """
+
+    def __init__(self, entries: dict = None, dirs: dict = None) -> None:
+        self.entries = entries if entries is not None else {}
+        self.dirs = dirs if dirs is not None else {}
+        self._verified = {}
+        self._seen_dirs = {}
+
+    @classmethod
+    def load(cls, dotfiles_path: str = None) -> 'Ledger':
+        cache = load_cache('ledger', dotfiles_path)
+
+        if cache.get('version') != LEDGER_VERSION:
+            return cls()
+
+        return cls(cache.get('entries', {}), cache.get('dirs', {}))
+
+    def _dir_state(self, directory: str, stats: StatCache) -> Optional[list[int]]:
+        """The state of a directory, taken the first time it is needed in this run"""
+        if directory not in self._seen_dirs:
+            self._seen_dirs[directory] = path_state(directory, stats)
+
+        return self._seen_dirs[directory]
+
+    def _paths(self, entry, stats: StatCache) -> tuple[str, str]:
+        return entry.dst, stats.links.path(entry.link_name)
+
+    def is_verified(self, entry, stats: StatCache) -> bool:
+        """Check an entry against its recorded state, without verifying it again"""
+        paths = self._paths(entry, stats)
+
+        # Directories are stat'ed before anything in them, so a change made in between is never
+        # hidden by a directory state that is newer than the states of the paths in it
+        dir_states = [self._dir_state(os.path.dirname(path), stats) for path in paths]
+
+        key = entry_key(entry)
+        record = self.entries.get(key)
+
+        if record is None:
+            return False
+
+        for path, state, dir_state in zip(paths, record, dir_states):
+            if dir_state is not None and dir_state == self.dirs.get(os.path.dirname(path)):
+                continue
+
+            if path_state(path, stats) != state:
+                return False
+
+        self._verified[key] = record
+        return True
+
+    def verified(self, entry, stats: StatCache) -> None:
+        """Record that an entry was verified in this run. is_verified must have been called for it first."""
+        paths = self._paths(entry, stats)
+        self._verified[entry_key(entry)] = [path_state(path, stats) for path in paths]
+
+    def __contains__(self, entry) -> bool:
+        """Check whether an entry was verified in this run"""
+        return entry_key(entry) in self._verified
+
+    def save(self, plan: Plan = None, dotfiles_path: str = None) -> None:
+        """Save the entries verified in this run, once the plan made from them was applied.
+        Entries and directories the plan changed are left out, they are verified again next run.
+        """
+        changed_dirs, changed_entries = set(), set()
+
+        for op in plan or ():
+            changed_dirs.update(os.path.dirname(key) for key in op.keys())
+            changed_dirs.update(op.keys())
+            changed_entries.update(entry_key(entry) for entry in (op.entry, op.prior) if entry is not None)
+
+        entries = {key: record for key, record in self._verified.items() if key not in changed_entries}
+        dirs = {
+            directory: state
+            for directory, state in self._seen_dirs.items()
+            if state is not None and directory not in changed_dirs
+        }
+
+        save_cache('ledger', {'version': LEDGER_VERSION, 'entries': entries, 'dirs': dirs}, dotfiles_path)
@@ -1,183 +1,395 @@
 import os
 import yaml
-from helpers.git import last_commit_file
-from helpers.utils import load_lock_file, write_lock_file, move_file, move_out
+from typing import Iterable, Optional
+from pygit2 import Repository
+from helpers.git import get_repo, last_commit_oid
+from helpers.cache import load_cache, save_cache
+from helpers.utils import parse_entries
+from helpers.diff import diff_lock_entries, diff_lock_tables
+from helpers.yaml_io import iter_yaml_sequence
+from helpers.backend import get_lock_backend
+from helpers.apply import apply_plan, write_plan_locks
+from helpers.ledger import Ledger
+from helpers.wal import UpdateWAL
+from helpers.shards import (
+    SHARD_DIR_NAME,
+    is_sharded,
+    get_shard_path,
+    get_changed_shards,
+    list_prior_shards,
+)
 from classes.entry import DotyEntry
+from classes.table import LockTable
+from classes.links import HomeLinkIndex
+from classes.stats import StatCache
+from classes.dirfs import DirFS
+from classes.plan import Plan, MOVE_IN, MOVE_OUT, RENAME, LINK, UNLINK
 from classes.logger import DotyLogger
 from classes.report import ShortReport2 as ShortReport
 
 logger = DotyLogger()
 
 
-def parse_entries(entries: list[dict, str]) -> list[dict]:
-    """Since the minimum required value for an entry is a string representing a file name,
-    this function will convert the string to a dict.
+def get_roots(home: str = None, dotfiles: str = None) -> tuple[str, str]:
+    """Get the home and dotfiles directories to plan for, defaulting to $HOME and $DOTFILES_PATH.
+    Only the entry points read the environment, the planners below are given both directories.
     """
-    parsed_entries = []
+    return home or os.environ["HOME"], dotfiles or os.environ["DOTFILES_PATH"]
 
-    for entry in entries:
-        if isinstance(entry, str):
-            parsed_entries.append({"name": entry})
-        elif isinstance(entry, dict):
-            parsed_entries.append(entry)
-        else:
-            logger.error(f"##bred##Error##end## ##bwhite##Invalid entry: {entry}")
 
-    return parsed_entries
+def get_stat_cache(stats: StatCache = None, fs=os, home: str = None) -> StatCache:
+    """Get a StatCache with a HomeLinkIndex of home attached, reusing the given cache when it already has one.
+    home and its subdirectories are only scanned once a link in them is looked up.
+    """
+    if stats is None or stats.links is None:
+        stats = StatCache(HomeLinkIndex(home or get_roots()[0]), fs=fs)
+
+    return stats
+
+
+def as_entry(entry) -> DotyEntry:
+    """Get the DotyEntry for a LockTable row. DotyEntry objects are returned as they are."""
+    to_entry = getattr(entry, "to_entry", None)
+    return to_entry() if to_entry else entry
+
+
+def load_prior_lock(file_name: str = ".doty_config/doty_lock.yml", repo: Repository = None) -> list[dict]:
+    """Load the lock file from the last commit.
+    The parsed entries are cached by the file's blob id, so the blob is only read and parsed when it changes.
+    """
+    if repo is None:
+        repo = get_repo()
+
+    oid = last_commit_oid(file_name, repo)
+
+    if not oid:
+        return []
+
+    cache = load_cache("prior_lock")
+    cached = cache.get(file_name)
+
+    if isinstance(cached, dict) and cached.get("oid") == oid:
+        return cached["entries"]
+
+    entries = parse_entries(iter_yaml_sequence(repo[oid].data))
+    cache[file_name] = {"oid": oid, "entries": entries}
+    save_cache("prior_lock", cache)
+
+    return entries
+
+
+def load_prior_shards(shards: list[str], repo: Repository = None) -> list[dict]:
+    """Load the given lock shards from the last commit, in order"""
+    if repo is None:
+        repo = get_repo()
+
+    entries = []
+
+    for shard in shards:
+        entries.extend(load_prior_lock(f"{SHARD_DIR_NAME}/{shard}.yml", repo))
+
+    return entries
 
 
 def get_lock_files(doty_lock_path: str) -> tuple[list[dict], list[dict]]:
     """Get the prior and current yaml file"""
     try:
-        prior_yaml = yaml.safe_load(last_commit_file(".doty_config/doty_lock.yml"))
-        current_yaml = load_lock_file(doty_lock_path)
+        prior_yaml = load_prior_lock()
+
+        # Right after merging shards back into one file, the last commit only has the shards
+        if not prior_yaml:
+            prior_yaml = load_prior_shards(list_prior_shards())
+
+        current_yaml = get_lock_backend(doty_lock_path).load()
     except yaml.YAMLError:
         logger.critical(
             "##bred##YAML file is invalid. Please check the file and try again."
         )
         exit(1)
 
-    # Parse new entries
-    current_yaml = parse_entries(current_yaml)
-
-    return prior_yaml or [], current_yaml or []
+    return prior_yaml, current_yaml
 
 
 def get_lock_file_diff(
     current_entries: list[DotyEntry], prior_entries: list[DotyEntry]
 ) -> tuple[list[DotyEntry], list[DotyEntry]]:
     """Get the difference between the current and prior yaml file"""
-    diff_current = [item for item in current_entries if item not in prior_entries]
-    diff_prior = [item for item in prior_entries if item not in current_entries]
+    lock_diff = diff_lock_entries(current_entries, prior_entries)
 
-    return diff_current, diff_prior
+    return lock_diff.diff_current, lock_diff.diff_prior
 
 
 def check_for_mismatch(
-    diff_current: list[DotyEntry], current_entries: list[DotyEntry]
+    diff_current: list[DotyEntry],
+    current_entries: Iterable[DotyEntry],
+    stats: StatCache = None,
+    ledger: Ledger = None,
 ) -> list[DotyEntry]:
-    """Checks for entries that haven't changed from prior commit, but still may not be correct"""
+    """Checks for entries that haven't changed from prior commit, but still may not be correct.
+    Entries whose state still matches the ledger are not checked again, entries that pass are recorded in it.
+    """
+    stats = get_stat_cache(stats)
+    links = stats.links
+
+    queued = {entry.fingerprint for entry in diff_current}
 
     for entry in current_entries:
-        if entry in diff_current:
+        if entry.fingerprint in queued:
+            continue
+
+        if ledger is not None and ledger.is_verified(entry, stats):
             continue
 
-        if not os.path.exists(entry.dst):
+        if not stats.exists(entry.dst):
             logger.warning(
                 f"##bblue##Entry##end## ##bwhite##{entry.name}##bblue## not in correct dst - adding to queue"
             )
-            diff_current.append(entry)
+            diff_current.append(as_entry(entry))
             continue
 
-        link_path = os.path.join(os.environ["HOME"], entry.link_name)
-
-        if entry.linked and not os.path.islink(link_path):
+        if entry.linked and not links.islink(entry.link_name):
             logger.warning(
                 f"##bblue##Entry##end## ##bwhite##{entry.name}##bblue## not linked - adding to queue"
             )
-            diff_current.append(entry)
+            diff_current.append(as_entry(entry))
             continue
 
-        if not entry.linked and os.path.islink(link_path):
+        if not entry.linked and links.islink(entry.link_name):
             logger.warning(
                 f"##bblue##Entry##end## ##bwhite##{entry.name}##bblue## linked, but should not be - adding to queue"
             )
-            diff_current.append(entry)
+            diff_current.append(as_entry(entry))
             continue
 
+        if ledger is not None:
+            ledger.verified(entry, stats)
+
     return diff_current
 
-def fix_links(current_entries: list[DotyEntry], report: ShortReport) -> ShortReport:
-    """Checks for entries that haven't changed from prior commit, but still may not be correct"""
+def plan_fix_links(
+    current_entries: Iterable[DotyEntry], plan: Plan, stats: StatCache = None, ledger: Ledger = None
+) -> Plan:
+    """Plans links for linked entries that are missing one, and unlinks for unlinked entries that still have one.
+    Entries the ledger verified in this run already have the right link.
+    """
+    stats = get_stat_cache(stats)
+    links = stats.links
 
     for entry in current_entries:
-        link_path = os.path.join(os.environ["HOME"], entry.link_name)
+        if ledger is not None and entry in ledger:
+            continue
 
-        if entry.linked and not os.path.exists(link_path):
-            os.symlink(entry.dst, link_path)
-            report.add_link(entry.link_name, entry)
+        link_path = links.path(entry.link_name)
+
+        if entry.linked and not links.exists(entry.link_name):
+            stats.linked(link_path, entry.dst)
+            plan.add(LINK, link_path, entry.dst, entry.link_name, as_entry(entry))
             continue
 
-        if not entry.linked and os.path.islink(link_path):
-            os.unlink(link_path)
-            report.rm_link(entry.link_name, entry)
+        if not entry.linked and links.islink(entry.link_name):
+            plan.add(UNLINK, link_path, stats.readlink(link_path) or "", entry.link_name, as_entry(entry))
+            stats.unlinked(link_path)
             continue
 
-    return report
+    return plan
 
 
-def handle_prior_lock_changes(
-    lock_changes: list[DotyEntry], report: ShortReport, dry_run: bool = False
-) -> None:
+def fix_links(
+    current_entries: Iterable[DotyEntry], report: ShortReport, stats: StatCache = None
+) -> ShortReport:
+    """Checks for entries that haven't changed from prior commit, but still may not be correct"""
+    return apply_plan(plan_fix_links(current_entries, Plan(), stats=stats), report)
+
+
+def split_lock_renames(
+    changed: list[tuple[DotyEntry, DotyEntry]],
+    diff_current: list[DotyEntry],
+    diff_prior: list[DotyEntry],
+) -> tuple[list[tuple[DotyEntry, DotyEntry]], list[DotyEntry], list[DotyEntry]]:
+    """Pulls entries that kept their name and src, but changed their dst or link, out of the diff lists
+    so they can be renamed or relinked in place instead of being moved out and back in.
+    """
+    pending = {id(entry) for entry in diff_current}
+    renames = [
+        (prior, current)
+        for prior, current in changed
+        if prior.src == current.src and id(current) in pending
+    ]
+
+    if not renames:
+        return renames, diff_current, diff_prior
+
+    renamed = {id(entry) for pair in renames for entry in pair}
+    diff_current = [entry for entry in diff_current if id(entry) not in renamed]
+    diff_prior = [entry for entry in diff_prior if id(entry) not in renamed]
+
+    return renames, diff_current, diff_prior
+
+
+def plan_lock_renames(
+    renames: list[tuple[DotyEntry, DotyEntry]],
+    plan: Plan,
+    stats: StatCache = None,
+    dotfiles: str = None,
+) -> list[tuple[DotyEntry, DotyEntry]]:
+    """Plans entries whose dst, link_name, or linked value changed by renaming the file within the
+    dotfiles directory and relinking it, rather than moving it out to src and back in again.
+
+    Returns any renames that could not be done in place, so they can be handled as a removal and an addition.
+    """
+    dotfiles_dir = dotfiles or get_roots()[1]
+    if stats is None:
+        stats = StatCache()
+
+    logger.debug("Planning lock renames")
+    fallback = []
+
+    for prior, current in renames:
+        logger.debug(f"Entry: {current.name}")
+        directory = os.path.split(current.src)[0]
+        prior_link = os.path.join(directory, prior.link_name)
+        current_link = os.path.join(directory, current.link_name)
+        moved = prior.dst != current.dst
+
+        # The file has to already be in the dotfiles directory to rename it in place
+        if not stats.exists(prior.dst) or stats.islink(prior.dst):
+            logger.debug(f"{prior.dst} does not exist, handling {current.name} as a move")
+            fallback.append((prior, current))
+            continue
+
+        if moved and (stats.exists(current.dst) or not current.dst.startswith(dotfiles_dir)):
+            logger.debug(f"{current.dst} is not available, handling {current.name} as a move")
+            fallback.append((prior, current))
+            continue
+
+        relink = prior.linked and (
+            not current.linked or moved or prior_link != current_link
+        )
+
+        if relink and stats.islink(prior_link):
+            plan.add(UNLINK, prior_link, stats.readlink(prior_link) or "", current.name, prior)
+            stats.unlinked(prior_link)
+
+        if moved:
+            stats.moved(prior.dst, current.dst)
+            plan.add(RENAME, prior.dst, current.dst, current.name, current, prior)
+
+        if not current.linked or (prior.linked and not relink):
+            continue
+
+        # Verify there is no file or symlink matching link_name path to prevent overwriting,
+        #  a link unlinked above is already recorded as gone
+        if stats.lexists(current_link):
+            logger.error(
+                f"##bred##Error##end## ##bwhite##File {current.name} - {current_link} already exists. Skipping..."
+            )
+            current.linked = False
+            continue
+
+        stats.linked(current_link, current.dst)
+        plan.add(LINK, current_link, current.dst, current.name, current)
+
+    return fallback
+
+
+def handle_lock_renames(
+    renames: list[tuple[DotyEntry, DotyEntry]],
+    report: ShortReport,
+    dry_run: bool = False,
+    stats: StatCache = None,
+    dotfiles: str = None,
+) -> list[tuple[DotyEntry, DotyEntry]]:
+    """Plans and applies lock renames, see plan_lock_renames"""
+    plan = Plan()
+    fallback = plan_lock_renames(renames, plan, stats=stats, dotfiles=dotfiles)
+    apply_plan(plan, report, dry_run=dry_run)
+
+    return fallback
+
+
+def plan_prior_lock_changes(
+    lock_changes: list[DotyEntry],
+    plan: Plan,
+    stats: StatCache = None,
+) -> Plan:
     """
-    Handles any changes from prior locked entries by undoing the changes.
+    Plans undoing any changes from prior locked entries.
         If there are any symlinks, these will be unlinked. Then the file in the dotfiles
         directory will be moved back to it's source.
     """
-    logger.debug("Handling prior lock changes")
+    if stats is None:
+        stats = StatCache()
+
+    logger.debug("Planning prior lock changes")
 
     for entry in lock_changes:
         logger.debug(f"Entry: {entry.name}")
         directory = os.path.split(entry.src)[0]
         link_path = os.path.join(directory, entry.link_name)
 
-        if entry.linked:
-            # Since the file could be symlinked under an alias using link_name, we need to
-            #  unlink the file using the link_name
-
-            # link_path = os.path.join(directory, entry.link_name)
-
-            if os.path.islink(link_path):
-                logger.debug(f"Unlinking {entry.link_name}")
-                if not dry_run:
-                    os.unlink(link_path)
-
-                report.rm_link(entry.link_name, entry)
+        # Since the file could be symlinked under an alias using link_name, we need to
+        #  unlink the file using the link_name
+        if entry.linked and stats.islink(link_path):
+            plan.add(UNLINK, link_path, stats.readlink(link_path) or "", entry.link_name, entry)
+            stats.unlinked(link_path)
 
         # Verify the file exists in the dotfiles directory
-        if not os.path.exists(entry.dst):
+        if not stats.exists(entry.dst):
             logger.error(
                 f"##bred##Error##end## ##bwhite##File {entry.name} - {entry.dst} does not exist. Skipping..."
             )
             continue
 
         # Verify there is no file or symlink matching src path to prevent overwriting
-        # Does not need to check on dry_run because no files/links will be changed
-        if not dry_run and (os.path.exists(entry.src) or os.path.islink(link_path)):
+        if stats.exists(entry.src) or stats.islink(link_path):
             logger.error(
                 f"##bred##Error##end## ##bwhite##Moving file {entry.name} to {entry.src} already exists. Skipping..."
             )
             continue
 
-        logger.debug(f"Removing {entry.dst} to {entry.src}")
-        # shutil.move(entry.dst, entry.src)
-        if not dry_run:
-            move_out(entry.dst, entry.src)
+        stats.moved(entry.dst, entry.src)
+        plan.add(MOVE_OUT, entry.dst, entry.src, entry.name, entry)
 
-        report.rm_file(entry.name, entry)
+    return plan
 
 
-def handle_current_lock_changes(
-    lock_changes: list[DotyEntry], report: ShortReport, dry_run: bool = False
+def handle_prior_lock_changes(
+    lock_changes: list[DotyEntry],
+    report: ShortReport,
+    dry_run: bool = False,
+    stats: StatCache = None,
 ) -> None:
-    """Handles changes to the new lock file by creating symlinks for the new entries
-    and moving files to the dotfiles directory.
+    """Plans and applies undoing prior lock changes, see plan_prior_lock_changes"""
+    apply_plan(plan_prior_lock_changes(lock_changes, Plan(), stats=stats), report, dry_run=dry_run)
+
+
+def plan_current_lock_changes(
+    lock_changes: list[DotyEntry],
+    plan: Plan,
+    stats: StatCache = None,
+    dotfiles: str = None,
+) -> Plan:
+    """Plans changes to the new lock file by moving files to the dotfiles directory
+    and creating symlinks for the new entries.
     """
-    dotfiles_dir = os.environ["DOTFILES_PATH"]
-    logger.debug("Handling current lock changes")
+    dotfiles_dir = dotfiles or get_roots()[1]
+    if stats is None:
+        stats = StatCache()
+
+    logger.debug("Planning current lock changes")
 
     for entry in lock_changes:
         logger.debug(f"Entry: {entry.name}")
 
         # Verify the file exists at src and is not a symlink
-        if not os.path.exists(entry.src) or os.path.islink(entry.src):
+        if not stats.exists(entry.src) or stats.islink(entry.src):
             logger.error(
                 f"##bred##Error##end## ##bwhite##File {entry.name} - {entry.src} does not exist. Skipping..."
             )
             continue
 
         # Verify dst does not exist
-        if os.path.exists(entry.dst):
+        if stats.exists(entry.dst):
             logger.error(
                 f"##bred##Error##end## ##bwhite##File {entry.name} - {entry.dst} already exists. Skipping..."
             )
@@ -190,74 +402,213 @@ def handle_current_lock_changes(
             )
             continue
 
-        # Move the file to the dotfiles directory
-        # Using special move function to create directories if needed
-        logger.debug(f"Moving{entry.src} to {entry.dst}")
-        if not dry_run:
-            move_file(entry.src, entry.dst)
-
-        report.add_file(entry.name, entry)
-
-        # Handle linking
-        if entry.linked:
-            linked_name = os.path.join(os.path.split(entry.src)[0], entry.link_name)
-
-            # Verify there is no file or symlink matching link_name path to prevent overwriting
-            # Does not need to check on dry_run because no files/links will be changed
-            if not dry_run and (
-                os.path.exists(linked_name) or os.path.islink(linked_name)
-            ):
-                logger.error(
-                    f"##bred##Error##end## ##bwhite##File {entry.name} - {linked_name} already exists. Skipping..."
-                )
-                entry.linked = False
-                continue
+        stats.moved(entry.src, entry.dst)
+        plan.add(MOVE_IN, entry.src, entry.dst, entry.name, entry)
 
-            logger.debug(f"Linking {entry.dst} to {linked_name}")
-            if not dry_run:
-                os.symlink(entry.dst, linked_name)
+        if not entry.linked:
+            continue
 
-            report.add_link(entry.link_name, entry)
+        linked_name = os.path.join(os.path.split(entry.src)[0], entry.link_name)
 
+        # Verify there is no file or symlink matching link_name path to prevent overwriting
+        if stats.exists(linked_name) or stats.islink(linked_name):
+            logger.error(
+                f"##bred##Error##end## ##bwhite##File {entry.name} - {linked_name} already exists. Skipping..."
+            )
+            entry.linked = False
+            continue
 
-def compare_lock_yaml(
-    dry_run: bool = False,
-    doty_lock_path: str = None,
-) -> ShortReport:
-    """Compare the doty_lock.yml file with the prior yml file"""
+        stats.linked(linked_name, entry.dst)
+        plan.add(LINK, linked_name, entry.dst, entry.link_name, entry)
 
-    if not doty_lock_path:
-        doty_lock_path = os.path.join(
-            os.environ["DOTFILES_PATH"], ".doty_config", "doty_lock.yml"
-        )
+    return plan
 
-    prior_yaml, current_yaml = get_lock_files(doty_lock_path)
 
-    report = ShortReport()
+def handle_current_lock_changes(
+    lock_changes: list[DotyEntry],
+    report: ShortReport,
+    dry_run: bool = False,
+    stats: StatCache = None,
+    dotfiles: str = None,
+) -> None:
+    """Plans and applies changes to the new lock file, see plan_current_lock_changes"""
+    apply_plan(plan_current_lock_changes(lock_changes, Plan(), stats=stats, dotfiles=dotfiles), report, dry_run=dry_run)
+
+
+def plan_lock(
+    prior_yaml: list[dict], current_yaml: list[dict], home: str = None, dotfiles: str = None
+) -> tuple[Plan, LockTable]:
+    """Plan the moves and links that make the files match the current entries, undoing anything only in the prior entries.
+    Nothing is changed on disk, the plan's StatCache records each planned change so later checks see it.
+    Returns the plan and the current entries, with any entries that could not be linked marked as unlinked.
+    Entries are filled in relative to home, and files are only moved into dotfiles (see get_roots for the defaults).
+    """
+    plan = Plan()
+    plan.ledger = Ledger.load()
+    home_dir, dotfiles_dir = get_roots(home, dotfiles)
 
-    # Converts yaml into list of DotyEntry objects
-    prior_entries = [DotyEntry(entry) for entry in prior_yaml]
-    current_entries = [DotyEntry(entry) for entry in current_yaml]
+    # Converts yaml into lock tables, DotyEntry objects are only built for entries that need work
+    prior_entries = LockTable.from_dicts(prior_yaml, home=home_dir, dotfiles=dotfiles)
+    current_entries = LockTable.from_dicts(current_yaml, home=home_dir, dotfiles=dotfiles)
 
     # Get the difference between the current and prior yaml file
-    diff_current, diff_prior = get_lock_file_diff(current_entries, prior_entries)
+    lock_diff = diff_lock_tables(current_entries, prior_entries)
+    diff_current, diff_prior = lock_diff.diff_current, lock_diff.diff_prior
+
+    # One scan of $HOME and one stat per path are shared by every check below, paths are
+    # stat'ed relative to open fds of $HOME, the dotfiles directory and their subdirectories
+    with DirFS((home_dir, dotfiles_dir)) as fs:
+        stats = get_stat_cache(fs=fs, home=home_dir)
+        plan_entries(
+            diff_current, diff_prior, lock_diff.changed, current_entries, plan, stats, plan.ledger, dotfiles_dir
+        )
+
+    return plan, current_entries
 
+
+def plan_entries(
+    diff_current: list[DotyEntry],
+    diff_prior: list[DotyEntry],
+    changed: list[tuple[DotyEntry, DotyEntry]],
+    current_entries: LockTable,
+    plan: Plan,
+    stats: StatCache,
+    ledger: Ledger = None,
+    dotfiles: str = None,
+) -> Plan:
+    """Plan the changes for a lock diff, in the order they are applied"""
     # Check for mismatched entries
-    diff_current = check_for_mismatch(diff_current, current_entries)
+    diff_current = check_for_mismatch(diff_current, current_entries, stats=stats, ledger=ledger)
+
+    # Entries that only changed their dst or link are renamed in place
+    renames, diff_current, diff_prior = split_lock_renames(
+        changed, diff_current, diff_prior
+    )
 
-    # Handle any changes from prior locked entries
-    handle_prior_lock_changes(diff_prior, report, dry_run=dry_run)
+    for prior, current in plan_lock_renames(renames, plan, stats=stats, dotfiles=dotfiles):
+        diff_prior.append(prior)
+        diff_current.append(current)
 
-    # Handle any changes to the new lock file
-    handle_current_lock_changes(diff_current, report, dry_run=dry_run)
+    # Undo any changes from prior locked entries
+    plan_prior_lock_changes(diff_prior, plan, stats=stats)
+
+    # Make any changes to the new lock file
+    plan_current_lock_changes(diff_current, plan, stats=stats, dotfiles=dotfiles)
 
     # Fix any remaining broken symlinks
-    if not dry_run:
-        report = fix_links(current_entries, report)
+    plan_fix_links(current_entries, plan, stats=stats, ledger=ledger)
+
+    return plan
+
+
+def plan_lock_shards() -> Plan:
+    """Plan the lock shards against the last commit. Only shards whose blob id changed are loaded and planned."""
+    repo = get_repo()
+    changed = get_changed_shards(repo)
+
+    # Right after splitting the lock file into shards, the last commit only has doty_lock.yml
+    prior_yaml = load_prior_lock(repo=repo) + load_prior_shards(changed, repo)
+    current_yaml = []
+    sizes = []
+
+    try:
+        for shard in changed:
+            path = get_shard_path(shard)
+
+            # Shards that were removed stay removed
+            if not os.path.exists(path):
+                continue
+
+            shard_yaml = get_lock_backend(path).load()
+            current_yaml.extend(shard_yaml)
+            sizes.append((path, len(shard_yaml)))
+    except yaml.YAMLError:
+        logger.critical(
+            "##bred##YAML file is invalid. Please check the file and try again."
+        )
+        exit(1)
+
+    logger.debug(f"Planning {len(changed)} changed lock shards")
+    plan, current_entries = plan_lock(prior_yaml, current_yaml)
+    new_yaml = current_entries.to_dicts()
+    start = 0
+
+    # Each shard gets its own entries back
+    for path, size in sizes:
+        plan.locks.append((path, new_yaml[start:start + size]))
+        start += size
+
+    return plan
+
+
+def plan_lock_yaml(doty_lock_path: str = None) -> Plan:
+    """Plan the changes between the doty_lock.yml file and the prior yml file"""
+
+    if not doty_lock_path:
+        if is_sharded():
+            return plan_lock_shards()
+
+        doty_lock_path = os.path.join(get_roots()[1], ".doty_config", "doty_lock.yml")
+
+    prior_yaml, current_yaml = get_lock_files(doty_lock_path)
+    plan, current_entries = plan_lock(prior_yaml, current_yaml)
+
+    # The yaml lock file is always written for make_commit
+    plan.locks.append((doty_lock_path, current_entries.to_dicts()))
+
+    return plan
+
+
+def compare_lock_yaml(
+    dry_run: bool = False,
+    doty_lock_path: str = None,
+    plan: Plan = None,
+) -> Optional[ShortReport]:
+    """Compare the doty_lock.yml file with the prior yml file, and apply the changes.
+    A saved plan can be given instead, it is applied without comparing the lock files again.
+    On a dry run, the plan is only printed and recorded in the report.
+
+    The changes are logged in an UpdateWAL. An update is all or nothing: if any change fails,
+    every other change is undone, no lock file is written and None is returned, so nothing
+    is committed either. A change that keeps failing (e.g. a file in the way of a link) holds
+    back the whole update until it is fixed, so each failed change is logged with its error.
+    """
+    if plan is None:
+        plan = plan_lock_yaml(doty_lock_path)
+
+    if dry_run:
+        logger.info(f"##bwhite##Plan:##end##\n{plan}\n")
+        return apply_plan(plan, dry_run=True)
+
+    wal = UpdateWAL.begin(plan) if plan.ops else None
+
+    try:
+        report = apply_plan(plan, wal=wal)
+    except BaseException:
+        if wal is not None:
+            wal.rollback()
+        raise
+
+    if wal is not None and wal.failed:
+        # Leave the dotfiles as the prior lock files describe them, the next update plans the same changes again
+        names = ', '.join(sorted({op.entry.name for op in wal.failed}))
+        logger.error(f'##bred##Error##end## ##bwhite##Changes to {names} failed, undoing the rest of the update. Fix them and update again.')
+
+        for failure in wal.failures():
+            logger.error(f'  {failure}')
+
+        if wal.rollback():
+            logger.error('##bred##Some changes could not be undone, run doty recover to try again')
+
+        return None
+
+    write_plan_locks(plan)
 
-    # Write current entries to lock file
-    new_yaml = [entry.dict for entry in current_entries]
+    if wal is not None:
+        wal.clear()
 
-    write_lock_file(new_yaml, doty_lock_path)
+    # Saved plans are applied without a ledger, the entries are verified again on the next run
+    if plan.ledger is not None:
+        plan.ledger.save(plan)
 
     return report
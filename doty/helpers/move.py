@@ -0,0 +1,145 @@
+import os
+import sys
+import errno
+import shutil
+from classes.logger import DotyLogger
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = DotyLogger()
+
+# ioctl from linux/fs.h that makes dst share src's extents, on filesystems with reflinks (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+# Errors that mean a copy method is not supported here, so the next one is tried
+UNSUPPORTED = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTTY, errno.EBADF, errno.EPERM}
+
+
+def same_device(src: str, dst: str) -> bool:
+    """Check whether src can be renamed to dst - both are on the same filesystem. dst's directory has to exist."""
+    try:
+        return os.lstat(src).st_dev == os.stat(os.path.dirname(dst) or os.curdir).st_dev
+    except OSError:
+        return False
+
+
+def _clone(src_fd: int, dst_fd: int, size: int) -> bool:
+    if fcntl is None or not sys.platform.startswith('linux'):
+        return False
+
+    fcntl.ioctl(dst_fd, FICLONE, src_fd)
+    return True
+
+
+def _copy_range(src_fd: int, dst_fd: int, size: int) -> bool:
+    if not hasattr(os, 'copy_file_range'):
+        return False
+
+    copied = 0
+
+    while copied < size:
+        sent = os.copy_file_range(src_fd, dst_fd, size - copied)
+
+        if sent == 0:
+            break
+
+        copied += sent
+
+    # A file that grew or an empty copy of a non-empty file means the kernel did not copy it in full
+    return copied >= size
+
+
+def _sendfile(src_fd: int, dst_fd: int, size: int) -> bool:
+    offset = 0
+
+    while offset < size:
+        sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+
+        if sent == 0:
+            break
+
+        offset += sent
+
+    return offset >= size
+
+
+# Tried in order, the first one to succeed copies the file
+COPY_METHODS = (_clone, _copy_range, _sendfile)
+
+
+def copy_file(src: str, dst: str) -> str:
+    """Copy a regular file and its metadata to dst, which must not exist.
+    The file is reflinked if the filesystem can share its extents, and otherwise copied in the kernel.
+    Returns the name of the method that copied it.
+    """
+    with open(src, 'rb') as fsrc:
+        size = os.fstat(fsrc.fileno()).st_size
+        fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+
+        try:
+            with open(fd, 'wb') as fdst:
+                method = _copy_fds(fsrc, fdst, size)
+        except BaseException:
+            os.unlink(dst)
+            raise
+
+    shutil.copystat(src, dst)
+    return method
+
+
+def _copy_fds(fsrc, fdst, size: int) -> str:
+    src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+
+    for method in COPY_METHODS:
+        try:
+            if method(src_fd, dst_fd, size):
+                return method.__name__.lstrip('_')
+        except OSError as e:
+            if e.errno not in UNSUPPORTED:
+                raise
+
+        # Start over from the beginning of both files for the next method
+        os.lseek(src_fd, 0, os.SEEK_SET)
+        os.lseek(dst_fd, 0, os.SEEK_SET)
+        os.ftruncate(dst_fd, 0)
+
+    shutil.copyfileobj(fsrc, fdst)
+    return 'copy'
+
+
+def _copy_any(src: str, dst: str) -> None:
+    if os.path.islink(src):
+        os.symlink(os.readlink(src), dst)
+        shutil.copystat(src, dst, follow_symlinks=False)
+    elif os.path.isdir(src):
+        shutil.copytree(src, dst, symlinks=True, copy_function=copy_file)
+    else:
+        copy_file(src, dst)
+
+
+def move_path(src: str, dst: str, fs=os) -> None:
+    """Move a file, directory or symlink to dst, whose directory must already exist.
+
+        On the same filesystem this is a single rename through fs (a DirFS or the os module),
+        however large the file is. Across filesystems the file is copied with copy_file and then
+        removed from src, so large dotfiles (e.g. history databases) are reflinked or copied in
+        the kernel, not in Python.
+    """
+    if same_device(src, dst):
+        try:
+            fs.rename(src, dst)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+
+    logger.debug(f'{src} and {dst} are on different filesystems, copying')
+    _copy_any(src, dst)
+
+    if os.path.isdir(src) and not os.path.islink(src):
+        shutil.rmtree(src)
+    else:
+        os.unlink(src)
@@ -0,0 +1,71 @@
+import os
+from typing import Iterator
+from helpers.cache import load_cache, save_cache
+
+SKIP_DIRS = ('.doty_config', '.git')
+SKIP_FILES = ('.gitignore',)
+
+
+def _list_dir(path: str) -> tuple[list[str], list[str]]:
+    """List the files and directories in a single directory, skipping doty's own files"""
+    files, dirs = [], []
+
+    with os.scandir(path) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+
+            if is_dir:
+                # Like os.walk, symlinked directories are neither followed nor treated as files
+                if entry.name not in SKIP_DIRS and not entry.is_symlink():
+                    dirs.append(entry.name)
+            elif entry.name not in SKIP_FILES:
+                files.append(entry.name)
+
+    return files, dirs
+
+
+def scan_dotfiles(dot_dir: str = None, use_cache: bool = True) -> Iterator[str]:
+    """Yield every dotfile in the user's dotfile directory, in the same order as os.walk.
+
+    The listing of each directory is saved in .doty_config along with the directory's mtime.
+    On the next scan a directory whose mtime has not changed is only stat'ed, and its cached
+    listing is used instead of reading it again. The cache is only saved once the scan finishes.
+    """
+    if not dot_dir:
+        dot_dir = os.path.join(os.environ['HOME'], 'dotfiles')
+
+    cache = load_cache('scan', dot_dir) if use_cache else {}
+    new_cache = {}
+    stack = [dot_dir]
+
+    while stack:
+        path = stack.pop()
+
+        try:
+            # The directory is stat'ed before it is listed, so a change made mid-scan is picked up next time
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+
+        cached = cache.get(path)
+
+        if cached and cached['mtime'] == mtime:
+            files, dirs = cached['files'], cached['dirs']
+        else:
+            try:
+                files, dirs = _list_dir(path)
+            except OSError:
+                continue
+
+        new_cache[path] = {'mtime': mtime, 'files': files, 'dirs': dirs}
+
+        for file in files:
+            yield os.path.join(path, file)
+
+        stack.extend(os.path.join(path, d) for d in reversed(dirs))
+
+    if use_cache and new_cache != cache:
+        save_cache('scan', new_cache, dot_dir)
@@ -0,0 +1,198 @@
+import os
+import shutil
+import pygit2
+from typing import Iterable, Optional
+from classes.logger import DotyLogger
+from helpers.git import get_repo, last_commit_oid
+from classes.index import LockIndex
+from helpers.utils import load_lock_file, write_lock_file, load_lock_index, lock_digest
+from helpers.journal import clear_journal, has_journal
+
+logger = DotyLogger()
+
+LOCK_FILE_NAME = '.doty_config/doty_lock.yml'
+SHARD_DIR_NAME = '.doty_config/lock.d'
+ROOT_SHARD = '_root'
+
+
+def get_dotfiles_path(dotfiles_path: str = None) -> str:
+    return dotfiles_path or os.environ['DOTFILES_PATH']
+
+
+def get_shard_dir(dotfiles_path: str = None) -> str:
+    return os.path.join(get_dotfiles_path(dotfiles_path), SHARD_DIR_NAME)
+
+
+def get_shard_path(shard: str, dotfiles_path: str = None) -> str:
+    return os.path.join(get_shard_dir(dotfiles_path), f'{shard}.yml')
+
+
+def is_sharded(dotfiles_path: str = None) -> bool:
+    """The lock is sharded once a lock.d directory exists in .doty_config"""
+    return os.path.isdir(get_shard_dir(dotfiles_path))
+
+
+def list_shards(dotfiles_path: str = None) -> list[str]:
+    """Get the names of the shards in the working tree, sorted"""
+    try:
+        names = os.listdir(get_shard_dir(dotfiles_path))
+    except OSError:
+        return []
+
+    return sorted(name[:-4] for name in names if name.endswith('.yml'))
+
+
+def list_prior_shards(repo: pygit2.Repository = None) -> list[str]:
+    """Get the names of the shards in the last commit, sorted"""
+    if repo is None:
+        repo = get_repo()
+
+    try:
+        tree = repo[repo.head.target].tree[SHARD_DIR_NAME]
+    except KeyError:
+        return []
+
+    return sorted(obj.name[:-4] for obj in repo[tree.id] if obj.name.endswith('.yml'))
+
+
+def get_lock_paths(dotfiles_path: str = None) -> list[str]:
+    """Get every lock file of the current layout - the shards when sharded, otherwise doty_lock.yml"""
+    if is_sharded(dotfiles_path):
+        return [get_shard_path(shard, dotfiles_path) for shard in list_shards(dotfiles_path)]
+
+    return [os.path.join(get_dotfiles_path(dotfiles_path), LOCK_FILE_NAME)]
+
+
+def load_lock_indexes(dotfiles_path: str = None) -> dict[str, LockIndex]:
+    """Load every lock file of the current layout into a LockIndex, each one once"""
+    return {path: load_lock_index(path) for path in get_lock_paths(dotfiles_path) if os.path.exists(path)}
+
+
+def get_lock_sources(paths: Iterable[str] = (), dotfiles_path: str = None) -> dict[str, Optional[str]]:
+    """Get the lock_digest of every lock file of the current layout, and of any other lock paths given"""
+    return {path: lock_digest(path) for path in sorted({*get_lock_paths(dotfiles_path), *paths})}
+
+
+def get_changed_lock_paths(sources: dict[str, Optional[str]], dotfiles_path: str = None) -> list[str]:
+    """Get the lock files that changed since their sources were recorded with get_lock_sources,
+    including lock files that were created since.
+    """
+    current = get_lock_sources(sources, dotfiles_path)
+    return [path for path, digest in current.items() if sources.get(path) != digest]
+
+
+def shard_for(entry: dict, dotfiles_path: str = None) -> str:
+    """Get the shard an entry belongs in - the top level directory of its dst in the dotfiles directory.
+    Entries directly in the dotfiles directory, or outside it, go in the _root shard.
+    """
+    dotfiles_path = get_dotfiles_path(dotfiles_path)
+    dst = entry.get('dst') or entry.get('name') or os.path.basename(entry.get('src', ''))
+
+    if os.path.isabs(dst):
+        dst = os.path.relpath(dst, dotfiles_path)
+
+    parts = os.path.normpath(dst).split(os.sep)
+
+    if len(parts) < 2 or parts[0] in (os.curdir, os.pardir) or parts[0].startswith('.doty_config'):
+        return ROOT_SHARD
+
+    return parts[0]
+
+
+def get_entry_lock_path(entry: dict, dotfiles_path: str = None) -> str:
+    """Get the lock file a new entry is written to in the current layout"""
+    if is_sharded(dotfiles_path):
+        return get_shard_path(shard_for(entry, dotfiles_path), dotfiles_path)
+
+    return os.path.join(get_dotfiles_path(dotfiles_path), LOCK_FILE_NAME)
+
+
+def group_entries(entries: list[dict], dotfiles_path: str = None) -> dict[str, list[dict]]:
+    """Group entries by shard, keeping their order"""
+    groups = {}
+
+    for entry in entries:
+        groups.setdefault(shard_for(entry, dotfiles_path), []).append(entry)
+
+    return groups
+
+
+def write_lock_shards(entries: list[dict], dotfiles_path: str = None) -> None:
+    """Write entries into shards, removing any shard that no longer has entries"""
+    groups = group_entries(entries, dotfiles_path)
+    os.makedirs(get_shard_dir(dotfiles_path), exist_ok=True)
+
+    for shard, shard_entries in groups.items():
+        write_lock_file(shard_entries, get_shard_path(shard, dotfiles_path))
+
+    for shard in list_shards(dotfiles_path):
+        if shard not in groups:
+            path = get_shard_path(shard, dotfiles_path)
+            os.unlink(path)
+            clear_journal(path)
+
+
+def load_lock_entries(dotfiles_path: str = None) -> list[dict]:
+    """Load every entry of the current layout"""
+    entries = []
+
+    for path in get_lock_paths(dotfiles_path):
+        if os.path.exists(path):
+            entries.extend(load_lock_file(path))
+
+    return entries
+
+
+def get_changed_shards(repo: pygit2.Repository = None, dotfiles_path: str = None) -> list[str]:
+    """Get the shards whose blob id differs from the last commit, including shards that were added or removed.
+    A shard with a journal has changes that are not in its blob yet, so it is always changed.
+    """
+    if repo is None:
+        repo = get_repo()
+
+    changed = []
+
+    for shard in sorted(set(list_shards(dotfiles_path)) | set(list_prior_shards(repo))):
+        path = get_shard_path(shard, dotfiles_path)
+
+        if has_journal(path):
+            changed.append(shard)
+            continue
+
+        try:
+            oid = str(pygit2.hashfile(path))
+        except (OSError, pygit2.GitError):
+            oid = ''
+
+        if oid != last_commit_oid(f'{SHARD_DIR_NAME}/{shard}.yml', repo):
+            changed.append(shard)
+
+    return changed
+
+
+def migrate_lock(sharded: bool = True, dotfiles_path: str = None) -> bool:
+    """Move the lock file between the single file and sharded layouts. Returns False if it is already in that layout.
+    The entries are not changed, so the next update has nothing to move or link.
+    """
+    lock_path = os.path.join(get_dotfiles_path(dotfiles_path), LOCK_FILE_NAME)
+
+    if sharded == is_sharded(dotfiles_path):
+        return False
+
+    if sharded:
+        entries = load_lock_file(lock_path) if os.path.exists(lock_path) else []
+        write_lock_shards(entries, dotfiles_path)
+
+        if os.path.exists(lock_path):
+            os.unlink(lock_path)
+
+        clear_journal(lock_path)
+        logger.info(f'##bgreen##Split the lock file into {len(list_shards(dotfiles_path))} shards')
+        return True
+
+    entries = load_lock_entries(dotfiles_path)
+    write_lock_file(entries, lock_path)
+
+    shutil.rmtree(get_shard_dir(dotfiles_path))
+    logger.info('##bgreen##Merged the lock shards into doty_lock.yml')
+    return True
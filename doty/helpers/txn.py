@@ -0,0 +1,109 @@
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional
+from classes.table import LockTable
+from classes.index import LockIndex
+from helpers.backend import get_lock_backend
+from helpers.journal import append_records, get_journal_path
+
+
+class LockTxn:
+    """Adds, removes and relinks staged in memory against a LockIndex, then saved once on commit.
+    Removals are applied at commit, so rows stay valid for the whole transaction.
+
+        Each change is also kept as a journal record. If the lock file exists, commit appends the
+        records to its journal instead of rewriting it, unless a change cannot be replayed by name
+        (a row that shares its name with an earlier one) - then the whole lock file is written.
+    """
+
+    def __init__(self, path: str, index: LockIndex = None) -> None:
+        self.path = path
+        self.backend = get_lock_backend(path)
+        self.index = index if index is not None else LockIndex(LockTable.from_dicts(self.backend.load()))
+        self.changed = False
+        self._removed = set()
+        self._records = []
+
+    def _record(self, i: Optional[int], record: dict) -> None:
+        """Keep the journal record of a change to row i, if the journal can find the row by its name"""
+        if self._records is None:
+            return
+
+        if i is not None and self.index.by_name(self.index.table.names[i]) != i:
+            self._records = None
+            return
+
+        self._records.append(record)
+
+    def _live(self, i: Optional[int]) -> Optional[int]:
+        return None if i is None or i in self._removed else i
+
+    def find(self, name: str) -> Optional[int]:
+        """Get the row of an entry by name, or None if it is not in the lock file"""
+        return self._live(self.index.by_name(name))
+
+    def find_link(self, link_name: str) -> Optional[int]:
+        """Get the row of an entry by link_name, or None if it is not in the lock file"""
+        return self._live(self.index.by_link_name(link_name))
+
+    def _apply_removals(self) -> None:
+        self.index.remove(self._removed)
+        self._removed = set()
+
+    def add(self, entry: dict) -> bool:
+        """Stage a new entry. Returns False if an entry with the same name exists."""
+        i = self.index.by_name(entry['name'])
+
+        if i is not None and i in self._removed:
+            # The removed entry still holds the name in the index
+            self._apply_removals()
+        elif i is not None:
+            return False
+
+        self._record(None, {'op': 'add', 'entry': self.index.table.as_dict(self.index.add(entry))})
+        self.changed = True
+        return True
+
+    def remove(self, i: int) -> None:
+        """Stage the removal of a row"""
+        if i not in self._removed:
+            self._record(i, {'op': 'remove', 'name': self.index.table.names[i]})
+
+        self._removed.add(i)
+        self.changed = True
+
+    def relink(self, i: int, linked: bool) -> None:
+        """Stage a change to a row's linked value"""
+        if self.index.table.is_linked(i) != linked:
+            self._record(i, {'op': 'link', 'name': self.index.table.names[i], 'linked': linked})
+            self.index.table.set_linked(i, linked)
+            self.changed = True
+
+    def commit(self) -> None:
+        """Save the changes once, if anything changed - appended to the journal when possible, otherwise written to the lock file"""
+        if self._removed:
+            self._apply_removals()
+
+        if not self.changed:
+            return
+
+        if self._records and os.path.exists(self.path):
+            append_records(get_journal_path(self.path), self._records)
+        else:
+            self.backend.write(self.index.table.to_dicts())
+
+        self.changed = False
+        self._records = []
+
+
+@contextmanager
+def lock_txn(path: str = None, index: LockIndex = None) -> Iterator[LockTxn]:
+    """Edit the lock file in a transaction. Nothing is written if the block raises or exits.
+    An index the caller already loaded from the lock file can be given, so it is not loaded again.
+    """
+    if not path:
+        path = os.path.join(os.environ['DOTFILES_PATH'], '.doty_config', 'doty_lock.yml')
+
+    txn = LockTxn(path, index)
+    yield txn
+    txn.commit()
\ No newline at end of file
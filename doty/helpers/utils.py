@@ -1,6 +1,22 @@
 import os
-import shutil
-import yaml
+import hashlib
+from classes.logger import DotyLogger
+from classes.table import LockTable
+from classes.index import LockIndex
+from helpers.cache import load_cache, save_cache, get_cache_dir
+from helpers.move import move_path
+from typing import Iterable, Iterator, Optional
+from helpers.yaml_io import iter_yaml_sequence, dump_yaml
+from helpers.journal import append_journal, read_journal, replay_journal, clear_journal, has_journal, get_journal_path
+
+logger = DotyLogger()
+
+LOCK_HEADER = (
+    '# Path: ~/.doty_config/doty_lock.yml\n'
+    '# This file is used to keep track of dotfiles and their respective repositories.\n'
+    '# It is recommended that you do not edit this file directly.\n'
+    '# Instead, use the \'doty add\' command.\n'
+)
 
 class DesinationExistsError(Exception):
     """Raised when the destination path already exists."""
@@ -9,32 +25,25 @@ class DesinationExistsError(Exception):
         self.message = message
         super().__init__(self.message)
 
-def move_file(src, dst):
-    """Move files from src to dst."""
-    attempted = False
-
+def move_file(src, dst, fs=os):
+    """Move files from src to dst, creating dst's directory if needed."""
     if os.path.exists(dst):
         raise DesinationExistsError(f'{dst} already exists.')
 
-    while True:
-        try:
-            shutil.move(src, dst)
-        except FileNotFoundError:
-            if attempted:
-                return False
-            os.makedirs(os.path.dirname(dst))
-            attempted = True
-        else:
-            return os.path.exists(dst)
+    # Plans create directories before applying a batch, this only matters for other callers
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    move_path(src, dst, fs)
+
+    return os.path.lexists(dst)
 
-def move_out(dst, src):
+def move_out(dst, src, fs=os):
     """Move files out of dotfiles directory"""
 
     if os.path.exists(src):
         raise DesinationExistsError(f'{src} already exists.')
 
     # Move file
-    shutil.move(dst, src)
+    move_path(dst, src, fs)
 
     # Remove any empty directories left behind
     dir_path = os.path.dirname(dst)
@@ -43,31 +52,214 @@ def move_out(dst, src):
     except OSError:
         pass
 
-def load_lock_file(path: str) -> list:
-    """Load the doty_lock.yml file."""
-    with open(path, 'r') as f:
-        lock_file = yaml.safe_load(f)
-    return lock_file or []
+def rename_file(old_dst, new_dst, fs=os):
+    """Rename a file within the dotfiles directory, cleaning up any empty directories left behind."""
+    moved = move_file(old_dst, new_dst, fs)
+
+    try:
+        os.removedirs(os.path.dirname(old_dst))
+    except OSError:
+        pass
+
+    return moved
+
+def iter_entries(entries: Iterable) -> Iterator[dict]:
+    """Same as parse_entries, one entry at a time"""
+    for entry in entries:
+        if isinstance(entry, str):
+            yield {"name": entry}
+        elif isinstance(entry, dict):
+            yield entry
+        else:
+            logger.error(f"##bred##Error##end## ##bwhite##Invalid entry: {entry}")
+
+def parse_entries(entries: list[dict, str]) -> list[dict]:
+    """Since the minimum required value for an entry is a string representing a file name,
+    this function will convert the string to a dict.
+    """
+    return list(iter_entries(entries))
+
+def _lock_cache_root(path: str) -> str:
+    """Get the dotfiles directory a lock file belongs to, or None if it is not in a .doty_config directory"""
+    config_dir = os.path.dirname(os.path.abspath(path))
+
+    # Lock shards live one level down, in .doty_config/lock.d
+    if os.path.basename(config_dir) == 'lock.d':
+        config_dir = os.path.dirname(config_dir)
+
+    if os.path.basename(config_dir) != '.doty_config':
+        return None
+
+    return os.path.dirname(config_dir)
+
+def _cache_lock_file(path: str, data: bytes, entries: list[dict]) -> None:
+    """Save the parsed entries of a lock file, keyed by the file's mtime, size and content hash"""
+    root = _lock_cache_root(path)
+
+    if not root:
+        return
+
+    st = os.stat(path)
+    cache = load_cache('lock', root)
+    cache[os.path.abspath(path)] = {
+        'mtime': st.st_mtime_ns,
+        'size': st.st_size,
+        'sha256': hashlib.sha256(data).hexdigest(),
+        'entries': entries
+    }
+    save_cache('lock', cache, root)
+
+def load_lock_file(path: str) -> list[dict]:
+    """Load the doty_lock.yml file, with any changes in its journal applied on top.
+    Entries are normalized with parse_entries. If the file has not changed since it was last parsed,
+    the entries are loaded from the cache in .doty_config instead of parsing the yaml again.
+    """
+    return replay_journal(_load_lock_snapshot(path), read_journal(path))
+
+def iter_lock_file(path: str) -> Iterator[dict]:
+    """Yield the entries of the doty_lock.yml file as they are parsed, so huge lock files never have to
+    be held in memory at once. Cached entries, and lock files with a journal, are loaded with load_lock_file.
+    """
+    root = _lock_cache_root(path)
+
+    if has_journal(path) or (root and os.path.abspath(path) in load_cache('lock', root)):
+        yield from load_lock_file(path)
+        return
+
+    with open(path, 'rb') as f:
+        yield from iter_entries(iter_yaml_sequence(f))
+
+
+def _load_lock_snapshot(path: str) -> list[dict]:
+    """Load the doty_lock.yml file as it is on disk, without its journal"""
+    with open(path, 'rb') as f:
+        st = os.fstat(f.fileno())
+        data = f.read()
+
+    root = _lock_cache_root(path)
+    cached = load_cache('lock', root).get(os.path.abspath(path)) if root else None
+
+    if (
+        cached
+        and cached['mtime'] == st.st_mtime_ns
+        and cached['size'] == st.st_size
+        and cached['sha256'] == hashlib.sha256(data).hexdigest()
+    ):
+        return cached['entries']
+
+    lock_file = parse_entries(iter_yaml_sequence(data))
+    _cache_lock_file(path, data, lock_file)
+    return lock_file
+
+def _fsync_dir(path: str) -> None:
+    """Sync a directory so a rename inside it is on disk. Not every platform allows this."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def _lock_tmp_path(path: str) -> str:
+    """Get the temp file a lock file is written to before it is renamed into place.
+    Lock files in .doty_config use the cache directory, which git ignores, so a temp file left by a crash is never committed.
+    """
+    root = _lock_cache_root(path)
+
+    if not root:
+        return f'{path}.tmp'
+
+    # Shards are named after their path in .doty_config, e.g. lock.d-nvim.yml.tmp
+    name = os.path.relpath(os.path.abspath(path), os.path.join(root, '.doty_config')).replace(os.sep, '-')
+    return os.path.join(get_cache_dir(root), f'{name}.tmp')
 
 def write_lock_file(entries: list[dict], path: str) -> None:
-    """Write the doty_lock.yml file."""
-    
-    with open(path, 'w') as f:
-        f.write('# Path: ~/.doty_config/doty_lock.yml\n')
-        f.write('# This file is used to keep track of dotfiles and their respective repositories.\n')
-        f.write('# It is recommended that you do not edit this file directly.\n')
-        f.write('# Instead, use the \'doty add\' command.\n')
-        if entries:
-            yaml.safe_dump(entries, f, sort_keys=False)
-
-def add_to_lock_file(entry: dict, path: str) -> bool:
-    """Adds an entry to the doty_lock.yml file."""
-    lock_file = load_lock_file(path)
-    entry_names = [e['name'] for e in lock_file]
-
-    if entry_names and entry['name'] in entry_names:
+    """Write the doty_lock.yml file.
+    The file is written to a temp file, synced and then renamed over the lock file, so a crash
+    never leaves a truncated lock file behind.
+    """
+    content = LOCK_HEADER
+
+    if entries:
+        content += dump_yaml(entries)
+
+    data = content.encode('utf-8')
+    tmp_path = _lock_tmp_path(path)
+
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    _fsync_dir(os.path.dirname(os.path.abspath(path)))
+
+    # The lock file now holds every change that was in the journal
+    clear_journal(path)
+
+    _cache_lock_file(path, data, parse_entries(entries))
+
+def load_lock_index(path: str) -> LockIndex:
+    """Load a lock file into a LockIndex"""
+    return LockIndex(LockTable.from_dicts(load_lock_file(path)))
+
+def add_to_lock_file(entry: dict, path: str, index: LockIndex = None) -> bool:
+    """Adds an entry to the doty_lock.yml file.
+    The entry is appended to the lock file's journal instead of rewriting the whole file.
+    """
+    if index is None:
+        index = load_lock_index(path)
+
+    if index.by_name(entry['name']) is not None:
         return False
-    
-    lock_file.append(entry)
-    write_lock_file(lock_file, path)
-    return True
\ No newline at end of file
+
+    index.add(entry)
+
+    # A new lock shard has nothing to journal against yet
+    if os.path.exists(path):
+        append_journal(path, {'op': 'add', 'entry': entry})
+    else:
+        write_lock_file([entry], path)
+
+    return True
+
+def lock_digest(path: str) -> Optional[str]:
+    """Hash a lock file together with its journal, to tell whether it changed. None if the lock file does not exist."""
+    digest = hashlib.sha256()
+
+    try:
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+    except FileNotFoundError:
+        return None
+
+    digest.update(b'\0')
+
+    try:
+        with open(get_journal_path(path), 'rb') as f:
+            digest.update(f.read())
+    except FileNotFoundError:
+        pass
+
+    return digest.hexdigest()
+
+def compact_lock_journal(path: str) -> bool:
+    """Fold the journal into the lock file, so the lock file is complete before it is committed.
+    Returns True if there was a journal to compact.
+    """
+    if not has_journal(path):
+        return False
+
+    write_lock_file(load_lock_file(path), path)
+    return True
@@ -0,0 +1,191 @@
+import os
+from typing import Iterable, Optional
+from classes.plan import Plan, PlanOp, LINK, UNLINK
+from classes.logger import DotyLogger
+from classes.report import ShortReport2 as ShortReport
+from helpers.cache import get_cache_dir, CACHE_DIR_NAME
+from helpers.journal import append_records, read_records
+from helpers.apply import apply_op, apply_plan, remove_dirs, write_plan_locks
+from helpers.utils import DesinationExistsError
+
+logger = DotyLogger()
+
+WAL_NAME = 'update.wal'
+
+
+def get_wal_path(dotfiles_path: str = None) -> str:
+    """Get the path of the update write-ahead log, without creating anything"""
+    if not dotfiles_path:
+        dotfiles_path = os.environ['DOTFILES_PATH']
+
+    return os.path.join(dotfiles_path, '.doty_config', CACHE_DIR_NAME, WAL_NAME)
+
+
+def has_pending_wal(dotfiles_path: str = None) -> bool:
+    """Check whether an update was interrupted before it finished"""
+    return os.path.exists(get_wal_path(dotfiles_path))
+
+
+def is_applied(op: PlanOp) -> bool:
+    """Check whether an operation was made, for one that was started but never recorded as done"""
+    if op.op == LINK:
+        return os.path.islink(op.path) and os.readlink(op.path) == op.target
+    elif op.op == UNLINK:
+        return not os.path.lexists(op.path)
+
+    # A file that was moved in may already be linked back to where it was
+    moved_from = not os.path.lexists(op.path) or (os.path.islink(op.path) and os.readlink(op.path) == op.target)
+    return os.path.lexists(op.target) and moved_from
+
+
+class UpdateWAL:
+    """Write-ahead log of the operations an update makes, in .doty_config/cache/update.wal.
+
+        The plan is written first, then each batch's operations before they are made and the
+        ones that succeeded after, with the errors of the ones that did not. Records are appended
+        and synced once per batch, so the cost is in the number of changes, not the number of
+        entries. The log is removed once the update has written its lock files - a log that is
+        still there means the update failed or was interrupted, and it holds everything needed
+        to undo or finish it.
+    """
+
+    def __init__(self, path: str, plan: Plan, started: list[int] = None, done: set[int] = None) -> None:
+        self.path = path
+        self.plan = plan
+        self.started = started if started is not None else []
+        self.done = done if done is not None else set()
+        self.errors = {}
+        self._started = set(self.started)
+        self._seq = {id(op): i for i, op in enumerate(plan.ops)}
+
+    @classmethod
+    def begin(cls, plan: Plan, dotfiles_path: str = None) -> Optional['UpdateWAL']:
+        """Start the log of a plan. Nothing is logged for a dotfiles directory without a .doty_config directory."""
+        path = get_wal_path(dotfiles_path)
+
+        if not os.path.isdir(os.path.dirname(os.path.dirname(path))):
+            return None
+
+        get_cache_dir(dotfiles_path)
+
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+        append_records(path, [{'rec': 'begin', 'plan': plan.to_dict()}])
+        return cls(path, plan)
+
+    @classmethod
+    def load(cls, dotfiles_path: str = None) -> Optional['UpdateWAL']:
+        """Read the log an interrupted update left behind, or None if there is none"""
+        path = get_wal_path(dotfiles_path)
+        records = read_records(path)
+
+        if not records or records[0].get('rec') != 'begin':
+            return None
+
+        wal = cls(path, Plan.from_dict(records[0]['plan']))
+
+        for record in records[1:]:
+            if record.get('rec') == 'intent':
+                wal._start(record['seq'])
+            elif record.get('rec') == 'done':
+                wal.done.update(record['seq'])
+                wal.errors.update({i: error for i, error in record.get('errors', [])})
+
+        return wal
+
+    @property
+    def failed(self) -> list[PlanOp]:
+        """The operations that were started but did not succeed"""
+        return [self.plan.ops[i] for i in self.started if i not in self.done]
+
+    def _seqs(self, ops: Iterable[PlanOp]) -> list[int]:
+        return [self._seq[id(op)] for op in ops]
+
+    def _start(self, seqs: list[int]) -> None:
+        for i in seqs:
+            if i not in self._started:
+                self._started.add(i)
+                self.started.append(i)
+
+    def intent(self, ops: list[PlanOp]) -> None:
+        """Log operations before they are made"""
+        seqs = self._seqs(ops)
+        self._start(seqs)
+        append_records(self.path, [{'rec': 'intent', 'seq': seqs}])
+
+    def finished(self, ops: list[PlanOp], errors: list[Optional[Exception]]) -> None:
+        """Log which operations were made, and the error of each one that was not"""
+        done = []
+        failed = []
+
+        for i, e in zip(self._seqs(ops), errors):
+            if e is None:
+                done.append(i)
+            else:
+                failed.append([i, str(e)])
+
+        self.done.update(done)
+        self.errors.update(dict(failed))
+        append_records(self.path, [{'rec': 'done', 'seq': done, 'errors': failed}])
+
+    def failures(self) -> list[str]:
+        """Describe each operation that did not succeed and why, for the user to fix"""
+        return [
+            f'{self.plan.ops[i].entry.name}: {self.plan.ops[i]} - {self.errors.get(i, "did not finish")}'
+            for i in self.started if i not in self.done
+        ]
+
+    def clear(self) -> None:
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def applied(self) -> list[PlanOp]:
+        """The logged operations that were made, in the order they were started"""
+        return [self.plan.ops[i] for i in self.started if i in self.done or is_applied(self.plan.ops[i])]
+
+    def rollback(self) -> int:
+        """Undo every logged operation that was made, last one first. Returns the number that could not be undone.
+        The log is only removed if everything was undone.
+        """
+        failed = 0
+
+        for op in reversed(self.applied()):
+            inverse = op.inverse()
+
+            if inverse is None:
+                logger.warning(f'##byellow##Cannot undo {op}, the link it removed pointed to an unknown file')
+                continue
+
+            try:
+                apply_op(inverse)
+            except (OSError, DesinationExistsError) as e:
+                logger.error(f'##bred##Error##end## ##bwhite##Could not undo {op}: {e}')
+                failed += 1
+                continue
+
+            remove_dirs(op)
+            logger.debug(f'Undid {op}')
+
+        if not failed:
+            self.clear()
+
+        return failed
+
+    def replay(self) -> ShortReport:
+        """Make the logged plan's operations that were not made, then write its lock files.
+        The log is kept if any operation still fails, so the update can be recovered again.
+        """
+        remaining = [op for i, op in enumerate(self.plan.ops) if i not in self.done and not is_applied(op)]
+        report = apply_plan(Plan(remaining, self.plan.locks), wal=self)
+
+        if any(self._seq[id(op)] not in self.done for op in remaining):
+            return report
+
+        write_plan_locks(self.plan)
+        self.clear()
+        return report
@@ -0,0 +1,195 @@
+import yaml
+from typing import Iterator
+from yaml.events import (
+    AliasEvent,
+    ScalarEvent,
+    SequenceStartEvent,
+    SequenceEndEvent,
+    MappingStartEvent,
+    MappingEndEvent,
+    DocumentStartEvent,
+    DocumentEndEvent,
+    StreamEndEvent,
+)
+from yaml.nodes import ScalarNode
+
+# PyYAML is only sometimes built with libyaml, so fall back to the pure-Python classes when it isn't
+try:
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
+LIBYAML = SafeLoader is not yaml.SafeLoader
+
+
+def _plain_ascii(data) -> bool:
+    """Check that every string in the data is printable ASCII.
+    libyaml wraps long double-quoted strings differently from PyYAML, and only strings with
+    other characters are double-quoted, so these are the only documents it can dump identically.
+    """
+    if isinstance(data, str):
+        return data.isascii() and data.isprintable()
+    elif isinstance(data, dict):
+        return all(_plain_ascii(k) and _plain_ascii(v) for k, v in data.items())
+    elif isinstance(data, (list, tuple)):
+        return all(_plain_ascii(item) for item in data)
+
+    return True
+
+
+def load_yaml(stream, loader: type = SafeLoader):
+    """Same as yaml.safe_load, using libyaml when it is available"""
+    return yaml.load(stream, Loader=loader)
+
+
+def dump_yaml(data, stream=None, dumper: type = None):
+    """Same as yaml.safe_dump(data, stream, sort_keys=False), using libyaml when it is available
+    and the output will be byte for byte the same.
+    """
+    if dumper is None:
+        dumper = SafeDumper if LIBYAML and _plain_ascii(data) else yaml.SafeDumper
+
+    return yaml.dump(data, stream, Dumper=dumper, sort_keys=False)
+
+
+MERGE_TAG = 'tag:yaml.org,2002:merge'
+
+
+def _scalar_tag(loader, event: ScalarEvent) -> str:
+    if event.tag is None or event.tag == '!':
+        return loader.resolve(ScalarNode, event.value, event.implicit)
+
+    return event.tag
+
+
+def _build_scalar(loader, event: ScalarEvent):
+    """Resolve and construct a scalar the same way safe_load does, without composing a node tree"""
+    tag = _scalar_tag(loader, event)
+    node = ScalarNode(tag, event.value, event.start_mark, event.end_mark, event.style)
+    constructor = loader.yaml_constructors.get(tag) or loader.yaml_constructors[None]
+    return constructor(loader, node)
+
+
+def _build(loader, event, anchors: dict):
+    """Build one value from the parser events that start with event"""
+    if isinstance(event, AliasEvent):
+        try:
+            return anchors[event.anchor]
+        except KeyError:
+            raise yaml.composer.ComposerError(None, None, f'found undefined alias {event.anchor}', event.start_mark)
+
+    if isinstance(event, ScalarEvent):
+        value = _build_scalar(loader, event)
+    elif isinstance(event, SequenceStartEvent):
+        value = []
+
+        while not loader.check_event(SequenceEndEvent):
+            value.append(_build(loader, loader.get_event(), anchors))
+
+        loader.get_event()
+    elif isinstance(event, MappingStartEvent):
+        value = _build_mapping(loader, event, anchors)
+    else:
+        raise yaml.parser.ParserError(None, None, f'unexpected {event.__class__.__name__}', event.start_mark)
+
+    if event.anchor is not None:
+        anchors[event.anchor] = value
+
+    return value
+
+
+def _merge_pairs(event, merge_event, merge) -> list[tuple]:
+    """Get the pairs a merge key (<<) adds to a mapping, in the order SafeConstructor.flatten_mapping gives them"""
+    if isinstance(merge, dict):
+        return list(merge.items())
+
+    if isinstance(merge, list) and all(isinstance(item, dict) for item in merge):
+        # Mappings earlier in the list win, so they are added last
+        return [pair for item in reversed(merge) for pair in item.items()]
+
+    raise yaml.constructor.ConstructorError(
+        'while constructing a mapping', event.start_mark,
+        'expected a mapping or list of mappings for merging', merge_event.start_mark
+    )
+
+
+def _build_mapping(loader, event: MappingStartEvent, anchors: dict) -> dict:
+    """Build a mapping the way safe_load does - merge keys are flattened and unhashable keys are an error"""
+    merged = []
+    pairs = []
+
+    while not loader.check_event(MappingEndEvent):
+        key_event = loader.get_event()
+
+        if isinstance(key_event, ScalarEvent) and _scalar_tag(loader, key_event) == MERGE_TAG:
+            merge_event = loader.peek_event()
+            merged.extend(_merge_pairs(event, merge_event, _build(loader, loader.get_event(), anchors)))
+            continue
+
+        key = _build(loader, key_event, anchors)
+
+        try:
+            hash(key)
+        except TypeError:
+            raise yaml.constructor.ConstructorError(
+                'while constructing a mapping', event.start_mark, 'found unhashable key', key_event.start_mark
+            )
+
+        pairs.append((key, _build(loader, loader.get_event(), anchors)))
+
+    loader.get_event()
+
+    # Keys set in the mapping itself win over merged ones
+    return dict(merged + pairs)
+
+
+def _check_single_document(loader) -> None:
+    """Make sure the stream ends after the first document, like safe_load does"""
+    while loader.check_event(DocumentEndEvent):
+        loader.get_event()
+
+    if not loader.check_event(StreamEndEvent):
+        event = loader.get_event()
+        raise yaml.composer.ComposerError(
+            'expected a single document in the stream', None, 'but found another document', event.start_mark
+        )
+
+
+def iter_yaml_sequence(stream, loader: type = SafeLoader) -> Iterator:
+    """Yield the items of a YAML document's top level sequence one at a time, built from parser events.
+
+        Only the current item is ever held in memory, so the caller can start working on the first
+        entries of a huge lock file before the rest is parsed. Items are the same as safe_load's.
+        An empty document yields nothing, and a document that is not a sequence is built whole and
+        iterated like safe_load's result would be.
+    """
+    parser = loader(stream)
+    anchors = {}
+
+    try:
+        # Skip the stream start, then stop at the first document
+        while not parser.check_event(DocumentStartEvent):
+            if parser.check_event(yaml.StreamEndEvent):
+                return
+
+            parser.get_event()
+
+        parser.get_event()
+        event = parser.get_event()
+
+        if not isinstance(event, SequenceStartEvent):
+            value = _build(parser, event, anchors)
+            _check_single_document(parser)
+            yield from value or ()
+            return
+
+        if event.anchor is not None:
+            raise yaml.composer.ComposerError(None, None, 'an anchored top level sequence cannot be streamed', event.start_mark)
+
+        while not parser.check_event(SequenceEndEvent):
+            yield _build(parser, parser.get_event(), anchors)
+
+        parser.get_event()
+        _check_single_document(parser)
+    finally:
+        parser.dispose()
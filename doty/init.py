@@ -18,6 +18,8 @@ GIT_AUTHOR_EMAIL="doty@email.com"
 DOTY_FILE_LOGGING=true
 DOTY_LOG_PATH="{dotfiles_path}/.doty_config/logs/doty.log"
 DOTY_COLOR_LOGGING=true
+DOTY_LOCK_BACKEND=yaml
+DOTY_WORKERS=8
 """
     return dotyrc_str
 
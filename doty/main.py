@@ -1,10 +1,12 @@
 import os
 import subprocess
 from helpers.args import main_args
-from update import update
+from update import update, recover, migrate
 from add import add
 from remove import remove, remove_multi
 from discover import discover
+from fleet import apply_fleet_cmd
+from helpers.shards import get_lock_paths
 
 def get_logs(num: int) -> None:
     """Show the git logs for the doty repo"""
@@ -22,7 +24,7 @@ if __name__ == '__main__':
         exit(0)
     
     if args.command in ['update', 'up']:
-        update(commit=not args.no_commit, quiet=args.quiet, dry_run=args.dry_run)
+        update(commit=not args.no_commit, quiet=args.quiet, dry_run=args.dry_run, save_plan=args.save_plan, plan_path=args.plan)
     
     if args.command in ['add', 'a']:
         add(args.entry_name, args.src, args.dst, args.link_name, force=args.force, no_git=args.no_git, no_link=args.no_link)
@@ -33,8 +35,7 @@ if __name__ == '__main__':
     
     if args.command in ['edit', 'e']:
         if args.lock:
-            lock_path = os.path.join(os.environ['DOTFILES_PATH'], '.doty_config', 'doty_lock.yml')
-            process = subprocess.run(['nano', lock_path])
+            process = subprocess.run(['nano', *get_lock_paths()])
             exit(process.returncode)
         elif args.config:
             config_path = os.path.join(os.environ['DOTFILES_PATH'], '.doty_config', 'dotyrc')
@@ -48,4 +49,15 @@ if __name__ == '__main__':
         get_logs(args.num_logs)
 
     if args.command in ['discover', 'd']:
-        discover()
\ No newline at end of file
+        discover()
+
+    if args.command == 'recover':
+        recover(replay=args.replay)
+
+    if args.command == 'apply-fleet':
+        exit(0 if apply_fleet_cmd(args.homes, args.homes_file, jobs=args.jobs, dry_run=args.dry_run) else 1)
+
+    if args.command == 'migrate':
+        if not migrate(args.layout, commit=not args.no_commit):
+            print(f'Lock file is already {args.layout}.')
+            exit(0)
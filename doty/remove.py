@@ -1,9 +1,11 @@
 import os
-import shutil
 from update import update
 from classes.logger import DotyLogger
 from helpers.discover import find_all_dotfiles, _find_all_links
-from helpers.utils import load_lock_file, write_lock_file
+from helpers.txn import lock_txn
+from helpers.move import move_path
+from helpers.utils import load_lock_index
+from helpers.shards import get_lock_paths
 
 logger = DotyLogger()
 
@@ -20,7 +22,7 @@ def remove_file(dotfile: str) -> None:
     
     if os.path.isfile(dotfile) and not os.path.isfile(home_path):
         logger.info('##bred##Removing##end## ##bwhite##Dotfile from dotfiles directory to HOME directory')
-        shutil.move(dotfile, home_path)
+        move_path(dotfile, home_path)
     else:
         logger.error(f'\n##bred##Error##end## ##bwhite##Target {dotfile} does not appear to be a file. Please remove manually')
         exit(1)
@@ -66,31 +68,37 @@ def _remove(name: str, link_only: bool = False, no_git: bool = False, force: boo
 
 def remove(name: str, link_only: bool = False, no_git: bool = False, force: bool = False) -> None:
     """Remove dotfiles from the repo"""
-    lock_path = os.path.join(os.environ['DOTFILES_PATH'], '.doty_config', 'doty_lock.yml')
-    yml = load_lock_file(lock_path)
+    # Each shard is loaded once, until the entry is found, and its index is reused by the transaction
+    for lock_path in get_lock_paths():
+        if not os.path.exists(lock_path):
+            continue
 
-    try:
-        idx = yml.index([entry for entry in yml if entry['name'] == name or entry['link_name'] == name][0])
-    except (IndexError, ValueError):
-        logger.error(f'\n##byellow##Could not find dotfile {name}')
-        exit(3)
+        index = load_lock_index(lock_path)
 
-    matched_dotfile = yml[idx]
-    
-    if not force:
-        confirm = input(f'\n\033[1;33mAre you sure you want to remove{" link" if link_only else ""}\033[0m \033[1;37m{matched_dotfile["name"]}\033[1;33m from the dotfiles dir? (y/N)\033[0m ')
+        if index.by_name(name) is None and index.by_link_name(name) is None:
+            continue
 
-        if confirm.lower() != 'y':
-            logger.info('##byellow##Aborting')
-            exit(4)
-    
-    if link_only:
-        matched_dotfile['linked'] = False
-        yml[idx] = matched_dotfile
+        with lock_txn(lock_path, index) as lock:
+            rows = [i for i in (lock.find(name), lock.find_link(name)) if i is not None]
+            idx = min(rows)
+            matched_name = lock.index.table.names[idx]
+            
+            if not force:
+                confirm = input(f'\n\033[1;33mAre you sure you want to remove{" link" if link_only else ""}\033[0m \033[1;37m{matched_name}\033[1;33m from the dotfiles dir? (y/N)\033[0m ')
+
+                if confirm.lower() != 'y':
+                    logger.info('##byellow##Aborting')
+                    exit(4)
+            
+            if link_only:
+                lock.relink(idx, False)
+            else:
+                lock.remove(idx)
+
+        break
     else:
-        yml.pop(idx)
-    
-    write_lock_file(yml, lock_path)
+        logger.error(f'\n##byellow##Could not find dotfile {name}')
+        exit(3)
     
     if not no_git and os.environ['GIT_AUTO_COMMIT']:
         update()
@@ -101,37 +109,53 @@ def remove(name: str, link_only: bool = False, no_git: bool = False, force: bool
 
 def remove_multi(names: list, link_only: bool = False, no_git: bool = False, force: bool = False) -> None:
     """Remove dotfiles from the repo"""
-    lock_path = os.path.join(os.environ['DOTFILES_PATH'], '.doty_config', 'doty_lock.yml')
-    yml = load_lock_file(lock_path)
-    rm_entries = []
+    missing = list(names)
+
+    # Each shard is loaded once, until every name is found, and its index is reused by the transaction
+    for lock_path in get_lock_paths():
+        if not missing:
+            break
 
-    for i, entry in enumerate(yml):
-        if not entry['name'] in names:
+        if not os.path.exists(lock_path):
             continue
 
-        del names[names.index(entry['name'])]
+        index = load_lock_index(lock_path)
 
-        if not force:
-            confirm = input(f'\n\033[1;33mAre you sure you want to remove{" link" if link_only else ""}\033[0m \033[1;37m{entry["name"]}\033[1;33m from the dotfiles dir? (y/N)\033[0m ')
+        if all(index.by_name(name) is None for name in missing):
+            continue
 
-            if confirm.lower() != 'y':
-                logger.info(f'##byellow##Skipping {entry["name"]}')
-                continue
-        
-        if link_only:
-            entry['linked'] = False
-            yml[i] = entry
-            logger.info(f'##bred##Removing ##bwhite##link for {entry["name"]}')
-        else:
-            rm_entries.append(entry)
-    
-    [logger.error(f'##byellow##Could not find dotfile {name}') for name in names]
+        with lock_txn(lock_path, index) as lock:
+            found = {}
+            remaining = []
 
-    for entry in rm_entries:
-        yml.remove(entry)
-        logger.info(f'##bred##Removing ##bwhite##{entry["name"]}')
-    
-    write_lock_file(yml, lock_path)
+            for name in missing:
+                i = lock.find(name)
+
+                if i is None or i in found:
+                    remaining.append(name)
+                else:
+                    found[i] = name
+
+            missing = remaining
+
+            for i in sorted(found):
+                name = found[i]
+
+                if not force:
+                    confirm = input(f'\n\033[1;33mAre you sure you want to remove{" link" if link_only else ""}\033[0m \033[1;37m{name}\033[1;33m from the dotfiles dir? (y/N)\033[0m ')
+
+                    if confirm.lower() != 'y':
+                        logger.info(f'##byellow##Skipping {name}')
+                        continue
+                
+                if link_only:
+                    lock.relink(i, False)
+                    logger.info(f'##bred##Removing ##bwhite##link for {name}')
+                else:
+                    lock.remove(i)
+                    logger.info(f'##bred##Removing ##bwhite##{name}')
+        
+    [logger.error(f'##byellow##Could not find dotfile {name}') for name in missing]
     
     if not no_git and os.environ['GIT_AUTO_COMMIT']:
         update()
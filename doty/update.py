@@ -2,7 +2,13 @@ import os
 from classes.logger import DotyLogger
 from helpers.discover import discover
 from helpers.git import make_commit, get_repo, parse_status
-from helpers.lock import compare_lock_yaml
+from helpers.lock import compare_lock_yaml, plan_lock_yaml
+from helpers.fastpath import is_unchanged, save_update_state, clear_update_state
+from helpers.utils import compact_lock_journal
+from helpers.shards import get_lock_paths, migrate_lock, get_lock_sources, get_changed_lock_paths
+from helpers.wal import UpdateWAL, has_pending_wal
+from classes.report import ShortReport2 as ShortReport
+from classes.plan import Plan
 
 logger = DotyLogger()
 
@@ -66,9 +72,19 @@ def _update(commit: bool = os.getenv('GIT_AUTO_COMMIT', True), quiet: bool = Fal
     if quiet:
         logger.set_info()
 
-def update(commit: bool = os.getenv('GIT_AUTO_COMMIT', True), quiet: bool = False, dry_run: bool = False):
+def update(
+    commit: bool = os.getenv('GIT_AUTO_COMMIT', True),
+    quiet: bool = False,
+    dry_run: bool = False,
+    save_plan: str = '',
+    plan_path: str = ''
+):
     """Detect changes in the repo"""
 
+    # Saving a plan only plans, nothing is changed until it is applied
+    if save_plan:
+        dry_run = True
+
     if dry_run:
         quiet = False
         logger.info('\n##byellow##!!Dry run, no changes will be made!!')
@@ -80,7 +96,47 @@ def update(commit: bool = os.getenv('GIT_AUTO_COMMIT', True), quiet: bool = Fals
 
     logger.info('\n##bblue##Discovering changes and updating Dotfiles Repo\n')
 
-    report = compare_lock_yaml(dry_run=dry_run)
+    if has_pending_wal():
+        if dry_run:
+            logger.warning('##byellow##The last update did not finish, run doty recover before applying this plan')
+        else:
+            # Plans are made against the lock files, which the interrupted update never wrote
+            logger.warning('##byellow##The last update did not finish, undoing its changes first')
+            recover()
+
+    if plan_path:
+        plan = Plan.load(plan_path)
+        changed = get_changed_lock_paths(plan.sources)
+
+        # Applying the plan writes its copy of the lock files, any change made since would be lost
+        if changed:
+            logger.error(f'##bred##Error##end## ##bwhite##The lock files changed since the plan was saved ({", ".join(changed)}). Save the plan again.')
+            exit(1)
+
+        logger.info(f'##bwhite##Applying {len(plan)} planned changes from {plan_path}')
+    # Nothing has changed since the last update left everything in place
+    elif is_unchanged():
+        report = ShortReport()
+        report.gen_full_report({})
+        logger.info(str(report))
+        logger.info('##byellow##Skipping git repo update')
+        return
+    else:
+        plan = plan_lock_yaml()
+
+    if save_plan:
+        plan.sources = get_lock_sources(path for path, _ in plan.locks)
+        plan.save(save_plan)
+        logger.info(f'##bgreen##Saved {len(plan)} planned changes to {save_plan}')
+
+    report = compare_lock_yaml(dry_run=dry_run, plan=plan)
+
+    # The update was undone, the lock files are left uncommitted so the next update plans it again
+    if report is None:
+        logger.info('##byellow##Skipping git repo update')
+        clear_update_state()
+        return
+
     repo = get_repo()
     report.gen_full_report(repo.status())
 
@@ -88,6 +144,67 @@ def update(commit: bool = os.getenv('GIT_AUTO_COMMIT', True), quiet: bool = Fals
 
     if not dry_run and commit and report.changes:
         logger.info('##bwhite##Committing changes')
+        # Writing the lock files folds in their journals, this only matters if something was journaled since
+        for lock_path in get_lock_paths():
+            compact_lock_journal(lock_path)
         make_commit(repo, report.git_report)
+        save_update_state()
     else:
-        logger.info('##byellow##Skipping git repo update')
\ No newline at end of file
+        logger.info('##byellow##Skipping git repo update')
+
+        if not dry_run and not report.changes:
+            save_update_state()
+        elif not dry_run:
+            clear_update_state()
+
+def recover(replay: bool = False) -> None:
+    """Undo the changes of an update that failed or was interrupted, or finish it if replay is set"""
+    wal = UpdateWAL.load()
+
+    if wal is None:
+        logger.info('##byellow##Nothing to recover')
+        return
+
+    failures = wal.failures()
+
+    if failures:
+        logger.warning('##byellow##The last update failed at:##end##\n' + '\n'.join(f'  {failure}' for failure in failures))
+
+    if not replay:
+        applied = len(wal.applied())
+
+        if wal.rollback():
+            logger.error('##bred##Some changes could not be undone, fix the errors above and run doty recover again')
+            return
+
+        logger.info(f'##bgreen##Undid {applied} changes of the last update')
+        clear_update_state()
+        return
+
+    report = wal.replay()
+
+    if wal.failed:
+        logger.error('##bred##Some changes could not be made, fix the errors above and run doty recover again')
+        return
+
+    report.gen_full_report(get_repo().status())
+    logger.info(str(report))
+    clear_update_state()
+
+
+def migrate(layout: str, commit: bool = True) -> bool:
+    """Switch the lock file layout, 'sharded' or 'single', and commit it. Returns False if it is already in that layout."""
+    if not migrate_lock(sharded=layout == 'sharded'):
+        return False
+
+    # The entries are the same, the update only confirms nothing has to move
+    update(commit=commit, quiet=True)
+
+    # The report does not count the lock files, so the update never commits the new layout by itself
+    repo = get_repo()
+
+    if commit and repo.status():
+        logger.info(f'##bwhite##Committing the {layout} lock layout')
+        make_commit(repo, f'Migrate lock to {layout}')
+
+    return True
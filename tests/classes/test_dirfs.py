@@ -0,0 +1,64 @@
+import os
+import pytest
+from doty.classes import dirfs
+from doty.classes.dirfs import DirFS
+from doty.classes.stats import StatCache
+
+
+@pytest.fixture
+def home(tmp_path):
+    (tmp_path / 'dotfiles' / 'nvim' / 'lua').mkdir(parents=True)
+    (tmp_path / 'dotfiles' / 'nvim' / 'lua' / 'init.lua').touch()
+    (tmp_path / '.profile').touch()
+    return tmp_path
+
+
+@pytest.fixture(params=[True, False])
+def supported(request, monkeypatch):
+    monkeypatch.setattr(dirfs, 'SUPPORTED', request.param and dirfs.SUPPORTED)
+    return request.param
+
+
+def test_dirfs_matches_os(home, supported):
+    target = str(home / 'dotfiles' / 'nvim' / 'lua' / 'init.lua')
+    link = str(home / 'init.lua')
+
+    with DirFS((str(home), str(home / 'dotfiles'))) as fs:
+        assert fs.lstat(target) == os.lstat(target)
+
+        with pytest.raises(FileNotFoundError):
+            fs.lstat(str(home / '.missing'))
+
+        fs.symlink(target, link)
+        assert os.readlink(link) == fs.readlink(link) == target
+
+        fs.rename(link, str(home / 'dotfiles' / 'nvim' / 'init.lua'))
+        assert not os.path.lexists(link)
+        assert os.readlink(home / 'dotfiles' / 'nvim' / 'init.lua') == target
+
+        fs.unlink(str(home / 'dotfiles' / 'nvim' / 'init.lua'))
+        assert not os.path.lexists(home / 'dotfiles' / 'nvim' / 'init.lua')
+
+
+def test_dirfs_keeps_dirs_open(home):
+    with DirFS((str(home),), max_dirs=1) as fs:
+        fs.lstat(str(home / 'dotfiles' / 'nvim' / 'lua' / 'init.lua'))
+        assert str(home / 'dotfiles' / 'nvim' / 'lua') in fs._fds
+
+        # Over max_dirs, directories are opened for the call and closed again
+        fs.lstat(str(home / 'dotfiles' / 'nvim'))
+        assert len(fs._fds) == 2
+
+    assert not fs._fds
+
+    with DirFS((str(home),), max_dirs=0) as fs:
+        fs.lstat(str(home / 'dotfiles' / 'nvim'))
+        assert list(fs._fds) == [str(home)]
+
+
+def test_stat_cache_dirfs(home):
+    with DirFS((str(home),)) as fs:
+        stats = StatCache(fs=fs)
+        assert stats.exists(str(home / 'dotfiles' / 'nvim' / 'lua' / 'init.lua'))
+        assert stats.isdir(str(home / 'dotfiles'))
+        assert not stats.exists(str(home / '.missing'))
@@ -119,4 +119,66 @@ def test_extrapolate(temp_dir, input, expected):
 
     entry = DotyEntry(input)
 
-    assert entry.dict == expected
\ No newline at end of file
+    assert entry.dict == expected
+
+def test_hash_and_order(temp_dir):
+    entry1 = DotyEntry({'name': '.bashrc'})
+    entry2 = DotyEntry({'name': '.bashrc', 'src': str(temp_dir / '.bashrc')})
+    entry3 = DotyEntry({'name': '.zshrc'})
+
+    assert hash(entry1) == hash(entry2)
+    assert len({entry1, entry2, entry3}) == 2
+    assert sorted([entry3, entry1]) == [entry1, entry3]
+    assert entry1 < entry3
+    assert entry1 != 'bashrc'
+
+def test_cached_values(temp_dir):
+    entry = DotyEntry({'name': '.bashrc', 'unknown': 'ignored'})
+
+    assert not hasattr(entry, '__dict__')
+    assert not hasattr(entry, 'unknown')
+    assert entry.fingerprint is entry.fingerprint
+
+    # Each dict is a copy, changing it does not change the entry
+    entry.dict['linked'] = False
+    assert entry.linked is True
+
+    entry.linked = False
+    assert entry.dict['linked'] is False
+    assert entry.fingerprint[3] is False
+    assert entry == DotyEntry({'name': '.bashrc', 'linked': False})
+
+def test_hashed_entry_is_frozen(temp_dir):
+    entry = DotyEntry({'name': '.bashrc'})
+    entries = {entry}
+
+    with pytest.raises(AttributeError):
+        entry.linked = False
+
+    assert entry in entries
+
+    unlinked = entry.replace(linked=False)
+    assert unlinked == DotyEntry({'name': '.bashrc', 'linked': False})
+    assert unlinked not in entries
+    assert entry.linked is True
+
+def test_from_many(temp_dir):
+    dicts = [
+        { 'name': '.bashrc' },
+        { 'src': '/home/user/.zshrc', 'dst': 'zsh/.zshrc', 'linked': False },
+        { 'name': '.vimrc', 'link_name': '.vimrc.1' }
+    ]
+
+    assert DotyEntry.from_many(dicts) == [DotyEntry(d) for d in dicts]
+
+    entries = DotyEntry.from_many(dicts, home='/home/other')
+    assert entries[0].src == '/home/other/.bashrc'
+    assert entries[0].dst == '/home/other/dotfiles/.bashrc'
+    assert entries[1].dict == {
+        'name': '.zshrc',
+        'src': '/home/user/.zshrc',
+        'dst': '/home/other/dotfiles/zsh/.zshrc',
+        'linked': False,
+        'link_name': '.zshrc'
+    }
+    assert DotyEntry.from_many(dicts, dotfiles='/srv/dots')[2].dst == '/srv/dots/.vimrc'
@@ -0,0 +1,35 @@
+from doty.classes.index import LockIndex
+from doty.classes.table import LockTable
+
+HOME = '/home/user'
+
+
+def test_index_lookups():
+    index = LockIndex(LockTable.from_dicts([
+        { 'name': '.bashrc' },
+        { 'name': '.vimrc', 'link_name': '.vimrc.1' },
+        { 'name': '.bashrc', 'dst': 'other/.bashrc' }
+    ], home=HOME))
+
+    assert index.by_name('.bashrc') == 0
+    assert index.by_name('.vimrc') == 1
+    assert index.by_name('.zshrc') is None
+    assert index.by_dst('/home/user/dotfiles/other/.bashrc') == 2
+    assert index.by_src('/home/user/.vimrc') == 1
+    assert index.by_link_name('.vimrc.1') == 1
+    assert index.by_link_name('.vimrc') is None
+
+
+def test_index_add_and_remove():
+    index = LockIndex(LockTable.from_dicts([{ 'name': '.bashrc' }, { 'name': '.vimrc' }], home=HOME))
+
+    i = index.add({ 'name': '.zshrc' }, home=HOME)
+    assert i == 2
+    assert index.by_name('.zshrc') == 2
+    assert index.by_dst('/home/user/dotfiles/.zshrc') == 2
+
+    index.remove([0])
+    assert len(index) == 2
+    assert index.by_name('.bashrc') is None
+    assert index.by_name('.vimrc') == 0
+    assert index.by_name('.zshrc') == 1
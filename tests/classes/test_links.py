@@ -0,0 +1,53 @@
+import os
+import pytest
+from doty.classes.links import HomeLinkIndex
+
+
+@pytest.fixture
+def home(tmp_path):
+    (tmp_path / 'dotfiles').mkdir()
+    (tmp_path / 'dotfiles' / '.bashrc').touch()
+    (tmp_path / '.bashrc').symlink_to(tmp_path / 'dotfiles' / '.bashrc')
+    (tmp_path / '.profile').touch()
+    (tmp_path / '.broken').symlink_to(tmp_path / 'dotfiles' / '.missing')
+    (tmp_path / '.config' / 'nvim').mkdir(parents=True)
+    (tmp_path / '.config' / 'nvim' / 'init.lua').symlink_to(tmp_path / 'dotfiles' / '.bashrc')
+    return tmp_path
+
+
+def test_home_link_index(home):
+    links = HomeLinkIndex(str(home), link_names=['.config/nvim/init.lua'])
+
+    assert links.get('.bashrc') == (True, str(home / 'dotfiles' / '.bashrc'))
+    assert links.get('.profile') == (False, None)
+    assert links.get('.missing') is None
+    assert '.profile' in links
+    assert '.missing' not in links
+
+    for name in ['.bashrc', '.profile', '.broken', '.missing', '.config/nvim/init.lua', '.config', 'dotfiles']:
+        path = str(home / name)
+        assert links.islink(name) == os.path.islink(path)
+        assert links.exists(name) == os.path.exists(path)
+        assert links.lexists(name) == os.path.lexists(path)
+
+
+def test_home_link_index_unscanned_dir(home):
+    links = HomeLinkIndex(str(home))
+    assert links.islink('.config/nvim/init.lua')
+    assert links.target('.config/nvim/init.lua') == str(home / 'dotfiles' / '.bashrc')
+
+
+def test_home_link_index_updates(home, tmp_path):
+    links = HomeLinkIndex(str(home))
+
+    os.unlink(home / '.bashrc')
+    links.discard(str(home / '.bashrc'))
+    assert not links.lexists('.bashrc')
+
+    os.symlink(home / 'dotfiles' / '.bashrc', home / '.bashrc_unique')
+    links.set(str(home / '.bashrc_unique'), True, str(home / 'dotfiles' / '.bashrc'))
+    assert links.islink('.bashrc_unique')
+
+    # Paths outside of $HOME are ignored
+    links.set(str(tmp_path.parent / '.outside'), False)
+    assert '../.outside' not in links._links
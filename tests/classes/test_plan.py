@@ -0,0 +1,98 @@
+import pytest
+from doty.classes.plan import Plan, PlanOp, MOVE_IN, MOVE_OUT, RENAME, LINK, UNLINK
+from doty.classes.entry import DotyEntry
+from doty.classes.report import ShortReport2 as ShortReport
+
+HOME = '/home/user'
+
+
+@pytest.fixture
+def plan(monkeypatch):
+    monkeypatch.setenv('HOME', HOME)
+    bashrc = DotyEntry({'name': '.bashrc'})
+    vimrc = DotyEntry({'name': '.vimrc', 'dst': 'vim/.vimrc'})
+    prior_vimrc = DotyEntry({'name': '.vimrc'})
+
+    plan = Plan(locks=[(f'{HOME}/dotfiles/.doty_config/doty_lock.yml', [bashrc.dict, vimrc.dict])])
+    plan.add(MOVE_IN, bashrc.src, bashrc.dst, bashrc.name, bashrc)
+    plan.add(LINK, bashrc.src, bashrc.dst, bashrc.link_name, bashrc)
+    plan.add(UNLINK, prior_vimrc.src, prior_vimrc.dst, vimrc.name, prior_vimrc)
+    plan.add(RENAME, prior_vimrc.dst, vimrc.dst, vimrc.name, vimrc, prior_vimrc)
+    plan.add(LINK, vimrc.src, vimrc.dst, vimrc.name, vimrc)
+    return plan
+
+
+def test_plan_batches(plan):
+    # Linking .bashrc waits for it to be moved in, relinking .vimrc for the old link to be removed
+    assert [[op.op for op in batch] for batch in plan.batches((HOME, f'{HOME}/dotfiles'))] == [
+        [MOVE_IN],
+        [LINK, UNLINK, RENAME],
+        [LINK],
+    ]
+    assert list(Plan().batches()) == []
+
+
+def test_plan_batches_roots(monkeypatch):
+    monkeypatch.setenv('HOME', HOME)
+    roots = (HOME, f'{HOME}/dotfiles')
+    entries = [
+        DotyEntry({'name': '.bashrc'}),
+        DotyEntry({'name': '.zshrc'}),
+        DotyEntry({'name': 'init.lua', 'dst': 'nvim/init.lua'}),
+        DotyEntry({'name': 'plugins.lua', 'dst': 'nvim/lua/plugins.lua'}),
+    ]
+    plan = Plan()
+
+    for entry in entries:
+        plan.add(MOVE_IN, entry.src, entry.dst, entry.name, entry)
+
+    # Both nvim files may create the nvim directory, files directly in a root share nothing
+    assert [len(batch) for batch in plan.batches(roots)] == [3, 1]
+    assert plan.ops[2].keys(roots) == {entries[2].src, entries[2].dst, f'{HOME}/dotfiles/nvim'}
+
+    # Links may create the directories they are in as well
+    link = plan.add(LINK, f'{HOME}/.config/nvim/init.lua', entries[2].dst, 'init.lua', entries[2])
+    assert link.keys(roots) == {link.path, f'{HOME}/.config/nvim', f'{HOME}/.config'}
+
+
+def test_plan_json(plan, tmp_path):
+    path = str(tmp_path / 'plan.json')
+    plan.sources = {f'{HOME}/dotfiles/.doty_config/doty_lock.yml': 'abc', f'{HOME}/dotfiles/.doty_config/lock.d/nvim.yml': None}
+    plan.save(path)
+    loaded = Plan.load(path)
+
+    assert loaded.ops == plan.ops
+    assert loaded.locks == plan.locks
+    assert loaded.sources == plan.sources
+    assert str(loaded) == str(plan)
+    assert str(plan).splitlines()[0] == f'move_in {HOME}/.bashrc -> {HOME}/dotfiles/.bashrc'
+
+    with pytest.raises(ValueError):
+        PlanOp.from_dict({**plan.ops[0].to_dict(), 'op': 'copy'})
+
+
+def test_plan_report(plan):
+    report = ShortReport()
+    plan.report(report)
+
+    assert report.files['.bashrc'].is_add
+    assert report.links['.bashrc'].is_add
+    assert report.files['.vimrc'].is_update
+    assert report.links['.vimrc'].is_update
+
+    report = ShortReport()
+    Plan([PlanOp(MOVE_OUT, plan.ops[0].target, plan.ops[0].path, '.bashrc', plan.ops[0].entry)]).report(report)
+    assert report.files['.bashrc'].is_rm
+
+
+def test_plan_inverse(plan):
+    move_in, link, unlink, rename, _ = plan.ops
+
+    assert move_in.inverse() == move_in._replace(op=MOVE_OUT, path=move_in.target, target=move_in.path)
+    assert move_in.inverse().inverse() == move_in
+    assert link.inverse() == link._replace(op=UNLINK)
+    assert unlink.inverse() == unlink._replace(op=LINK)
+    assert rename.inverse().paths == (rename.target, rename.path)
+
+    # The target of a link removed without knowing it cannot be restored
+    assert unlink._replace(target='').inverse() is None
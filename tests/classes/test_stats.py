@@ -0,0 +1,69 @@
+import os
+import pytest
+from doty.classes.stats import StatCache
+from doty.classes.links import HomeLinkIndex
+
+
+@pytest.fixture
+def home(tmp_path):
+    (tmp_path / 'dotfiles').mkdir()
+    (tmp_path / 'dotfiles' / '.bashrc').touch()
+    (tmp_path / '.bashrc').symlink_to(tmp_path / 'dotfiles' / '.bashrc')
+    (tmp_path / '.profile').touch()
+    (tmp_path / '.broken').symlink_to(tmp_path / 'dotfiles' / '.missing')
+    return tmp_path
+
+
+def test_stat_cache_matches_os_path(home):
+    stats = StatCache()
+
+    for name in ['.bashrc', '.profile', '.broken', '.missing', 'dotfiles', 'dotfiles/.bashrc']:
+        path = str(home / name)
+        assert stats.exists(path) == os.path.exists(path)
+        assert stats.lexists(path) == os.path.lexists(path)
+        assert stats.islink(path) == os.path.islink(path)
+        assert stats.isdir(path) == os.path.isdir(path)
+
+
+def test_stat_cache_stats_once(home, monkeypatch):
+    stats = StatCache()
+    path = str(home / '.profile')
+    calls = []
+    lstat = os.lstat
+    monkeypatch.setattr(os, 'lstat', lambda p: calls.append(p) or lstat(p))
+
+    assert stats.exists(path)
+    assert not stats.islink(path)
+    assert stats.lexists(path)
+    assert calls == [path]
+
+
+def test_stat_cache_records_changes(home, monkeypatch):
+    links = HomeLinkIndex(str(home))
+    stats = StatCache(links)
+    src, dst = str(home / '.profile'), str(home / 'dotfiles' / 'shell' / '.profile')
+
+    assert stats.exists(src)
+    assert not stats.exists(dst)
+
+    os.makedirs(os.path.dirname(dst))
+    os.rename(src, dst)
+    stats.moved(src, dst)
+
+    monkeypatch.setattr(os, 'lstat', lambda p: pytest.fail(f'{p} should not be stat\'ed'))
+    assert not stats.exists(src)
+    assert stats.exists(dst)
+    assert not links.lexists('.profile')
+    monkeypatch.undo()
+
+    os.symlink(dst, src)
+    stats.linked(src, dst)
+    assert stats.islink(src)
+    assert stats.exists(src)
+    assert links.islink('.profile')
+    assert links.exists('.profile')
+
+    os.unlink(src)
+    stats.unlinked(src)
+    assert not stats.lexists(src)
+    assert not links.lexists('.profile')
@@ -0,0 +1,62 @@
+from doty.classes.entry import DotyEntry
+from doty.classes.table import LockTable
+
+HOME = '/home/user'
+
+DICTS = [
+    { 'name': '.bashrc' },
+    { 'name': '.zshrc', 'linked': False },
+    { 'src': '/home/user/.config/nvim', 'dst': 'nvim', 'link_name': 'nvim.1' }
+] + [{ 'name': f'.file{i}', 'linked': i % 3 == 0 } for i in range(20)]
+
+
+def test_table_matches_entries():
+    table = LockTable.from_dicts(DICTS, home=HOME)
+    entries = DotyEntry.from_many(DICTS, home=HOME)
+
+    assert len(table) == len(entries)
+    assert table.to_dicts() == [entry.dict for entry in entries]
+    assert [row.fingerprint for row in table] == [entry.fingerprint for entry in entries]
+    assert table.entries(range(len(table))) == entries
+
+
+def test_table_linked_bitmap():
+    table = LockTable.from_dicts(DICTS, home=HOME)
+
+    assert [table.is_linked(i) for i in range(len(table))] == [d.get('linked', True) for d in DICTS]
+
+    table.set_linked(0, False)
+    table.set_linked(1, True)
+    assert not table.is_linked(0)
+    assert table.is_linked(1)
+    assert table.is_linked(2)
+
+
+def test_table_difference():
+    prior = LockTable.from_dicts(DICTS[:10], home=HOME)
+    current = LockTable.from_dicts(DICTS[1:8] + [{ 'name': '.new' }, { 'name': '.file6', 'linked': False }], home=HOME)
+
+    assert current.difference(prior) == [7, 8]
+    assert prior.difference(current) == [0, 8, 9]
+
+
+def test_table_entries_write_back():
+    table = LockTable.from_dicts(DICTS, home=HOME)
+    entry = table.entry(0)
+
+    assert table.entry(0) is entry
+    entry.linked = False
+    assert table.row(0).linked is False
+    assert table.to_dicts()[0]['linked'] is False
+
+
+def test_table_append_and_delete():
+    table = LockTable.from_dicts(DICTS[:3], home=HOME)
+    i = table.append({ 'name': '.vimrc' }, home=HOME)
+
+    assert i == 3
+    assert table.as_dict(i) == DotyEntry.from_many([{ 'name': '.vimrc' }], home=HOME)[0].dict
+
+    table.delete([0, 2])
+    assert table.names == ['.zshrc', '.vimrc']
+    assert [table.is_linked(i) for i in range(len(table))] == [False, True]
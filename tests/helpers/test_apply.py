@@ -0,0 +1,68 @@
+import os
+import pytest
+from doty.helpers import apply
+from doty.helpers.apply import apply_plan, get_workers
+from doty.classes.plan import Plan, MOVE_IN, LINK
+from doty.classes.entry import DotyEntry
+from doty.classes.report import ShortReport2 as ShortReport
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    (tmp_path / 'dotfiles').mkdir()
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('DOTFILES_PATH', str(tmp_path / 'dotfiles'))
+    return tmp_path
+
+
+def test_get_workers(monkeypatch):
+    monkeypatch.delenv('DOTY_WORKERS', raising=False)
+    assert get_workers() == apply.DEFAULT_WORKERS
+
+    monkeypatch.setenv('DOTY_WORKERS', '3')
+    assert get_workers() == 3
+
+    monkeypatch.setenv('DOTY_WORKERS', '0')
+    assert get_workers() == 1
+
+    monkeypatch.setenv('DOTY_WORKERS', 'many')
+    assert get_workers() == apply.DEFAULT_WORKERS
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_apply_plan(home, workers, capfd):
+    names = [f'.file{i}' for i in range(10)]
+    plan = Plan()
+
+    for i, name in enumerate(names):
+        entry = DotyEntry({'name': name, 'dst': f'dir{i % 3}/{name}'})
+        (home / name).touch()
+        plan.add(MOVE_IN, entry.src, entry.dst, entry.name, entry)
+        plan.add(LINK, entry.src, entry.dst, entry.link_name, entry)
+
+    # Fails, the file is not in $HOME
+    missing = DotyEntry({'name': '.missing'})
+    plan.add(MOVE_IN, missing.src, missing.dst, missing.name, missing)
+
+    report = apply_plan(plan, workers=workers)
+    assert 'Error' in capfd.readouterr().err
+
+    for i, name in enumerate(names):
+        assert os.readlink(home / name) == str(home / 'dotfiles' / f'dir{i % 3}' / name)
+
+    # The report is in plan order, however the threads finished
+    assert list(report.files) == names
+    assert list(report.links) == names
+    assert not os.path.exists(missing.dst)
+
+
+def test_apply_plan_dry_run(home):
+    entry = DotyEntry({'name': '.bashrc'})
+    (home / '.bashrc').touch()
+    plan = Plan()
+    plan.add(MOVE_IN, entry.src, entry.dst, entry.name, entry)
+
+    report = apply_plan(plan, ShortReport(), dry_run=True)
+    assert report.files['.bashrc'].is_add
+    assert os.path.isfile(entry.src)
+    assert not os.path.exists(entry.dst)
@@ -0,0 +1,82 @@
+import sqlite3
+import builtins
+import pytest
+from doty.helpers.backend import get_lock_backend, YamlLockBackend, SqliteLockBackend
+from doty.helpers.journal import append_journal
+from doty.helpers.utils import write_lock_file
+
+ENTRIES = [
+    {'name': '.bashrc'},
+    {'name': 'init.lua', 'dst': 'nvim/init.lua', 'link_name': 'init.lua'},
+    {'name': 'plugins.lua', 'dst': 'nvim/lua/plugins.lua', 'linked': False},
+    {'name': 'nvimrc', 'dst': 'nvim_old/nvimrc'},
+]
+
+
+@pytest.fixture
+def lock_path(tmp_path):
+    (tmp_path / 'dotfiles' / '.doty_config').mkdir(parents=True)
+    path = str(tmp_path / 'dotfiles' / '.doty_config' / 'doty_lock.yml')
+    write_lock_file(ENTRIES, path)
+    return path
+
+
+def test_get_lock_backend(lock_path, monkeypatch):
+    monkeypatch.delenv('DOTY_LOCK_BACKEND', raising=False)
+    assert isinstance(get_lock_backend(lock_path), YamlLockBackend)
+    assert not isinstance(get_lock_backend(lock_path), SqliteLockBackend)
+
+    monkeypatch.setenv('DOTY_LOCK_BACKEND', 'sqlite')
+    assert isinstance(get_lock_backend(lock_path), SqliteLockBackend)
+    assert isinstance(get_lock_backend(lock_path, 'yaml'), YamlLockBackend)
+
+
+@pytest.mark.parametrize('name', ['yaml', 'sqlite'])
+def test_backend_queries(lock_path, name):
+    backend = get_lock_backend(lock_path, name)
+
+    assert backend.load() == ENTRIES
+    assert backend.find('name', 'init.lua') == ENTRIES[1]
+    assert backend.find('dst', 'nvim/lua/plugins.lua') == ENTRIES[2]
+    assert backend.find('name', '.zshrc') is None
+    assert backend.under('nvim/') == ENTRIES[1:3]
+
+
+def test_sqlite_export_matches_yaml(lock_path, tmp_path):
+    with open(lock_path, 'rb') as f:
+        yaml_export = f.read()
+
+    backend = get_lock_backend(lock_path, 'sqlite')
+    backend.write(backend.load())
+
+    with open(lock_path, 'rb') as f:
+        assert f.read() == yaml_export
+
+    with sqlite3.connect(backend.db_path) as conn:
+        assert conn.execute('SELECT COUNT(*) FROM entries').fetchone() == (len(ENTRIES),)
+
+
+def test_sqlite_reloads_edited_yaml(lock_path):
+    backend = get_lock_backend(lock_path, 'sqlite')
+    assert backend.load() == ENTRIES
+
+    write_lock_file(ENTRIES[:1], lock_path)
+    assert backend.load() == ENTRIES[:1]
+
+    append_journal(lock_path, {'op': 'add', 'entry': {'name': '.zshrc'}})
+    assert backend.load() == [ENTRIES[0], {'name': '.zshrc'}]
+
+
+def test_sqlite_does_not_read_unchanged_yaml(lock_path, monkeypatch):
+    backend = get_lock_backend(lock_path, 'sqlite')
+    assert backend.load() == ENTRIES
+
+    real_open = builtins.open
+
+    def checked_open(path, *args, **kwargs):
+        assert path != lock_path, 'lock file was read'
+        return real_open(path, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, 'open', checked_open)
+    assert backend.find('name', 'init.lua') == ENTRIES[1]
+    assert backend.load() == ENTRIES
@@ -0,0 +1,54 @@
+import os
+import pytest
+from doty.helpers.diff import LockDiff, diff_lock_entries
+from doty.classes.entry import DotyEntry
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup(temp_dir):
+    os.environ.update(
+        {"HOME": str(temp_dir), "DOTFILES_PATH": str(temp_dir / "dotfiles")}
+    )
+
+
+def test_diff_lock_entries_empty():
+    current = [DotyEntry({"name": ".bashrc"}), DotyEntry({"name": ".zshrc"})]
+
+    lock_diff = diff_lock_entries(current, [])
+    assert isinstance(lock_diff, LockDiff)
+    assert lock_diff.diff_current == current
+    assert lock_diff.diff_prior == []
+    assert lock_diff.added == current
+    assert lock_diff.removed == []
+    assert lock_diff.changed == []
+
+    assert not diff_lock_entries(current, list(current))
+
+
+def test_diff_lock_entries_groups():
+    prior = [
+        DotyEntry({"name": ".bashrc"}),
+        DotyEntry({"name": ".zshrc"}),
+        DotyEntry({"name": ".vimrc"}),
+    ]
+    current = [
+        DotyEntry({"name": ".bashrc"}),
+        DotyEntry({"name": ".zshrc", "link_name": ".zshrc_unique"}),
+        DotyEntry({"name": ".wshrc"}),
+    ]
+
+    lock_diff = diff_lock_entries(current, prior)
+    assert lock_diff.diff_current == current[1:]
+    assert lock_diff.diff_prior == prior[1:]
+    assert lock_diff.added == [current[2]]
+    assert lock_diff.removed == [prior[2]]
+    assert lock_diff.changed == [(prior[1], current[1])]
+
+
+def test_diff_lock_entries_matches_list_scan():
+    prior = [DotyEntry({"name": f".file{i}"}) for i in range(50)]
+    current = [DotyEntry({"name": f".file{i}", "linked": i % 3 != 0}) for i in range(25, 75)]
+
+    lock_diff = diff_lock_entries(current, prior)
+    assert lock_diff.diff_current == [e for e in current if e not in prior]
+    assert lock_diff.diff_prior == [e for e in prior if e not in current]
@@ -0,0 +1,79 @@
+import os
+import pytest
+from doty.helpers.fleet import build_fleet_template, apply_fleet, apply_home, fleet_summary
+
+
+@pytest.fixture
+def fleet(tmp_path, monkeypatch):
+    owner = tmp_path / 'owner'
+    dotfiles = tmp_path / 'repo'
+    (dotfiles / 'nvim').mkdir(parents=True)
+    (dotfiles / '.bashrc').write_text('bashrc')
+    (dotfiles / 'nvim' / 'init.lua').write_text('init')
+    (dotfiles / '.old').write_text('old')
+    owner.mkdir()
+
+    homes = []
+
+    for i in range(3):
+        home = tmp_path / f'user{i}'
+        home.mkdir()
+        homes.append(home)
+
+    # Deployed before .old was removed from the lock file
+    (homes[0] / '.old').symlink_to(dotfiles / '.old')
+    # Something of the user's own is in the way
+    (homes[1] / '.bashrc').write_text('mine')
+
+    # Nothing below may fall back to the environment
+    monkeypatch.setenv('HOME', str(tmp_path / 'nowhere'))
+
+    current = [
+        {'name': '.bashrc'},
+        {'name': 'init.lua', 'src': str(owner / '.config' / 'nvim' / 'init.lua'), 'dst': 'nvim/init.lua'},
+        {'name': '.profile'},
+    ]
+    prior = [{'name': '.bashrc'}, {'name': '.old'}]
+    template = build_fleet_template(current, prior, str(owner), str(dotfiles))
+
+    return template, homes, dotfiles
+
+
+def test_build_fleet_template(fleet):
+    template, _, dotfiles = fleet
+
+    # .profile was never moved into the repo
+    assert [values[:2] for values in template.entries] == [('.bashrc', '.bashrc'), ('init.lua', '.config/nvim/init.lua')]
+    assert template.removed == [('.old', '.old', str(dotfiles / '.old'), True, '.old')]
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_apply_fleet(fleet, jobs):
+    template, homes, dotfiles = fleet
+    results = apply_fleet(template, [str(home) for home in homes] + [str(homes[0].parent / 'missing')], jobs=jobs)
+
+    assert [result.home for result in results[:3]] == [str(home) for home in homes]
+    # Fresh homes get the directories nested links are in
+    for home in homes:
+        assert os.readlink(home / '.config' / 'nvim' / 'init.lua') == str(dotfiles / 'nvim' / 'init.lua')
+
+    assert os.readlink(homes[2] / '.bashrc') == str(dotfiles / '.bashrc')
+    assert not os.path.lexists(homes[0] / '.old')
+    assert (homes[1] / '.bashrc').read_text() == 'mine'
+
+    assert [(result.added, result.removed, result.conflicts) for result in results[:3]] == [(2, 1, 0), (1, 0, 1), (2, 0, 0)]
+    assert results[3].error
+
+    summary = fleet_summary(results)
+    assert '4 - 3 changed, 1 with errors' in summary
+
+    # Everything is in place, a second run changes nothing
+    assert not any(result.changes for result in apply_fleet(template, [str(home) for home in homes], jobs=jobs))
+
+
+def test_apply_home_dry_run(fleet):
+    template, homes, _ = fleet
+    result = apply_home(template, str(homes[2]), dry_run=True)
+
+    assert result.added == 2
+    assert not os.path.lexists(homes[2] / '.bashrc')
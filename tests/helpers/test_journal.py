@@ -0,0 +1,57 @@
+import os
+import pytest
+from doty.helpers.journal import get_journal_path, append_journal, read_journal, replay_journal
+from doty.helpers.utils import load_lock_file, write_lock_file, add_to_lock_file, compact_lock_journal
+
+
+@pytest.fixture
+def lock_path(tmp_path):
+    (tmp_path / 'dotfiles' / '.doty_config').mkdir(parents=True)
+    return str(tmp_path / 'dotfiles' / '.doty_config' / 'doty_lock.yml')
+
+
+def test_journal_path():
+    assert get_journal_path('/a/.doty_config/doty_lock.yml') == '/a/.doty_config/doty_lock.journal'
+
+
+def test_replay_journal():
+    entries = [{'name': '.bashrc'}, {'name': '.vimrc', 'linked': True}]
+    records = [
+        {'op': 'add', 'entry': {'name': '.zshrc'}},
+        {'op': 'add', 'entry': {'name': '.bashrc', 'dst': 'other'}},
+        {'op': 'remove', 'name': '.bashrc'},
+        {'op': 'link', 'name': '.vimrc', 'linked': False},
+        {'op': 'remove', 'name': '.missing'}
+    ]
+
+    assert replay_journal(entries, records) == [{'name': '.vimrc', 'linked': False}, {'name': '.zshrc'}]
+    assert entries == [{'name': '.bashrc'}, {'name': '.vimrc', 'linked': True}]
+
+
+def test_read_journal_skips_torn_line(lock_path):
+    append_journal(lock_path, {'op': 'add', 'entry': {'name': '.zshrc'}})
+
+    with open(get_journal_path(lock_path), 'a') as f:
+        f.write('{"op":"remo')
+
+    assert read_journal(lock_path) == [{'op': 'add', 'entry': {'name': '.zshrc'}}]
+
+
+def test_lock_file_journal(lock_path, monkeypatch):
+    monkeypatch.setenv('HOME', '/home/user')
+    write_lock_file([{'name': '.bashrc'}], lock_path)
+
+    with open(lock_path, 'rb') as f:
+        snapshot = f.read()
+
+    assert add_to_lock_file({'name': '.zshrc'}, lock_path)
+    assert not add_to_lock_file({'name': '.zshrc'}, lock_path)
+
+    with open(lock_path, 'rb') as f:
+        assert f.read() == snapshot
+
+    assert [entry['name'] for entry in load_lock_file(lock_path)] == ['.bashrc', '.zshrc']
+    assert compact_lock_journal(lock_path)
+    assert not os.path.exists(get_journal_path(lock_path))
+    assert [entry['name'] for entry in load_lock_file(lock_path)] == ['.bashrc', '.zshrc']
+    assert not compact_lock_journal(lock_path)
@@ -0,0 +1,93 @@
+import os
+import pytest
+from doty.helpers.ledger import Ledger
+from doty.helpers.lock import check_for_mismatch, get_stat_cache
+from doty.classes.entry import DotyEntry
+from doty.classes.plan import Plan, LINK
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    (tmp_path / 'dotfiles' / '.doty_config').mkdir(parents=True)
+    (tmp_path / 'dotfiles' / 'nvim').mkdir()
+
+    for name in ['.bashrc', 'nvim/init.lua']:
+        (tmp_path / 'dotfiles' / name).touch()
+
+    (tmp_path / '.bashrc').symlink_to(tmp_path / 'dotfiles' / '.bashrc')
+    (tmp_path / 'init.lua').symlink_to(tmp_path / 'dotfiles' / 'nvim' / 'init.lua')
+
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('DOTFILES_PATH', str(tmp_path / 'dotfiles'))
+    return tmp_path
+
+
+@pytest.fixture
+def entries(home):
+    return [
+        DotyEntry({'name': '.bashrc'}),
+        DotyEntry({'name': 'init.lua', 'dst': 'nvim/init.lua'}),
+    ]
+
+
+def check(entries, ledger):
+    stats = get_stat_cache()
+    paths = []
+    lstat = stats.fs.lstat
+
+    class CountingFS:
+        def lstat(self, path):
+            paths.append(path)
+            return lstat(path)
+
+        readlink = staticmethod(os.readlink)
+
+    stats.fs = CountingFS()
+    queued = check_for_mismatch([], entries, stats=stats, ledger=ledger)
+    ledger.save(Plan())
+
+    return queued, paths
+
+
+def test_ledger_skips_verified_entries(home, entries):
+    queued, paths = check(entries, Ledger.load())
+    assert queued == []
+    assert entries[0].dst in paths
+
+    # Nothing changed, only the directories are stat'ed
+    ledger = Ledger.load()
+    queued, paths = check(entries, ledger)
+    assert queued == []
+    assert sorted(paths) == sorted({str(home), str(home / 'dotfiles'), str(home / 'dotfiles' / 'nvim')})
+    assert all(entry in ledger for entry in entries)
+
+
+def test_ledger_rechecks_changed_entries(home, entries):
+    check(entries, Ledger.load())
+
+    # $HOME changed, so its recorded paths are compared, the nvim directory did not
+    os.unlink(home / '.bashrc')
+    (home / '.profile').touch()
+    queued, paths = check(entries, Ledger.load())
+    assert queued == [entries[0]]
+    assert str(home / 'init.lua') in paths
+    assert str(home / 'dotfiles' / 'nvim' / 'init.lua') not in paths
+
+    # Entries with new values are verified again
+    entries[1].link_name = 'init.lua.1'
+    queued, paths = check(entries[1:], Ledger.load())
+    assert queued == [entries[1]]
+
+
+def test_ledger_leaves_out_planned_changes(home, entries):
+    ledger = Ledger.load()
+    check_for_mismatch([], entries, stats=get_stat_cache(), ledger=ledger)
+
+    plan = Plan()
+    plan.add(LINK, str(home / 'init.lua'), entries[1].dst, entries[1].link_name, entries[1])
+    ledger.save(plan)
+
+    ledger = Ledger.load()
+    assert str(home) not in ledger.dirs
+    assert str(home / 'dotfiles') in ledger.dirs
+    assert len(ledger.entries) == 1
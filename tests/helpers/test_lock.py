@@ -9,12 +9,16 @@ from doty.helpers.lock import (
     get_lock_file_diff,
     handle_prior_lock_changes,
     handle_current_lock_changes,
+    handle_lock_renames,
+    split_lock_renames,
+    load_prior_lock,
     compare_lock_yaml,
     check_for_mismatch,
     fix_links
 )
 from doty.classes.entry import DotyEntry
 from doty.classes.report import ShortReport
+from doty.helpers import lock
 from doty.helpers.git import make_commit, prior_commit_hex, last_commit_file
 
 
@@ -102,6 +106,32 @@ def test_get_lock_files(temp_dir: Path, git_repo, lock_file):
     assert current_yaml == new_current
 
 
+def test_load_prior_lock(temp_dir: Path, git_repo, lock_file, monkeypatch):
+    assert load_prior_lock() == []
+
+    make_commit(git_repo, "test commit")
+    expected = [
+        {"name": ".bashrc"},
+        {"name": ".zshrc"},
+        {
+            "name": ".wshrc",
+            "src": f"{temp_dir}/.wshrc",
+            "dst": f"{temp_dir}/dotfiles/.wshrc",
+            "linked": True,
+            "link_name": ".wshrc",
+        },
+    ]
+    assert load_prior_lock() == expected
+
+    monkeypatch.setattr(lock, "iter_yaml_sequence", lambda data: pytest.fail("prior lock should not be parsed again"))
+    assert load_prior_lock() == expected
+
+    # Only the committed lock file counts
+    with open(lock_file, "a") as f:
+        f.write("- name: .dot_file7\n")
+    assert load_prior_lock() == expected
+
+
 def test_get_lock_file_diff(temp_dir: Path, git_repo, lock_file):
     prior_yaml, current_yaml = get_lock_files(lock_file)
     current = [
@@ -514,3 +544,65 @@ def test_compare_lock_yaml(temp_dir: Path, git_repo, lock_file, capfd):
 
     # entry = [e for e in new_file if e['name'] == '.dot_file_bad'][0]
     # assert entry['linked'] == False
+
+
+def test_split_lock_renames(temp_dir: Path):
+    prior = [DotyEntry({'name': '.rename1'}), DotyEntry({'name': '.rename2'})]
+    current = [
+        DotyEntry({'name': '.rename1', 'link_name': '.rename1_unique'}),
+        DotyEntry({'name': '.rename2', 'src': str(temp_dir / 'other' / '.rename2')}),
+    ]
+    changed = list(zip(prior, current))
+
+    renames, diff_current, diff_prior = split_lock_renames(changed, list(current), list(prior))
+    assert renames == [(prior[0], current[0])]
+    assert diff_current == [current[1]]
+    assert diff_prior == [prior[1]]
+
+def test_handle_lock_renames(temp_dir: Path):
+    dummy_report = ShortReport()
+    (temp_dir / 'dotfiles' / '.rename_entry').touch()
+    (temp_dir / '.rename_entry').symlink_to(temp_dir / 'dotfiles' / '.rename_entry')
+
+    prior = DotyEntry({'name': '.rename_entry'})
+    current = DotyEntry({
+        'name': '.rename_entry',
+        'dst': str(temp_dir / 'dotfiles' / 'renamed' / '.rename_entry'),
+        'link_name': '.rename_entry_unique'
+    })
+
+    fallback = handle_lock_renames([(prior, current)], dummy_report)
+    assert fallback == []
+    assert not os.path.exists(temp_dir / 'dotfiles' / '.rename_entry')
+    assert os.path.isfile(temp_dir / 'dotfiles' / 'renamed' / '.rename_entry')
+    assert not os.path.lexists(temp_dir / '.rename_entry')
+    assert os.readlink(temp_dir / '.rename_entry_unique') == current.dst
+    assert dummy_report.files['.rename_entry'].is_update
+    assert dummy_report.links['.rename_entry'].is_update
+
+    # Unlinking only leaves the file where it is
+    prior, current = current, DotyEntry({**current.dict, 'linked': False})
+    dummy_report = ShortReport()
+    assert handle_lock_renames([(prior, current)], dummy_report) == []
+    assert not os.path.lexists(temp_dir / '.rename_entry_unique')
+    assert os.path.isfile(current.dst)
+    assert dummy_report.links['.rename_entry'].is_rm
+    assert not dummy_report.files
+
+    # Linking again is skipped when something was put at the link path in the meantime
+    (temp_dir / '.rename_entry_unique').write_text('mine')
+    prior, current = current, DotyEntry({**current.dict, 'linked': True})
+    dummy_report = ShortReport()
+    assert handle_lock_renames([(prior, current)], dummy_report) == []
+    assert (temp_dir / '.rename_entry_unique').read_text() == 'mine'
+    assert not current.linked
+    assert not dummy_report.links
+    os.unlink(temp_dir / '.rename_entry_unique')
+
+    # Files missing from the dotfiles directory are handed back to be moved in
+    missing = DotyEntry({'name': '.rename_missing'})
+    pair = (missing, DotyEntry({'name': '.rename_missing', 'link_name': '.rename_missing2'}))
+    assert handle_lock_renames([pair], ShortReport()) == [pair]
+
+    os.unlink(current.dst)
+    os.rmdir(temp_dir / 'dotfiles' / 'renamed')
@@ -0,0 +1,92 @@
+import os
+import errno
+import pytest
+from doty.helpers import move
+from doty.helpers.move import move_path, copy_file, same_device
+
+
+@pytest.fixture
+def src(tmp_path):
+    path = tmp_path / '.zsh_history'
+    path.write_bytes(os.urandom(256 * 1024))
+    os.chmod(path, 0o640)
+    os.utime(path, ns=(1_000_000_000, 2_000_000_000))
+    return path
+
+
+def test_move_path_renames(src, tmp_path):
+    inode = src.stat().st_ino
+    dst = tmp_path / 'dotfiles' / '.zsh_history'
+    dst.parent.mkdir()
+
+    assert same_device(str(src), str(dst))
+    move_path(str(src), str(dst))
+    assert not src.exists()
+    assert dst.stat().st_ino == inode
+
+
+def test_move_path_across_devices(src, tmp_path, monkeypatch):
+    monkeypatch.setattr(move, 'same_device', lambda src, dst: False)
+    data = src.read_bytes()
+    dst = tmp_path / 'dotfiles' / '.zsh_history'
+    dst.parent.mkdir()
+
+    move_path(str(src), str(dst))
+    assert not src.exists()
+    assert dst.read_bytes() == data
+    assert dst.stat().st_mode & 0o777 == 0o640
+    assert dst.stat().st_mtime_ns == 2_000_000_000
+
+    # Directories and symlinks in them are copied as they are
+    (tmp_path / 'nvim' / 'lua').mkdir(parents=True)
+    (tmp_path / 'nvim' / 'lua' / 'init.lua').write_text('vim.o.number = true')
+    (tmp_path / 'nvim' / 'init.lua').symlink_to('lua/init.lua')
+
+    move_path(str(tmp_path / 'nvim'), str(tmp_path / 'dotfiles' / 'nvim'))
+    assert not (tmp_path / 'nvim').exists()
+    assert os.readlink(tmp_path / 'dotfiles' / 'nvim' / 'init.lua') == 'lua/init.lua'
+    assert (tmp_path / 'dotfiles' / 'nvim' / 'init.lua').read_text() == 'vim.o.number = true'
+
+
+def unsupported(src_fd, dst_fd, size):
+    raise OSError(errno.EOPNOTSUPP, 'not supported')
+
+
+@pytest.mark.parametrize(
+    'methods,expected',
+    [
+        ((unsupported, move._copy_range), 'copy_range'),
+        ((unsupported, move._sendfile), 'sendfile'),
+        ((unsupported,), 'copy'),
+    ]
+)
+def test_copy_file_fallbacks(src, tmp_path, monkeypatch, methods, expected):
+    monkeypatch.setattr(move, 'COPY_METHODS', methods)
+    dst = tmp_path / 'copy'
+
+    assert copy_file(str(src), str(dst)) == expected
+    assert dst.read_bytes() == src.read_bytes()
+    assert dst.stat().st_mode & 0o777 == 0o640
+
+
+def test_copy_file_existing_dst(src, tmp_path):
+    dst = tmp_path / 'copy'
+    dst.write_text('keep')
+
+    with pytest.raises(FileExistsError):
+        copy_file(str(src), str(dst))
+
+    assert dst.read_text() == 'keep'
+
+
+def test_copy_file_error_removes_dst(src, tmp_path, monkeypatch):
+    def failing(src_fd, dst_fd, size):
+        raise OSError(errno.ENOSPC, 'no space left')
+
+    monkeypatch.setattr(move, 'COPY_METHODS', (failing,))
+    dst = tmp_path / 'copy'
+
+    with pytest.raises(OSError):
+        copy_file(str(src), str(dst))
+
+    assert not dst.exists()
@@ -0,0 +1,62 @@
+import os
+import pytest
+from doty.helpers import scan
+from doty.helpers.scan import scan_dotfiles
+from doty.helpers.cache import get_cache_path, load_cache
+
+
+@pytest.fixture
+def dot_dir(tmp_path):
+    dot_dir = tmp_path / 'dotfiles'
+    (dot_dir / '.doty_config').mkdir(parents=True)
+    (dot_dir / '.git').mkdir()
+    (dot_dir / '.gitignore').touch()
+    (dot_dir / '.bashrc').touch()
+    (dot_dir / 'nvim' / 'lua').mkdir(parents=True)
+    (dot_dir / 'nvim' / 'init.lua').touch()
+    (dot_dir / 'nvim' / 'lua' / 'plugins.lua').touch()
+    (dot_dir / 'linked_dir').symlink_to(dot_dir / 'nvim')
+    return dot_dir
+
+
+def walk(dot_dir) -> list:
+    dotfiles = []
+    for root, dirs, files in os.walk(dot_dir):
+        dirs[:] = [d for d in dirs if d not in ('.doty_config', '.git')]
+        dotfiles.extend(os.path.join(root, f) for f in files if f != '.gitignore')
+    return dotfiles
+
+
+def test_scan_dotfiles_matches_walk(dot_dir):
+    dotfiles = scan_dotfiles(str(dot_dir))
+    assert not isinstance(dotfiles, list)
+    assert sorted(dotfiles) == sorted(walk(dot_dir))
+    assert os.path.isfile(get_cache_path('scan', str(dot_dir)))
+
+
+def test_scan_dotfiles_uses_cache(dot_dir, monkeypatch):
+    first = list(scan_dotfiles(str(dot_dir)))
+    assert str(dot_dir / 'nvim') in load_cache('scan', str(dot_dir))
+
+    def fail(path):
+        raise AssertionError(f'{path} should not be listed again')
+
+    monkeypatch.setattr(scan, '_list_dir', fail)
+    assert list(scan_dotfiles(str(dot_dir))) == first
+    monkeypatch.undo()
+
+    (dot_dir / 'nvim' / 'lua' / 'keymaps.lua').touch()
+    listed = []
+    list_dir = scan._list_dir
+    monkeypatch.setattr(scan, '_list_dir', lambda path: listed.append(path) or list_dir(path))
+    dotfiles = list(scan_dotfiles(str(dot_dir)))
+
+    assert listed == [str(dot_dir / 'nvim' / 'lua')]
+    assert str(dot_dir / 'nvim' / 'lua' / 'keymaps.lua') in dotfiles
+    assert sorted(dotfiles) == sorted(walk(dot_dir))
+
+
+def test_scan_dotfiles_without_config(tmp_path):
+    (tmp_path / '.bashrc').touch()
+    assert list(scan_dotfiles(str(tmp_path))) == [str(tmp_path / '.bashrc')]
+    assert not os.path.exists(tmp_path / '.doty_config')
@@ -0,0 +1,128 @@
+import os
+import pytest
+import pygit2
+from doty.helpers.shards import (
+    shard_for,
+    is_sharded,
+    list_shards,
+    get_shard_path,
+    get_lock_paths,
+    get_changed_shards,
+    load_lock_entries,
+    migrate_lock,
+)
+from doty.helpers.utils import load_lock_file, write_lock_file, add_to_lock_file
+from doty.helpers.journal import has_journal
+from doty.helpers.lock import compare_lock_yaml
+from doty.helpers.git import make_commit
+from doty.update import migrate
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    dotfiles = tmp_path / 'dotfiles'
+    (dotfiles / '.doty_config').mkdir(parents=True)
+    (dotfiles / 'nvim').mkdir()
+    (dotfiles / '.bashrc').touch()
+    (dotfiles / 'nvim' / 'init.lua').touch()
+    (tmp_path / '.bashrc').symlink_to(dotfiles / '.bashrc')
+    (tmp_path / 'init.lua').symlink_to(dotfiles / 'nvim' / 'init.lua')
+    (tmp_path / '.zshrc').touch()
+
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('DOTFILES_PATH', str(dotfiles))
+
+    write_lock_file([
+        {'name': '.bashrc'},
+        {'name': 'init.lua', 'dst': 'nvim/init.lua'},
+    ], str(dotfiles / '.doty_config' / 'doty_lock.yml'))
+
+    repo = pygit2.init_repository(str(dotfiles))
+    index = repo.index
+    index.add_all()
+    index.write()
+    signature = pygit2.Signature('doty', 'email@email.com')
+    repo.create_commit('HEAD', signature, signature, 'initial commit', index.write_tree(), [])
+
+    return tmp_path
+
+
+def test_shard_for(tmp_path):
+    dotfiles = str(tmp_path)
+
+    assert shard_for({'name': '.bashrc'}, dotfiles) == '_root'
+    assert shard_for({'name': 'init.lua', 'dst': 'nvim/init.lua'}, dotfiles) == 'nvim'
+    assert shard_for({'name': 'init.lua', 'dst': f'{dotfiles}/nvim/lua/init.lua'}, dotfiles) == 'nvim'
+    assert shard_for({'name': 'x', 'dst': '/elsewhere/x/y'}, dotfiles) == '_root'
+
+
+def test_migrate_lock(home):
+    lock_path = str(home / 'dotfiles' / '.doty_config' / 'doty_lock.yml')
+    entries = load_lock_file(lock_path)
+
+    assert not migrate_lock(sharded=False)
+    assert migrate_lock(sharded=True)
+    assert is_sharded()
+    assert not os.path.exists(lock_path)
+    assert list_shards() == ['_root', 'nvim']
+    assert load_lock_entries() == entries
+
+    assert migrate_lock(sharded=False)
+    assert not is_sharded()
+    assert get_lock_paths() == [lock_path]
+    assert load_lock_entries() == entries
+
+
+def test_compare_lock_shards(home):
+    repo = pygit2.Repository(str(home / 'dotfiles'))
+    migrate_lock(sharded=True)
+
+    # The entries did not change, so splitting the lock file moves nothing
+    report = compare_lock_yaml()
+    report.gen_full_report({})
+    assert not report.changes
+    make_commit(repo, 'split lock')
+    assert get_changed_shards(repo) == []
+
+    write_lock_file([{'name': '.bashrc'}, {'name': '.zshrc'}], get_shard_path('_root'))
+    assert get_changed_shards(repo) == ['_root']
+
+    # A broken link in an unchanged shard is left alone
+    os.unlink(home / 'init.lua')
+
+    report = compare_lock_yaml()
+    report.gen_full_report({})
+    assert report.changes
+    assert os.path.islink(home / '.zshrc')
+    assert os.path.isfile(home / 'dotfiles' / '.zshrc')
+    assert not os.path.lexists(home / 'init.lua')
+    assert [entry['name'] for entry in load_lock_file(get_shard_path('_root'))] == ['.bashrc', '.zshrc']
+
+
+def test_compare_lock_shards_journal(home):
+    repo = pygit2.Repository(str(home / 'dotfiles'))
+    migrate_lock(sharded=True)
+    make_commit(repo, 'split lock')
+
+    # Adding to an existing shard only appends to its journal, the shard's blob is unchanged
+    assert add_to_lock_file({'name': '.zshrc'}, get_shard_path('_root'))
+    assert get_changed_shards(repo) == ['_root']
+
+    report = compare_lock_yaml()
+    report.gen_full_report({})
+    assert report.changes
+    assert os.path.islink(home / '.zshrc')
+    assert not has_journal(get_shard_path('_root'))
+    assert [entry['name'] for entry in load_lock_file(get_shard_path('_root'))] == ['.bashrc', '.zshrc']
+
+
+def test_migrate_commits(home):
+    repo = pygit2.Repository(str(home / 'dotfiles'))
+
+    assert migrate('sharded')
+    assert not migrate('sharded')
+
+    tree = repo[repo.head.target].tree
+    assert '.doty_config/lock.d/_root.yml' in tree
+    assert '.doty_config/doty_lock.yml' not in tree
+    assert repo.status() == {}
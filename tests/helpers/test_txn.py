@@ -0,0 +1,87 @@
+import os
+import pytest
+from doty.helpers import txn
+from doty.helpers.txn import lock_txn
+from doty.classes.index import LockIndex
+from doty.helpers.journal import get_journal_path, read_journal
+from doty.helpers.utils import load_lock_file, write_lock_file, load_lock_index
+
+
+@pytest.fixture(params=['yaml', 'sqlite'])
+def lock_path(request, tmp_path, monkeypatch):
+    monkeypatch.setenv('HOME', '/home/user')
+    monkeypatch.setenv('DOTY_LOCK_BACKEND', request.param)
+    (tmp_path / 'dotfiles' / '.doty_config').mkdir(parents=True)
+    return str(tmp_path / 'dotfiles' / '.doty_config' / 'doty_lock.yml')
+
+
+def test_lock_txn(lock_path, monkeypatch):
+    write_lock_file([{'name': '.bashrc'}, {'name': '.vimrc'}, {'name': '.zshrc'}], lock_path)
+    writes = []
+
+    get_lock_backend = txn.get_lock_backend
+
+    def spy(path):
+        lock_backend = get_lock_backend(path)
+        write = lock_backend.write
+        lock_backend.write = lambda entries: (writes.append([e['name'] for e in entries]), write(entries))
+        return lock_backend
+
+    monkeypatch.setattr(txn, 'get_lock_backend', spy)
+
+    with lock_txn(lock_path) as lock:
+        lock.remove(lock.find('.bashrc'))
+        lock.relink(lock.find('.vimrc'), False)
+        assert lock.find('.bashrc') is None
+        assert lock.find('.zshrc') == 2
+        assert lock.add({'name': '.bashrc', 'dst': 'bash/.bashrc'})
+        assert not lock.add({'name': '.zshrc'})
+
+    # The lock file exists, so the changes are journaled instead of written
+    assert writes == []
+    assert [record['op'] for record in read_journal(lock_path)] == ['remove', 'link', 'add']
+    assert [(e['name'], e.get('linked', True)) for e in load_lock_file(lock_path)] == [('.vimrc', False), ('.zshrc', True), ('.bashrc', True)]
+
+    with pytest.raises(SystemExit):
+        with lock_txn(lock_path) as lock:
+            lock.remove(0)
+            exit(1)
+
+    with lock_txn(lock_path) as lock:
+        lock.relink(1, True)
+
+    assert len(read_journal(lock_path)) == 3
+    assert writes == []
+
+
+def test_lock_txn_writes_without_journal(lock_path):
+    # A lock file that does not exist yet has nothing to journal against
+    with lock_txn(lock_path, LockIndex()) as lock:
+        lock.add({'name': '.bashrc'})
+
+    assert not os.path.exists(get_journal_path(lock_path))
+    assert [e['name'] for e in load_lock_file(lock_path)] == ['.bashrc']
+
+    # The second .bashrc cannot be found by name in the journal, the lock file is written
+    write_lock_file([{'name': '.bashrc'}, {'name': '.bashrc', 'dst': 'other', 'link_name': '.bashrc2'}], lock_path)
+
+    with lock_txn(lock_path) as lock:
+        lock.remove(lock.find_link('.bashrc2'))
+
+    assert not os.path.exists(get_journal_path(lock_path))
+    assert [e['name'] for e in load_lock_file(lock_path)] == ['.bashrc']
+
+
+def test_lock_txn_reuses_index(lock_path, monkeypatch):
+    write_lock_file([{'name': '.bashrc'}, {'name': '.zshrc'}], lock_path)
+    index = load_lock_index(lock_path)
+
+    def load(self):
+        raise AssertionError('lock file was loaded again')
+
+    monkeypatch.setattr(txn.get_lock_backend(lock_path).__class__, 'load', load)
+
+    with lock_txn(lock_path, index) as lock:
+        lock.remove(lock.find('.bashrc'))
+
+    assert [e['name'] for e in load_lock_file(lock_path)] == ['.zshrc']
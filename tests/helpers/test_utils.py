@@ -0,0 +1,108 @@
+import os
+import pytest
+import yaml
+from doty.helpers import utils
+from doty.helpers.utils import load_lock_file, write_lock_file, parse_entries, load_lock_index, add_to_lock_file, iter_lock_file
+from doty.helpers.cache import load_cache
+
+
+@pytest.fixture
+def lock_path(tmp_path):
+    (tmp_path / 'dotfiles' / '.doty_config').mkdir(parents=True)
+    return tmp_path / 'dotfiles' / '.doty_config' / 'doty_lock.yml'
+
+
+def test_write_lock_file(lock_path):
+    entries = [{'name': '.bashrc', 'src': '/home/user/.bashrc', 'linked': True}]
+    write_lock_file(entries, str(lock_path))
+
+    with open(lock_path) as f:
+        content = f.read()
+
+    assert content.startswith('# Path: ~/.doty_config/doty_lock.yml\n')
+    assert yaml.safe_load(content) == entries
+    assert content.index('name') < content.index('src')
+
+
+def test_load_lock_file_cache(lock_path, monkeypatch):
+    with open(lock_path, 'w') as f:
+        f.write('- .bashrc\n- name: .zshrc\n  linked: false\n')
+
+    expected = [{'name': '.bashrc'}, {'name': '.zshrc', 'linked': False}]
+    assert load_lock_file(str(lock_path)) == expected
+
+    cache = load_cache('lock', str(lock_path.parent.parent))
+    assert cache[str(lock_path)]['entries'] == expected
+
+    monkeypatch.setattr(utils, 'iter_yaml_sequence', lambda data: pytest.fail('lock file should not be parsed again'))
+    assert load_lock_file(str(lock_path)) == expected
+    monkeypatch.undo()
+
+    # Same size, different content
+    with open(lock_path, 'w') as f:
+        f.write('- .wshrc\n- name: .zshrc\n  linked: false\n')
+
+    assert load_lock_file(str(lock_path))[0] == {'name': '.wshrc'}
+
+
+def test_write_lock_file_updates_cache(lock_path, monkeypatch):
+    entries = [{'name': '.bashrc'}, {'name': '.vimrc'}]
+    write_lock_file(entries, str(lock_path))
+
+    monkeypatch.setattr(utils, 'iter_yaml_sequence', lambda data: pytest.fail('lock file should not be parsed'))
+    assert load_lock_file(str(lock_path)) == entries
+
+
+def test_parse_entries():
+    assert parse_entries(['.bashrc', {'name': '.zshrc'}, 3]) == [{'name': '.bashrc'}, {'name': '.zshrc'}]
+
+
+def test_add_to_lock_file(lock_path, monkeypatch):
+    monkeypatch.setenv('HOME', '/home/user')
+    write_lock_file([{'name': '.bashrc'}], str(lock_path))
+    index = load_lock_index(str(lock_path))
+
+    assert add_to_lock_file({'name': '.zshrc'}, str(lock_path), index)
+    assert not add_to_lock_file({'name': '.zshrc'}, str(lock_path), index)
+    assert not add_to_lock_file({'name': '.bashrc'}, str(lock_path))
+    assert [entry['name'] for entry in load_lock_file(str(lock_path))] == ['.bashrc', '.zshrc']
+    assert index.by_name('.zshrc') == 1
+
+
+def test_write_lock_file_atomic(lock_path, monkeypatch):
+    write_lock_file([{'name': '.bashrc'}], str(lock_path))
+
+    def fail(*_):
+        raise OSError('disk full')
+
+    monkeypatch.setattr(utils.os, 'replace', fail)
+
+    with pytest.raises(OSError):
+        write_lock_file([{'name': '.zshrc'}], str(lock_path))
+
+    assert load_lock_file(str(lock_path)) == [{'name': '.bashrc'}]
+    assert not os.path.exists(f'{lock_path}.tmp')
+    assert not os.path.exists(utils._lock_tmp_path(str(lock_path)))
+
+
+def test_lock_tmp_path(lock_path, tmp_path):
+    # Temp files are written in the cache directory, which git ignores
+    cache_dir = tmp_path / 'dotfiles' / '.doty_config' / 'cache'
+    assert utils._lock_tmp_path(str(lock_path)) == str(cache_dir / 'doty_lock.yml.tmp')
+    assert utils._lock_tmp_path(str(lock_path.parent / 'lock.d' / 'nvim.yml')) == str(cache_dir / 'lock.d-nvim.yml.tmp')
+    assert (cache_dir / '.gitignore').is_file()
+
+    assert utils._lock_tmp_path(str(tmp_path / 'lock.yml')) == str(tmp_path / 'lock.yml.tmp')
+
+
+def test_iter_lock_file(lock_path, monkeypatch):
+    with open(lock_path, 'w') as f:
+        f.write('- .bashrc\n- name: .zshrc\n  linked: false\n')
+
+    expected = [{'name': '.bashrc'}, {'name': '.zshrc', 'linked': False}]
+    monkeypatch.setattr(utils, 'load_lock_file', lambda path: pytest.fail('lock file should be streamed'))
+    assert list(iter_lock_file(str(lock_path))) == expected
+    monkeypatch.undo()
+
+    assert load_lock_file(str(lock_path)) == expected
+    assert list(iter_lock_file(str(lock_path))) == expected
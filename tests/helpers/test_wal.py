@@ -0,0 +1,175 @@
+import os
+import pytest
+from doty.helpers.wal import UpdateWAL, has_pending_wal, is_applied
+from doty.helpers.apply import apply_plan, apply_op
+from doty.helpers.lock import compare_lock_yaml
+from doty.helpers.utils import load_lock_file
+from doty.classes.plan import Plan, MOVE_IN, LINK, UNLINK
+from doty.classes.entry import DotyEntry
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    (tmp_path / 'dotfiles' / '.doty_config').mkdir(parents=True)
+    monkeypatch.setenv('HOME', str(tmp_path))
+    monkeypatch.setenv('DOTFILES_PATH', str(tmp_path / 'dotfiles'))
+    monkeypatch.setenv('DOTY_WORKERS', '1')
+    return tmp_path
+
+
+@pytest.fixture
+def plan(home):
+    lock_path = home / 'dotfiles' / '.doty_config' / 'doty_lock.yml'
+    lock_path.write_text('[]\n')
+    entries = [DotyEntry({'name': '.bashrc'}), DotyEntry({'name': 'init.lua', 'dst': 'nvim/init.lua'})]
+    plan = Plan(locks=[(str(lock_path), [entry.dict for entry in entries])])
+
+    for entry in entries:
+        (home / entry.name).write_text(entry.name)
+        plan.add(MOVE_IN, entry.src, entry.dst, entry.name, entry)
+        plan.add(LINK, entry.src, entry.dst, entry.link_name, entry)
+
+    # An old link to replace, its target is recorded so it can be restored
+    (home / '.old').symlink_to(home / 'elsewhere')
+    old = DotyEntry({'name': '.old'})
+    plan.add(UNLINK, old.src, str(home / 'elsewhere'), old.name, old)
+    return plan
+
+
+def assert_untouched(home):
+    for name in ('.bashrc', 'init.lua'):
+        assert (home / name).read_text() == name
+        assert not (home / name).is_symlink()
+
+    assert not os.path.lexists(home / 'dotfiles' / '.bashrc')
+    assert not os.path.lexists(home / 'dotfiles' / 'nvim')
+    assert os.readlink(home / '.old') == str(home / 'elsewhere')
+
+
+def test_rollback_failed_update(home, plan, capfd):
+    # The link of init.lua fails, something else is in the way once it was moved in
+    plan.ops[3] = plan.ops[3]._replace(path=str(home / 'blocked'))
+    (home / 'blocked').touch()
+
+    assert compare_lock_yaml(plan=plan) is None
+    assert 'init.lua failed, undoing' in capfd.readouterr().err
+    assert_untouched(home)
+    assert load_lock_file(plan.locks[0][0]) == []
+    assert not has_pending_wal()
+
+
+def test_rollback_interrupted(home, plan):
+    wal = UpdateWAL.begin(plan)
+    batch = plan.ops[:2]
+    wal.intent(batch)
+
+    for op in batch:
+        apply_op(op)
+
+    # Interrupted before the batch was recorded as done, and while starting the next one
+    wal.intent(plan.ops[2:])
+    apply_op(plan.ops[4])
+    assert has_pending_wal()
+
+    loaded = UpdateWAL.load()
+    assert loaded.done == set()
+    assert [op.op for op in loaded.applied()] == [MOVE_IN, LINK, UNLINK]
+    assert loaded.rollback() == 0
+
+    assert_untouched(home)
+    assert not has_pending_wal()
+
+
+def test_replay(home, plan):
+    wal = UpdateWAL.begin(plan)
+    apply_plan(Plan(plan.ops[:2]), wal=wal)
+
+    loaded = UpdateWAL.load()
+    assert loaded.done == {0, 1}
+    assert is_applied(loaded.plan.ops[1])
+
+    report = loaded.replay()
+
+    assert list(report.files) == ['init.lua']
+    assert os.readlink(home / 'init.lua') == str(home / 'dotfiles' / 'nvim' / 'init.lua')
+    assert not os.path.lexists(home / '.old')
+    assert [entry['name'] for entry in load_lock_file(plan.locks[0][0])] == ['.bashrc', 'init.lua']
+    assert not has_pending_wal()
+
+
+def test_load_without_wal(home):
+    assert UpdateWAL.load() is None
+    assert not has_pending_wal()
+
+
+def test_update_not_committed_after_rollback(home, monkeypatch):
+    import pygit2
+    from doty.update import update
+    import helpers.apply
+
+    lock_path = home / 'dotfiles' / '.doty_config' / 'doty_lock.yml'
+    lock_path.write_text('[]\n')
+    repo = pygit2.init_repository(str(home / 'dotfiles'))
+    repo.index.add_all()
+    repo.index.write()
+    signature = pygit2.Signature('doty', 'email@email.com')
+    head = repo.create_commit('HEAD', signature, signature, 'initial commit', repo.index.write_tree(), [])
+
+    (home / '.bashrc').write_text('.bashrc')
+    (home / '.zshrc').write_text('.zshrc')
+    lock_path.write_text('- .bashrc\n- .zshrc\n')
+
+    # Linking .zshrc fails once the files were moved in
+    apply_op = helpers.apply.apply_op
+
+    def failing(op, fs=os):
+        if op.op == LINK and op.name == '.zshrc':
+            raise OSError('disk full')
+        apply_op(op, fs)
+
+    monkeypatch.setattr(helpers.apply, 'apply_op', failing)
+    update()
+
+    assert repo.head.target == head
+    assert (home / '.bashrc').read_text() == '.bashrc'
+    assert not (home / '.bashrc').is_symlink()
+    assert lock_path.read_text() == '- .bashrc\n- .zshrc\n'
+
+
+def test_update_stops_at_failed_batch(home, plan, monkeypatch, capfd):
+    import helpers.apply
+
+    apply_op = helpers.apply.apply_op
+    attempted = []
+
+    # Moving .bashrc in fails, so its link must not be attempted on top of it
+    def failing(op, fs=os):
+        attempted.append(op)
+
+        if op.op == MOVE_IN and op.name == '.bashrc':
+            raise PermissionError('permission denied')
+        apply_op(op, fs)
+
+    monkeypatch.setattr(helpers.apply, 'apply_op', failing)
+
+    assert compare_lock_yaml(plan=plan) is None
+    assert LINK not in [op.op for op in attempted]
+
+    err = capfd.readouterr().err
+    assert f'.bashrc: {plan.ops[0]} - permission denied' in err
+    assert_untouched(home)
+
+
+def test_recover_shows_failures(home, plan, capfd):
+    from doty.update import recover
+
+    wal = UpdateWAL.begin(plan)
+    wal.intent(plan.ops[:2])
+    apply_op(plan.ops[0])
+    wal.finished(plan.ops[:2], [None, OSError('file exists')])
+
+    assert UpdateWAL.load().failures() == [f'.bashrc: {plan.ops[1]} - file exists']
+
+    recover()
+    assert f'.bashrc: {plan.ops[1]} - file exists' in capfd.readouterr().err
+    assert_untouched(home)
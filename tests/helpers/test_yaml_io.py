@@ -0,0 +1,56 @@
+import pytest
+import yaml
+from doty.helpers.yaml_io import LIBYAML, load_yaml, dump_yaml, iter_yaml_sequence
+
+
+@pytest.mark.parametrize(
+    'entries',
+    [
+        [],
+        [{'name': '.bashrc', 'src': '/home/user/.bashrc', 'dst': '/home/user/dotfiles/.bashrc', 'linked': True, 'link_name': '.bashrc'}],
+        [{'name': '.file', 'src': '/home/user/' + 'long directory name/' * 10 + '.file', 'linked': False}],
+        [{'name': 'café', 'src': '/home/user/' + 'café directory/' * 10, 'link_name': '- "odd": name'}],
+        [{'name': 'tab\tname', 'dst': 'yes', 'link_name': 'null'}],
+    ]
+)
+def test_dump_yaml_matches_safe_dump(entries):
+    assert dump_yaml(entries) == yaml.safe_dump(entries, sort_keys=False)
+    assert load_yaml(dump_yaml(entries)) == entries
+
+
+@pytest.mark.parametrize(
+    'document',
+    [
+        '',
+        '[]\n',
+        '- .bashrc\n- name: .zshrc\n  linked: false\n',
+        '- &rc {name: .bashrc, dst: null}\n- *rc\n- [a, 1, 2.5, yes, ~]\n',
+        '# Path: ~/.doty_config/doty_lock.yml\n- name: café\n  link_name: "- odd"\n',
+        '- &base {src: /home, linked: true}\n- <<: *base\n  name: .bashrc\n  linked: false\n',
+        '- &a {name: a, src: a}\n- &b {name: b, dst: b}\n- {<<: [*a, *b], link_name: c}\n',
+    ]
+)
+@pytest.mark.parametrize('loader', [yaml.SafeLoader] + ([yaml.CSafeLoader] if LIBYAML else []))
+def test_iter_yaml_sequence_matches_load(document, loader):
+    expected = yaml.load(document, Loader=loader) or []
+    assert list(iter_yaml_sequence(document, loader)) == expected
+    assert list(iter_yaml_sequence(document.encode(), loader)) == expected
+
+
+
+@pytest.mark.parametrize(
+    'document',
+    [
+        '- name: .bashrc\n- ? [a, b]\n  : .zshrc\n',
+        '- name: .bashrc\n---\n- name: .zshrc\n',
+        '{name: .bashrc}\n---\n{name: .zshrc}\n',
+        '- <<: [a, b]\n  name: .bashrc\n',
+    ]
+)
+@pytest.mark.parametrize('loader', [yaml.SafeLoader] + ([yaml.CSafeLoader] if LIBYAML else []))
+def test_iter_yaml_sequence_errors_like_load(document, loader):
+    with pytest.raises(yaml.YAMLError):
+        yaml.load(document, Loader=loader)
+
+    with pytest.raises(yaml.YAMLError):
+        list(iter_yaml_sequence(document, loader))
@@ -1,7 +1,8 @@
 import os
 import pytest
 import yaml
-from doty.discover import find_all_dotfiles, get_new_entries, gen_temp_lock_file, discover
+from doty.discover import get_new_entries, gen_temp_lock_file, discover
+from doty.helpers.discover import find_all_dotfiles
 from doty.classes.entry import DotyEntry
 from doty.helpers.git import last_commit_file, make_commit
 
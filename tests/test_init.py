@@ -24,7 +24,9 @@ def test_gen_dotyrc(setup):
         'GIT_AUTHOR_EMAIL="doty@email.com"',
         'DOTY_FILE_LOGGING=true',
         f'DOTY_LOG_PATH="{dotfiles_path}/.doty_config/logs/doty.log"',
-        'DOTY_COLOR_LOGGING=true'
+        'DOTY_COLOR_LOGGING=true',
+        'DOTY_LOCK_BACKEND=yaml',
+        'DOTY_WORKERS=8'
     ]
 
 @pytest.mark.parametrize('temp_init', [False, True])
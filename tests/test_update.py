@@ -1,5 +1,6 @@
 import os
 import pytest
+import doty.update
 from doty.update import link_new_files, unlink_files, commit_changes, update
 from doty.helpers.git import make_commit
 # from doty.classes.DotyLogger import DotyLogger
@@ -117,4 +118,73 @@ def test_update(temp_dir, git_repo, capfd):
     assert 'Added\x1b[0m Files: 1 Links: 1' in out
     assert 'Modified\x1b[0m Files: 1' in out
     assert 'Committing changes' in out
-    assert git_repo.head.peel().message == 'Links (A1|R0|U0) | Files (A1|R0|U0|M1)'
\ No newline at end of file
+    assert git_repo.head.peel().message == 'Links (A1|R0|U0) | Files (A1|R0|U0|M1)'
+
+def test_update_fast_path(temp_dir, git_repo, capfd, monkeypatch):
+    update()
+    capfd.readouterr()
+
+    def fail(*args, **kwargs):
+        pytest.fail('lock files should not be compared when nothing changed')
+
+    monkeypatch.setattr(doty.update, 'compare_lock_yaml', fail)
+    update()
+    out = capfd.readouterr().err
+    assert 'No changes detected' in out
+    monkeypatch.undo()
+
+    # Removing a link is picked up by the next update
+    os.unlink(temp_dir / '.dot_file8')
+    update()
+    out = capfd.readouterr().err
+    assert 'Added\x1b[0m Files: 0 Links: 1' in out
+    assert os.path.islink(temp_dir / '.dot_file8')
+
+    # So is an edit to a tracked file that is not a dst or link, e.g. one inside a directory entry
+    note = temp_dir / 'dotfiles' / 'dot_dir' / 'fast_path_note'
+    note.write_text('one')
+    make_commit(git_repo, 'add note')
+    update()
+    note.write_text('two')
+
+    update()
+    out = capfd.readouterr().err
+    assert 'Modified\x1b[0m Files: 1' in out
+    assert 'Committing changes' in out
+    assert 'fast_path_note' not in git_repo.status()
+
+def test_update_saved_plan(temp_dir, git_repo, capfd):
+    update()
+    capfd.readouterr()
+
+    (temp_dir / '.dot_file9').touch()
+    doty_lock_path = temp_dir / 'dotfiles' / '.doty_config' / 'doty_lock.yml'
+    with open(doty_lock_path, 'a') as f:
+        f.write('\n- .dot_file9')
+
+    plan_path = str(temp_dir / 'plan.json')
+    update(save_plan=plan_path)
+    out = capfd.readouterr().err
+    assert f'move_in {temp_dir}/.dot_file9 -> {temp_dir}/dotfiles/.dot_file9' in out
+    assert os.path.isfile(plan_path)
+    assert not os.path.islink(temp_dir / '.dot_file9')
+
+    # The lock file changed since the plan was saved, applying it would lose the change
+    lock_text = doty_lock_path.read_text()
+    doty_lock_path.write_text(lock_text + '\n- .dot_file10')
+
+    with pytest.raises(SystemExit) as exit:
+        update(plan_path=plan_path)
+
+    assert exit.value.code == 1
+    assert 'changed since the plan was saved' in capfd.readouterr().err
+    assert not os.path.islink(temp_dir / '.dot_file9')
+    assert doty_lock_path.read_text() == lock_text + '\n- .dot_file10'
+
+    doty_lock_path.write_text(lock_text)
+    update(plan_path=plan_path)
+    out = capfd.readouterr().err
+    assert 'Added\x1b[0m Files: 1 Links: 1' in out
+    assert os.path.islink(temp_dir / '.dot_file9')
+    assert os.path.isfile(temp_dir / 'dotfiles' / '.dot_file9')
+    os.unlink(plan_path)